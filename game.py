@@ -3,21 +3,157 @@
 To run:
   python game.py [optional config file]
 
+To precompile a config file into a snapshot which loads faster:
+  python game.py --compile [optional config file]
+
+To host the game for many players over telnet:
+  python game.py --serve [host:]port [optional config file]
+
+To save the game to a file, continue it from there if it exists, and save
+in the background while playing:
+  python game.py --save file [optional config file]
+
+Actions can be undone with 'undo' and redone with 'redo'.  To choose how many
+actions can be undone (default 100, 0 disables undo):
+  python game.py --undo depth [optional config file]
+
+To also keep a compressed log of every command played in a directory (see
+my_game_history.py to read it):
+  python game.py --history directory [optional config file]
+
+To measure the latency of every command, shown by 'debug stats' and written
+to a JSON file every minute:
+  python game.py --stats file [optional config file]
+
+To replay a transcript of commands without the interactive loop:
+  python game.py --replay transcript [optional config file]
+
+To parse a large [MAP] section with a pool of worker processes:
+  python game.py --workers N [optional config file]
+
 For in-game help, use 'help', 'exit' to quit.
 """
 import sys
 
+import my_game_cache
+import my_game_history
+import my_game_journal
+import my_game_parallel_parser
 import my_game_parser
+import my_game_replay
+import my_game_save
+import my_game_server
+import my_game_stats
+
+
+def ReportUnreachable(parser):
+    """Warn about rooms the player can never get to."""
+    if parser.player.game_map.storage == "regions":
+        # Checking would page in the whole map.
+        return
+    rooms = parser.UnreachableRooms()
+    if rooms:
+        print "Warning: %d rooms can't be reached from the start: %s" % (
+            len(rooms), ", ".join("(%d, %d)" % room for room in rooms))
+
+
+def PopOption(args, name, default=None):
+    """Remove "name value" from args and return the value, or default."""
+    if name not in args:
+        return default
+    i = args.index(name)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
 
 
 def main(argv):
-    parser = my_game_parser.GameParser()
+    args = argv[1:]
+    compile_only = "--compile" in args
+    if compile_only:
+        args.remove("--compile")
+    replay_file = PopOption(args, "--replay")
+    save_file = PopOption(args, "--save")
+    undo_depth = int(PopOption(args, "--undo", 100)) or None
+    history_dir = PopOption(args, "--history")
+    stats_file = PopOption(args, "--stats")
+    serve_address = PopOption(args, "--serve")
+    workers = PopOption(args, "--workers")
+    if workers is not None:
+        parser = my_game_parallel_parser.ParallelGameParser(
+            workers=int(workers))
+    else:
+        parser = my_game_parser.GameParser(streaming=True)
     config_file = "configs/iss_fire.game"
-    if len(argv) > 1:
-        config_file = argv[1]
+    if args:
+        config_file = args[0]
+    if compile_only:
+        print "Compiled: %s" % parser.Compile(config_file)
+        ReportUnreachable(parser)
+        return
+    if replay_file is not None:
+        commands = my_game_replay.ReadTranscript(replay_file)
+        results = my_game_replay.Replay(
+            my_game_replay.LoadTemplate(config_file), commands,
+            undo_depth=undo_depth)
+        print "\n".join(my_game_replay.FormatResults(commands, results))
+        return
     print "Using: %s" % config_file
     parser.Parse(config_file)
-    parser.game_interface.Run(parser.player, debug_mode=True)
+    ReportUnreachable(parser)
+    stats_dumper = None
+    if stats_file is not None:
+        parser.game_interface.stats = my_game_stats.Stats()
+        stats_dumper = my_game_stats.StatsDumper(parser.game_interface.stats,
+                                                 stats_file)
+        stats_dumper.Start()
+    try:
+        if serve_address is not None:
+            host, _, port = serve_address.rpartition(":")
+            server = my_game_server.GameServer(
+                my_game_cache.WorldTemplate(parser.player,
+                                            parser.game_interface),
+                host=host, port=int(port), undo_depth=undo_depth)
+            print "Serving on %s:%d" % server.address
+            server.Serve()
+            return
+        if undo_depth is not None:
+            parser.player.journal = my_game_journal.Journal(undo_depth)
+        history_log = None
+        if history_dir is not None:
+            history_log = my_game_history.HistoryLog(history_dir)
+            parser.game_interface.history_log = history_log
+            history_log.Start()
+        try:
+            Play(parser, save_file)
+        finally:
+            if history_log is not None:
+                history_log.Stop()
+    finally:
+        # Rooms of a region map which are still in memory are only written
+        # back by a flush.  Server sessions only change their own copies.
+        parser.player.game_map.Flush()
+        if stats_dumper is not None:
+            stats_dumper.Stop()
+
+
+def Play(parser, save_file=None):
+    """Run the interactive game, saving it to save_file if given."""
+    if save_file is None:
+        parser.game_interface.Run(parser.player, debug_mode=True)
+        return
+    parser.player.Start()
+    saver = my_game_save.SaveFile(save_file, parser.player,
+                                  parser.game_interface)
+    if saver.Load():
+        print "Continuing from: %s" % save_file
+    parser.game_interface.save_file = saver
+    autosaver = my_game_save.Autosaver(saver)
+    autosaver.Start()
+    try:
+        parser.game_interface.Run(parser.player, debug_mode=True)
+    finally:
+        autosaver.Stop()
 
 
 if __name__ == "__main__":
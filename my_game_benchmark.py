@@ -0,0 +1,688 @@
+"""Benchmarks for the game engine.
+
+To run:
+  python my_game_benchmark.py parallel [--height H] [--width W]
+      [--workers 1,2,4,8]
+  python my_game_benchmark.py storage [--height H] [--width W]
+      [--rooms N] [--lookups N]
+  python my_game_benchmark.py lookup [--aliases 10,100,1000,10000]
+      [--lookups N]
+  python my_game_benchmark.py inventory [--capacities 10,1000,100000]
+      [--iterations N]
+  python my_game_benchmark.py area [--height H] [--width W]
+      [--radii 1,5,25,100] [--iterations N]
+  python my_game_benchmark.py suite [--height H] [--width W]
+      [--iterations N] [--items N] [--output results.json]
+  python my_game_benchmark.py compare old.json new.json
+
+The suite times the main engine operations and reports operations per second,
+percentiles and the maximum of the latency of single operations, and the growth
+of the peak memory of the process for each.  Its results can be saved as JSON
+and compared across revisions.
+
+Worlds are generated synthetically, so the numbers only depend on the size of
+the world and not on any particular config.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import timeit
+
+import my_game_interface
+import my_game_item
+import my_game_map
+import my_game_parallel_parser
+import my_game_parser
+import my_game_player
+import my_game_render
+import my_game_room
+import my_game_utils
+
+
+GENERATED_ALIASES = [
+    ("MOVE", ["go", "move", "run"]),
+    ("UP", ["up", "north"]),
+    ("DOWN", ["down", "south"]),
+    ("LEFT", ["left", "west"]),
+    ("RIGHT", ["right", "east"]),
+    ("USE", ["use", "try"]),
+    ("ADD", ["add", "take", "get"]),
+    ("DROP", ["drop", "toss"]),
+    ("INSPECT", ["look", "inspect"]),
+    ]
+
+
+def GenerateWorld(filename, height, width, density=0.5, items_per_room=2,
+                  seed=0):
+    """Write a synthetic .game config.
+
+    Rooms are scattered randomly over the map.  The player starts in the top
+    left corner, which is always a room.
+
+    Args:
+      filename:  Path to write the config to.
+      height:  Height of the map.
+      width:  Width of the map.
+      density:  Fraction of the cells of the map which are rooms.
+      items_per_room:  Maximum number of items in each room.
+      seed:  Seed for the random number generator.
+
+    Returns:
+      The number of rooms written.
+    """
+    rand = random.Random(seed)
+    items = ["foam", "co2", "water", "sand"]
+    rooms = 0
+    with open(filename, "w") as f:
+        f.write("[GAME]\n"
+                "name:Generated\n"
+                "exposition:A generated world.\n"
+                "help:Try moving around.\n"
+                "player_inventory_capacity:10\n"
+                "player_inventory:foam:co2\n"
+                "[ROOM_STATES]\n"
+                "0:fine\n"
+                "1:electrical fire\n"
+                "2:fabric fire\n"
+                "3:electrical fire:fabric fire\n"
+                "[ITEMS]\n"
+                "foam:2>1:1>0\n"
+                "co2:3>1:2>0\n"
+                "water:1>0\n"
+                "sand\n"
+                "[MAP]\n"
+                "dimensions:%d:%d\n"
+                "player_start:0:0\n" % (height, width))
+        for y in xrange(height):
+            lines = []
+            for x in xrange(width):
+                if (y or x) and rand.random() >= density:
+                    continue
+                contents = [rand.choice(items)
+                            for _ in xrange(rand.randint(0, items_per_room))]
+                lines.append("%d:%d:%d:%s\n" % (
+                    y, x, rand.randint(0, 3), ":".join(contents)))
+                rooms += 1
+            f.write("".join(lines))
+        for alias, verbs in GENERATED_ALIASES:
+            f.write("[ALIASES_%s]\n%s\n" % (alias, "\n".join(verbs)))
+    return rooms
+
+
+def Time(function, *args, **kwargs):
+    """Returns (seconds, result) of calling function once."""
+    start = time.time()
+    result = function(*args, **kwargs)
+    return time.time() - start, result
+
+
+def BenchmarkParallelParse(filename, worker_counts):
+    """Time parsing filename serially and with each number of workers.
+
+    Args:
+      filename:  Path to the config to parse.
+      worker_counts:  List of numbers of worker processes to try.
+
+    Returns:
+      A list of (name, seconds) tuples, the serial parse first.
+    """
+    def Parse(parser):
+        parser.Parse(filename, use_snapshot=False)
+        return parser
+
+    results = []
+    seconds, serial = Time(
+        Parse, my_game_parser.GameParser(streaming=True))
+    results.append(("serial", seconds))
+    expected = serial.player.game_map.DebugInfo()
+    for workers in worker_counts:
+        seconds, parser = Time(
+            Parse, my_game_parallel_parser.ParallelGameParser(
+                workers=workers, chunk_bytes=1 << 18))
+        assert parser.player.game_map.DebugInfo() == expected
+        results.append(("%d workers" % workers, seconds))
+    return results
+
+
+def BenchmarkMapStorage(height, width, rooms, lookups, seed=0):
+    """Compare the memory and lookup speed of each map storage type.
+
+    Args:
+      height:  Height of the map.
+      width:  Width of the map.
+      rooms:  Number of rooms scattered randomly over the map.
+      lookups:  Number of random GetRoom calls to time.
+      seed:  Seed for the random number generator.
+
+    Returns:
+      A list of (storage, bytes, seconds to build, lookups per second).
+    """
+    rand = random.Random(seed)
+    points = [(rand.randrange(height), rand.randrange(width))
+              for _ in xrange(rooms)]
+    # Half of the lookups hit a room, half are random and almost always miss.
+    probes = [rand.choice(points) for _ in xrange(lookups // 2)] + [
+        (rand.randrange(height), rand.randrange(width))
+        for _ in xrange(lookups - lookups // 2)]
+    results = []
+    for storage in sorted(my_game_map.GameMap.STORAGE_TYPES):
+        def Build():
+            game_map = my_game_map.GameMap()
+            game_map.storage = storage
+            game_map.height = height
+            game_map.width = width
+            game_map.Initialize()
+            for y, x in points:
+                game_map.SetRoom(y, x, my_game_room.Room())
+            return game_map
+        build_seconds, game_map = Time(Build)
+        size = my_game_utils.DeepSizeOf(game_map)
+        get_room = game_map.GetRoom
+        start = time.time()
+        for y, x in probes:
+            get_room(y, x)
+        lookup_seconds = time.time() - start
+        results.append((storage, size, build_seconds,
+                        lookups / lookup_seconds))
+        del game_map, get_room
+    return results
+
+
+def BenchmarkLookupAction(alias_counts, lookups, seed=0):
+    """Time GameInterface.LookupAction as the number of aliases grows.
+
+    Half of the aliases are single words and half are two words.  A third of
+    the aliases are move verbs, the rest are split between the actions.
+
+    Args:
+      alias_counts:  List of numbers of aliases to try.
+      lookups:  Number of commands to look up for each alias count.
+      seed:  Seed for the random number generator.
+
+    Returns:
+      A list of (number of aliases, lookups per second).
+    """
+    rand = random.Random(seed)
+    actions = [my_game_player.Player.UseItem, my_game_player.Player.AddItem,
+               my_game_player.Player.DropItem, my_game_player.Player.Inspect]
+    results = []
+    for count in alias_counts:
+        game_interface = my_game_interface.GameInterface()
+        for direction in ["up", "north", "down", "left", "right"]:
+            game_interface.AddDirectionAlias(
+                direction, my_game_player.Player.MoveUp)
+        verbs = []
+        for i in xrange(count):
+            verb = "verb%d" % i
+            if i % 2:
+                verb += " word%d" % i
+            if i % 3 == 0:
+                game_interface.AddMoveAlias(verb)
+                verbs.append(verb + " north")
+            else:
+                game_interface.AddActionAlias(verb, actions[i % len(actions)])
+                verbs.append(verb + " some big item")
+        commands = [rand.choice(verbs) for _ in xrange(lookups - lookups // 4)]
+        commands += ["unknown command %d" % i for i in xrange(lookups // 4)]
+        rand.shuffle(commands)
+        lookup = game_interface.LookupAction
+        # The index is built on the first lookup.
+        seconds, _ = Time(lookup, commands[0])
+        start = time.time()
+        for command in commands:
+            lookup(command)
+        results.append((count, lookups / (time.time() - start), seconds))
+    return results
+
+
+def BenchmarkInventory(capacities, operations, kinds=10):
+    """Time inventory operations on nearly full inventories.
+
+    The inventory is filled to one below its capacity with a mix of kinds
+    items, then each operation takes an item from the room and drops it
+    again, so the capacity check always passes.
+
+    Args:
+      capacities:  List of inventory capacities to try.
+      operations:  Number of take and drop pairs for each capacity.
+      kinds:  Number of different items in the inventory.
+
+    Returns:
+      A list of (capacity, operations per second, displays per second).
+    """
+    results = []
+    for capacity in capacities:
+        player = my_game_player.Player()
+        room = my_game_room.Room()
+        room.state = 0
+        room.contents = ["item%d" % i for i in xrange(kinds)]
+        player.curr_room = room
+        player.max_inventory_size = capacity
+        for i in xrange(capacity - 1):
+            player.GiveItem("item%d" % (i % kinds))
+        names = ["item%d" % (i % kinds) for i in xrange(operations)]
+        start = time.time()
+        for name in names:
+            player.AddItem(name)
+            player.DropItem(name)
+        operations_per_second = operations / (time.time() - start)
+        displays = max(1, operations // 100)
+        start = time.time()
+        for _ in xrange(displays):
+            player.GetInventoryDisplay()
+        results.append((capacity, operations_per_second,
+                        displays / (time.time() - start)))
+    return results
+
+
+def BenchmarkAreaUse(height, width, radii, uses, seed=0):
+    """Time using an item on an area of a full map, vectorized and by room.
+
+    Every room gets a random state from 0 to 3, and the item cycles each state
+    to the next one, so every use changes every room in the area.
+
+    Args:
+      height:  Height of the map.
+      width:  Width of the map.
+      radii:  List of item radii to try.
+      uses:  Number of times to use the item for each radius.
+      seed:  Seed for the random number generator.
+
+    Returns:
+      A list of (radius, rooms per use, vectorized uses per second, room by
+      room uses per second).
+    """
+    rand = random.Random(seed)
+    game_map = my_game_map.GameMap()
+    game_map.height = height
+    game_map.width = width
+    game_map.Initialize()
+    for y in xrange(height):
+        for x in xrange(width):
+            room = my_game_room.Room()
+            room.state = rand.randint(0, 3)
+            game_map.SetRoom(y, x, room)
+    results = []
+    for radius in radii:
+        item = my_game_item.GameItem()
+        for state in xrange(4):
+            item.AddStateChange(state, (state + 1) % 4)
+        item.radius = radius
+        item = my_game_item.ItemDefinition.FromGameItem(item)
+        centers = [(rand.randrange(height), rand.randrange(width))
+                   for _ in xrange(uses)]
+        y0, x0, y1, x1 = game_map._Area(radius, height // 2, width // 2)
+        rates = []
+        for use in [game_map.UseItemInArea, game_map.UseItemInAreaByRoom]:
+            # Build the state grid outside of the timing.
+            game_map.state_grid
+            start = time.time()
+            for y, x in centers:
+                use(item, y, x)
+            rates.append(uses / (time.time() - start))
+        results.append((radius, (y1 - y0) * (x1 - x0), rates[0], rates[1]))
+    return results
+
+
+def PeakMemoryKb():
+    """Peak resident memory of this process so far, in kilobytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def Percentile(sorted_samples, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = int(round(percent / 100.0 * (len(sorted_samples) - 1)))
+    return sorted_samples[rank]
+
+
+def Measure(run_batch, iterations, batch_size):
+    """Time run_batch and summarize its per operation latency.
+
+    The throughput is timed in batches, so that very fast operations are not
+    dominated by the cost of reading the clock.  The latency percentiles are
+    of single operations, each timed on its own, so that they show the tail
+    which batch means would hide.  They include one read of the clock.
+
+    Args:
+      run_batch:  Function called as run_batch(n) which performs n operations.
+      iterations:  Number of operations to perform for the throughput, and
+        again one at a time for the latencies.
+      batch_size:  Number of operations per timed batch.  With 1, the same
+        operations are used for both.
+
+    Returns:
+      A dict with ops_per_sec, p50_us, p90_us, p99_us, max_us and
+      peak_memory_kb, the growth of the peak memory of the process.
+    """
+    memory_before = PeakMemoryKb()
+    clock = timeit.default_timer
+    samples = []
+    total = 0.0
+    done = 0
+    while done < iterations:
+        n = min(batch_size, iterations - done)
+        start = clock()
+        run_batch(n)
+        seconds = clock() - start
+        total += seconds
+        if n == 1:
+            samples.append(seconds * 1e6)
+        done += n
+    if batch_size > 1:
+        for _ in xrange(iterations):
+            start = clock()
+            run_batch(1)
+            samples.append((clock() - start) * 1e6)
+    samples.sort()
+    return {
+        "ops_per_sec": done / total if total else 0.0,
+        "p50_us": Percentile(samples, 50),
+        "p90_us": Percentile(samples, 90),
+        "p99_us": Percentile(samples, 99),
+        "max_us": samples[-1] if samples else 0.0,
+        "peak_memory_kb": PeakMemoryKb() - memory_before,
+        }
+
+
+def _FindAdjacentRooms(game_map):
+    """Returns (y, x) of a room whose right hand neighbor is also a room."""
+    for y, x, _ in game_map.IterRooms():
+        if game_map.GetRoom(y, x + 1) is not None:
+            return y, x
+    raise ValueError("No adjacent rooms in the generated world")
+
+
+def BenchmarkSuite(filename, iterations, parse_runs=3, items=1000,
+                   batch_size=100):
+    """Time the main engine operations on a generated world.
+
+    Args:
+      filename:  Path of a config written by GenerateWorld.
+      iterations:  Number of operations to time for each operation.
+      parse_runs:  Number of times to parse the config.
+      items:  Number of items put in the room and in the inventory for the
+        benchmarks of their displays.
+      batch_size:  Number of operations per timed batch.
+
+    Returns:
+      A dict of benchmark name to the results of Measure.
+    """
+    results = {}
+
+    def Parse(n):
+        for _ in xrange(n):
+            my_game_parser.GameParser(streaming=True).Parse(
+                filename, use_snapshot=False)
+    results["GameParser.Parse"] = Measure(Parse, parse_runs, 1)
+
+    parser = my_game_parser.GameParser(streaming=True)
+    parser.Parse(filename, use_snapshot=False)
+    player = parser.player
+    game_interface = parser.game_interface
+    game_map = player.game_map
+
+    commands = ["go up", "take foam", "drop the big red ball", "use co2",
+                "look", "jump around"]
+    lookup = game_interface.LookupAction
+
+    def Lookup(n):
+        for i in xrange(n):
+            lookup(commands[i % len(commands)])
+    results["GameInterface.LookupAction"] = Measure(
+        Lookup, iterations, batch_size)
+
+    # Walk back and forth between two rooms.
+    y, x = _FindAdjacentRooms(game_map)
+    player.y_pos = y
+    player.x_pos = x
+    player.Start()
+    player.max_inventory_size = 10
+
+    def Move(n):
+        for i in xrange(n):
+            if player.x_pos == x:
+                player.MoveRight()
+            else:
+                player.MoveLeft()
+    results["Player.Move"] = Measure(Move, iterations, batch_size)
+
+    room = player.curr_room
+
+    def AddItem(n):
+        for _ in xrange(n):
+            room.AddContent("sand")
+            player.AddItem("sand")
+            player.DropItem("sand")
+            room.RemoveContent("sand")
+    # Reported per add, which includes the matching drop to keep the
+    # inventory from filling up.
+    results["Player.AddItem+DropItem"] = Measure(
+        AddItem, iterations, batch_size)
+
+    def DropItem(n):
+        for _ in xrange(n):
+            player.DropItem("foam")
+            player.AddItem("foam")
+    results["Player.DropItem+AddItem"] = Measure(
+        DropItem, iterations, batch_size)
+
+    def UseItem(n):
+        for _ in xrange(n):
+            # Reusable items are put back in the inventory from the room, so
+            # this also resets the room.
+            room.state = 2
+            room.AddContent("foam")
+            player.UseItem("foam")
+    results["Player.UseItem"] = Measure(UseItem, iterations, batch_size)
+
+    # Fill the room and the inventory for the displays of "look".
+    rand = random.Random(0)
+    contents = [rand.choice(["foam", "co2", "water", "sand"])
+                for _ in xrange(items)]
+    inventory = player.inventory
+    for content in contents:
+        room.AddContent(content)
+    player.inventory = inventory + contents
+
+    def GetRoomContentsDisplay(n):
+        for _ in xrange(n):
+            player.GetRoomContentsDisplay()
+    results["Player.GetRoomContentsDisplay"] = Measure(
+        GetRoomContentsDisplay, iterations, batch_size)
+
+    def GetInventoryDisplay(n):
+        for _ in xrange(n):
+            player.GetInventoryDisplay()
+    results["Player.GetInventoryDisplay"] = Measure(
+        GetInventoryDisplay, iterations, batch_size)
+
+    for content in contents:
+        room.RemoveContent(content)
+    player.inventory = inventory
+
+    def DebugInfo(n):
+        for _ in xrange(n):
+            game_map.DebugInfo(y_player=player.y_pos, x_player=player.x_pos)
+    results["GameMap.DebugInfo"] = Measure(DebugInfo, parse_runs, 1)
+
+    renderer = my_game_render.MapRenderer(game_map)
+
+    def Render(n):
+        for _ in xrange(n):
+            if player.x_pos == x:
+                player.MoveRight()
+            else:
+                player.MoveLeft()
+            renderer.Render(player.y_pos, player.x_pos)
+    # Reported per move, which includes the move itself.
+    results["MapRenderer.Render+Move"] = Measure(
+        Render, iterations, batch_size)
+    return results
+
+
+def Revision():
+    """Returns the git revision of the engine's checkout, if there is one."""
+    try:
+        with open(os.devnull, "w") as devnull:
+            return subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def SaveResults(filename, results, parameters):
+    """Write suite results as JSON, with enough context to compare runs."""
+    with open(filename, "w") as f:
+        json.dump({"revision": Revision(),
+                   "time": time.time(),
+                   "python": platform.python_version(),
+                   "machine": platform.machine(),
+                   "parameters": parameters,
+                   "results": results},
+                  f, indent=2, sort_keys=True)
+
+
+def CompareResults(old, new):
+    """Compare two saved suite results.
+
+    Args:
+      old:  Dict loaded from a results file.
+      new:  Dict loaded from a results file.
+
+    Returns:
+      A list of (name, old ops/sec, new ops/sec, new / old) for the
+      benchmarks in both.
+    """
+    rows = []
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        old_ops = old["results"][name]["ops_per_sec"]
+        new_ops = new["results"][name]["ops_per_sec"]
+        rows.append((name, old_ops, new_ops,
+                     new_ops / old_ops if old_ops else float("inf")))
+    return rows
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    arg_parser.add_argument(
+        "benchmark",
+        choices=["parallel", "storage", "lookup", "inventory", "area",
+                 "suite", "compare"])
+    arg_parser.add_argument("files", nargs="*",
+                            help="Results files to compare.")
+    arg_parser.add_argument("--height", type=int, default=1000)
+    arg_parser.add_argument("--width", type=int, default=1000)
+    arg_parser.add_argument("--density", type=float, default=0.5)
+    arg_parser.add_argument("--workers", default="1,2,4,8",
+                            help="Comma-separated worker counts.")
+    arg_parser.add_argument("--rooms", type=int, default=5000)
+    arg_parser.add_argument("--lookups", type=int, default=1000000)
+    arg_parser.add_argument("--aliases", default="10,100,1000,10000",
+                            help="Comma-separated alias counts.")
+    arg_parser.add_argument("--capacities", default="10,1000,100000,1000000",
+                            help="Comma-separated inventory capacities.")
+    arg_parser.add_argument("--radii", default="1,5,25,100",
+                            help="Comma-separated item radii.")
+    arg_parser.add_argument("--iterations", type=int, default=100000)
+    arg_parser.add_argument("--items", type=int, default=1000)
+    arg_parser.add_argument("--output", help="File to save results to.")
+    args = arg_parser.parse_args()
+
+    if args.benchmark == "compare":
+        if len(args.files) != 2:
+            arg_parser.error("compare needs an old and a new results file")
+        with open(args.files[0]) as f:
+            old = json.load(f)
+        with open(args.files[1]) as f:
+            new = json.load(f)
+        print "%s -> %s" % (old["revision"], new["revision"])
+        for name, old_ops, new_ops, ratio in CompareResults(old, new):
+            print "%-34s %12.0f %12.0f ops/s  %6.2fx" % (
+                name, old_ops, new_ops, ratio)
+        return
+
+    if args.benchmark == "lookup":
+        for count, lookups_per_second, build_seconds in (
+                BenchmarkLookupAction(
+                    [int(a) for a in args.aliases.split(",")],
+                    args.lookups)):
+            print "%6d aliases  %10.0f lookups/s  index built in %.4fs" % (
+                count, lookups_per_second, build_seconds)
+        return
+
+    if args.benchmark == "inventory":
+        for capacity, operations_per_second, displays_per_second in (
+                BenchmarkInventory(
+                    [int(c) for c in args.capacities.split(",")],
+                    args.iterations)):
+            print "%8d capacity  %10.0f take+drop/s  %10.0f displays/s" % (
+                capacity, operations_per_second, displays_per_second)
+        return
+
+    if args.benchmark == "area":
+        print "%dx%d map" % (args.height, args.width)
+        for radius, rooms, vectorized, by_room in BenchmarkAreaUse(
+                args.height, args.width,
+                [int(r) for r in args.radii.split(",")], args.iterations):
+            print ("radius %4d  %6d rooms  %10.1f uses/s  %10.1f uses/s room"
+                   " by room  %6.1fx" % (radius, rooms, vectorized, by_room,
+                                         vectorized / by_room))
+        return
+
+    if args.benchmark == "storage":
+        print "%dx%d map, %d rooms" % (args.height, args.width, args.rooms)
+        for storage, size, build_seconds, lookups_per_second in (
+                BenchmarkMapStorage(args.height, args.width, args.rooms,
+                                    args.lookups)):
+            print "%-8s %12d bytes  built in %7.3fs  %10.0f lookups/s" % (
+                storage, size, build_seconds, lookups_per_second)
+        return
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, "generated.game")
+        rooms = GenerateWorld(filename, args.height, args.width,
+                              density=args.density)
+        print "%dx%d map, %d rooms, %d bytes" % (
+            args.height, args.width, rooms, os.path.getsize(filename))
+        if args.benchmark == "parallel":
+            results = BenchmarkParallelParse(
+                filename, [int(w) for w in args.workers.split(",")])
+            serial_seconds = results[0][1]
+            for name, seconds in results:
+                print "%-12s %8.3fs  %5.2fx" % (
+                    name, seconds, serial_seconds / seconds)
+        elif args.benchmark == "suite":
+            results = BenchmarkSuite(filename, args.iterations,
+                                     items=args.items)
+            print "%-34s %12s %9s %9s %9s %9s %10s" % (
+                "", "ops/s", "p50 us", "p90 us", "p99 us", "max us",
+                "peak KB")
+            for name in sorted(results):
+                r = results[name]
+                print "%-34s %12.0f %9.2f %9.2f %9.2f %9.2f %10d" % (
+                    name, r["ops_per_sec"], r["p50_us"], r["p90_us"],
+                    r["p99_us"], r["max_us"], r["peak_memory_kb"])
+            if args.output:
+                SaveResults(args.output, results, {
+                    "height": args.height, "width": args.width,
+                    "density": args.density, "rooms": rooms,
+                    "iterations": args.iterations, "items": args.items})
+                print "Saved to %s" % args.output
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import my_game_benchmark
+import my_game_parser
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._config = os.path.join(self._tmp_dir, "generated.game")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def test_generate_world(self):
+        rooms = my_game_benchmark.GenerateWorld(self._config, 20, 30,
+                                                density=0.3)
+        parser = my_game_parser.GameParser(streaming=True)
+        parser.Parse(self._config, use_snapshot=False)
+        self.assertEqual(len(list(parser.player.game_map.IterRooms())),
+                         rooms)
+        self.assertTrue(parser.player.Start())
+
+    def test_percentile(self):
+        samples = range(101)
+        self.assertEqual(my_game_benchmark.Percentile(samples, 50), 50)
+        self.assertEqual(my_game_benchmark.Percentile(samples, 99), 99)
+        self.assertEqual(my_game_benchmark.Percentile([], 99), 0.0)
+
+    def test_revision_from_another_directory(self):
+        revision = my_game_benchmark.Revision()
+        cwd = os.getcwd()
+        os.chdir(self._tmp_dir)
+        try:
+            self.assertEqual(my_game_benchmark.Revision(), revision)
+        finally:
+            os.chdir(cwd)
+
+    def test_measure(self):
+        calls = []
+        result = my_game_benchmark.Measure(calls.append, 25, 10)
+        # Batches for the throughput, then each operation on its own for the
+        # latencies.
+        self.assertEqual(calls, [10, 10, 5] + [1] * 25)
+        self.assertTrue(result["p50_us"] <= result["p99_us"]
+                        <= result["max_us"])
+        calls = []
+        my_game_benchmark.Measure(calls.append, 3, 1)
+        self.assertEqual(calls, [1, 1, 1])
+
+    def test_inventory(self):
+        results = my_game_benchmark.BenchmarkInventory([1, 50], 20, kinds=3)
+        self.assertEqual([r[0] for r in results], [1, 50])
+
+    def test_area_use(self):
+        results = my_game_benchmark.BenchmarkAreaUse(10, 12, [0, 2, 20], 5)
+        self.assertEqual([r[:2] for r in results],
+                         [(0, 1), (2, 25), (20, 120)])
+
+    def test_suite(self):
+        my_game_benchmark.GenerateWorld(self._config, 10, 10, density=0.9)
+        results = my_game_benchmark.BenchmarkSuite(
+            self._config, 50, parse_runs=1, items=10, batch_size=10)
+        self.assertEqual(
+            sorted(results),
+            ["GameInterface.LookupAction", "GameMap.DebugInfo",
+             "GameParser.Parse", "MapRenderer.Render+Move",
+             "Player.AddItem+DropItem",
+             "Player.DropItem+AddItem", "Player.GetInventoryDisplay",
+             "Player.GetRoomContentsDisplay", "Player.Move",
+             "Player.UseItem"])
+
+        filename = os.path.join(self._tmp_dir, "results.json")
+        my_game_benchmark.SaveResults(filename, results, {"height": 10})
+        with open(filename) as f:
+            saved = json.load(f)
+        self.assertEqual(saved["parameters"], {"height": 10})
+        rows = my_game_benchmark.CompareResults(saved, saved)
+        self.assertEqual(len(rows), len(results))
+        self.assertEqual(rows[0][3], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
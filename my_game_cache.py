@@ -0,0 +1,199 @@
+"""Cache of parsed worlds for hosting many games in one process.
+
+Parsing a .game file builds a number of objects which never change during a
+game: the RoomStateMapper, the ItemMapper, the alias tables, the game text and
+the initial map.  A ParseCache keeps these as a WorldTemplate, keyed by the
+content hash and modification time of the config, and hands out cheap
+per-session copies of the mutable parts.
+"""
+import collections
+import hashlib
+import os
+import threading
+
+import my_game_map
+import my_game_parser
+import my_game_player
+import my_game_utils
+
+
+class WorldTemplate(object):
+    """The immutable parts of a parsed world, shared by every session."""
+
+    def __init__(self, player, game_interface):
+        """Create a template from a freshly parsed world.
+
+        The template takes ownership of the parsed objects, which must not be
+        used for playing afterwards.
+
+        Args:
+          player:  A my_game_player.Player as returned by the parser.
+          game_interface:  A my_game_interface.GameInterface as returned by
+            the parser.
+        """
+        self._game_interface = game_interface
+        self._game_map = player.game_map
+        self._room_state_mapper = player.room_state_mapper
+        self._item_mapper = player.item_mapper
+        self._y_pos = player.y_pos
+        self._x_pos = player.x_pos
+        self._inventory = tuple(player.inventory)
+        self._max_inventory_size = player.max_inventory_size
+        self._size = None
+
+    @property
+    def game_interface(self):
+        return self._game_interface
+
+    @property
+    def game_map(self):
+        return self._game_map
+
+    @property
+    def room_state_mapper(self):
+        return self._room_state_mapper
+
+    @property
+    def item_mapper(self):
+        return self._item_mapper
+
+    @property
+    def size(self):
+        """Approximate number of bytes used by the template."""
+        if self._size is None:
+            seen = set()
+            self._size = sum(my_game_utils.DeepSizeOf(o, seen) for o in (
+                self._game_interface, self._game_map, self._room_state_mapper,
+                self._item_mapper, self._inventory))
+        return self._size
+
+    def NewSession(self):
+        """Create the mutable state for a new game session.
+
+        The session shares the mappers, alias tables and game text with the
+        template.  Its map is a my_game_map.OverlayMap, so rooms are only
+        copied once the session touches them.
+
+        Returns:
+          A tuple of (player, game_interface) ready for GameInterface.Run.
+        """
+        player = my_game_player.Player()
+        player.game_map = my_game_map.OverlayMap(self._game_map)
+        player.room_state_mapper = self._room_state_mapper
+        player.item_mapper = self._item_mapper
+        player.y_pos = self._y_pos
+        player.x_pos = self._x_pos
+        player.inventory = list(self._inventory)
+        player.max_inventory_size = self._max_inventory_size
+        return player, self._game_interface.NewSession()
+
+
+class ParseCache(object):
+    """LRU cache of WorldTemplates bounded by their approximate total size.
+
+    Templates are keyed by the SHA-1 of the config's content and its
+    modification time, so an edited config is parsed again while an unchanged
+    config is only re-hashed if its size or modification time changes.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, max_bytes, parser_factory=my_game_parser.GameParser):
+        """Create a cache.
+
+        Args:
+          max_bytes:  Approximate bound on the total size of the cached
+            templates.  The most recently used template is always kept, even
+            if it is larger than the bound.
+          parser_factory:  Function returning a new my_game_parser.GameParser
+            used to parse configs missing from the cache.
+        """
+        self._max_bytes = max_bytes
+        self._parser_factory = parser_factory
+        self._templates = collections.OrderedDict()
+        # Dict of filename to ((mtime, size), key) to avoid re-hashing files.
+        self._keys = {}
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def __len__(self):
+        return len(self._templates)
+
+    def _Key(self, filename):
+        stat = os.stat(filename)
+        signature = (stat.st_mtime, stat.st_size)
+        cached = self._keys.get(filename)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha1()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), ""):
+                digest.update(block)
+        key = (digest.hexdigest(), stat.st_mtime)
+        self._keys[filename] = (signature, key)
+        return key
+
+    def Get(self, filename):
+        """Returns the WorldTemplate for the config, parsing it if needed.
+
+        Args:
+          filename:  Path to the .game config file.
+
+        Raises:
+          my_game_parser.ParseError if the config can not be parsed.
+        """
+        with self._lock:
+            key = self._Key(filename)
+            template = self._templates.pop(key, None)
+            if template is not None:
+                self._hits += 1
+                self._templates[key] = template
+                return template
+            self._misses += 1
+        # Parse outside of the lock so other games can be served meanwhile.
+        parser = self._parser_factory()
+        parser.Parse(filename)
+        template = WorldTemplate(parser.player, parser.game_interface)
+        size = template.size
+        with self._lock:
+            if key not in self._templates:
+                self._templates[key] = template
+                self._total_bytes += size
+                self._Evict()
+            return self._templates[key]
+
+    def NewSession(self, filename):
+        """Shorthand for Get(filename).NewSession()."""
+        return self.Get(filename).NewSession()
+
+    def Invalidate(self, filename=None):
+        """Drop the cached template for filename, or every template."""
+        with self._lock:
+            if filename is None:
+                self._templates.clear()
+                self._keys.clear()
+                self._total_bytes = 0
+                return
+            cached = self._keys.pop(filename, None)
+            if cached is not None and cached[1] in self._templates:
+                self._total_bytes -= self._templates.pop(cached[1]).size
+
+    def _Evict(self):
+        """Drop least recently used templates until under max_bytes."""
+        while self._total_bytes > self._max_bytes and len(self._templates) > 1:
+            _, template = self._templates.popitem(last=False)
+            self._total_bytes -= template.size
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import my_game_cache
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._iss = os.path.join(self._tmp_dir, "iss_fire.game")
+        self._small = os.path.join(self._tmp_dir, "small_test.game")
+        shutil.copy("configs/iss_fire.game", self._iss)
+        shutil.copy("configs/small_test.game", self._small)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def test_hits_and_misses(self):
+        cache = my_game_cache.ParseCache(1 << 30)
+        template = cache.Get(self._iss)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertTrue(cache.Get(self._iss) is template)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertTrue(cache.Get(self._small) is not template)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.total_bytes,
+                         template.size + cache.Get(self._small).size)
+
+    def test_modified_config_is_parsed_again(self):
+        cache = my_game_cache.ParseCache(1 << 30)
+        template = cache.Get(self._iss)
+        with open(self._iss, "a") as f:
+            f.write("\n[GAME]\nname:Changed\n")
+        future = time.time() + 10
+        os.utime(self._iss, (future, future))
+        changed = cache.Get(self._iss)
+        self.assertTrue(changed is not template)
+        self.assertEqual(changed.game_interface.name, "Changed")
+        cache.Invalidate(self._iss)
+        self.assertTrue(cache.Get(self._iss) is not changed)
+
+    def test_lru_eviction(self):
+        small_size = my_game_cache.ParseCache(1 << 30).Get(self._small).size
+        iss_size = my_game_cache.ParseCache(1 << 30).Get(self._iss).size
+        cache = my_game_cache.ParseCache(max(small_size, iss_size) + 1)
+        small = cache.Get(self._small)
+        cache.Get(self._iss)
+        # The small world was least recently used and has been evicted.
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.total_bytes, iss_size)
+        self.assertTrue(cache.Get(self._small) is not small)
+        # A template larger than the bound is still kept.
+        cache = my_game_cache.ParseCache(1)
+        template = cache.Get(self._iss)
+        self.assertTrue(cache.Get(self._iss) is template)
+
+    def test_sessions_are_independent(self):
+        cache = my_game_cache.ParseCache(1 << 30)
+        template = cache.Get(self._iss)
+        player_a, interface_a = cache.NewSession(self._iss)
+        player_b, interface_b = cache.NewSession(self._iss)
+        self.assertTrue(player_a.Start())
+        self.assertTrue(player_b.Start())
+
+        # Immutable parts are shared.
+        self.assertTrue(
+            player_a.item_mapper is player_b.item_mapper is
+            template.item_mapper)
+        self.assertTrue(player_a.room_state_mapper is
+                        player_b.room_state_mapper)
+        self.assertEqual(interface_a.DebugInfo(),
+                         template.game_interface.DebugInfo())
+
+        # Mutable parts are not.
+        self.assertTrue(player_a.AddItem("foam")[0])
+        self.assertTrue(player_a.MoveDown()[0])
+        self.assertTrue(player_a.UseItem("co2")[0])
+        self.assertEqual(player_a.curr_room.state, 1)
+        self.assertEqual(player_a.game_map.GetRoom(0, 4).contents,
+                         ["co2", "co2", "co2"])
+        self.assertEqual(player_b.game_map.GetRoom(1, 4).state, 3)
+        self.assertEqual(player_b.game_map.GetRoom(0, 4).contents,
+                         ["co2", "co2", "co2", "foam"])
+        self.assertEqual(template.game_map.GetRoom(1, 4).state, 3)
+        self.assertEqual(len(player_b.inventory), 5)
+        self.assertEqual(player_a.game_map.DebugInfo(),
+                         template.game_map.DebugInfo())
+
+        interface_a.ExecuteCommand(player_a, "use foam")
+        self.assertEqual(interface_a.command_history, ["use foam"])
+        self.assertEqual(interface_b.command_history, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,286 @@
+"""Compressed, rotating on-disk log of every command played.
+
+GameInterface only keeps its last HISTORY_SIZE commands in memory.  A
+HistoryLog keeps all of them on disk, for support staff to look at later.
+
+The log is a directory of gzip segments named <prefix>.<first sequence
+number>.gz.  Each line is "<sequence number>\t<unix time>\t<command>".  A
+background thread writes the commands in batches, each batch as one gzip
+member appended to the newest segment followed by a single fsync.  Once a
+segment reaches segment_bytes a new one is started, and only the newest
+keep_segments segments are kept.
+
+A HistoryReader reads the log without changing it, e.g. while a game is
+writing to it.  Because the segments are named by the first sequence number
+they hold, Range only decompresses the segments which overlap the range and Tail only the
+newest segments.  Only complete lines are read, so a batch which is still
+being written is read as far as it got.  If the game crashed while writing,
+the next game starts a new segment rather than appending after the torn
+batch.
+
+To read the log:
+  python my_game_history.py tail [--lines N] <directory>
+  python my_game_history.py range <directory> <first> <last>
+"""
+import argparse
+import os
+import Queue
+import re
+import sys
+import threading
+import time
+import zlib
+
+
+class HistoryReader(object):
+    """Reads the segments of a log without changing anything on disk.
+
+    It is safe to read a log which a HistoryLog is writing to.
+    """
+
+    def __init__(self, directory, prefix="history"):
+        """Open a log for reading.
+
+        Args:
+          directory:  Directory of the segments.
+          prefix:  File name prefix of the segments.
+        """
+        self._directory = directory
+        self._prefix = prefix
+        self._segment_re = re.compile(r"^%s\.(\d+)\.gz$" % re.escape(prefix))
+
+    def Segments(self):
+        """Returns a sorted list of (first sequence number, path)."""
+        segments = []
+        for name in os.listdir(self._directory):
+            match = self._segment_re.match(name)
+            if match:
+                segments.append((int(match.group(1)),
+                                 os.path.join(self._directory, name)))
+        segments.sort()
+        return segments
+
+    def Range(self, first, last):
+        """Returns the written (seq, time, command) with first <= seq <= last."""
+        segments = self.Segments()
+        entries = []
+        for i, (segment_first, path) in enumerate(segments):
+            if segment_first > last:
+                break
+            if i + 1 < len(segments) and segments[i + 1][0] <= first:
+                continue
+            entries.extend(entry for entry in _ReadSegment(path)[0]
+                           if first <= entry[0] <= last)
+        return entries
+
+    def Tail(self, count):
+        """Returns the last count written (seq, time, command)."""
+        entries = []
+        for _, path in reversed(self.Segments()):
+            if len(entries) >= count:
+                break
+            entries = _ReadSegment(path)[0] + entries
+        return entries[-count:] if count else []
+
+
+class HistoryLog(HistoryReader):
+    """Writes commands to a rotating set of gzip segments."""
+
+    SEGMENT_BYTES = 1 << 20
+    KEEP_SEGMENTS = 10
+    # Seconds to collect commands for before writing them out.
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self, directory, prefix="history",
+                 segment_bytes=SEGMENT_BYTES, keep_segments=KEEP_SEGMENTS,
+                 sync_interval=SYNC_INTERVAL):
+        """Open a log, continuing the sequence numbers of an existing one.
+
+        Call Start to begin writing and Stop to write the rest and finish.
+
+        Args:
+          directory:  Directory of the segments, created if missing.
+          prefix:  File name prefix of the segments.
+          segment_bytes:  Size at which to start a new segment.
+          keep_segments:  Number of segments to keep.
+          sync_interval:  Seconds to batch commands for.
+        """
+        super(HistoryLog, self).__init__(directory, prefix=prefix)
+        self._segment_bytes = segment_bytes
+        self._keep_segments = keep_segments
+        self._sync_interval = sync_interval
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._queue = Queue.Queue()
+        self._thread = None
+        # The last exception raised while writing, if any.
+        self.error = None
+        segments = self.Segments()
+        self._next_seq = 0
+        self._current = None
+        if segments:
+            # A torn batch left by a game which crashed while writing is
+            # never appended to.
+            first, path = segments[-1]
+            entries, complete = _ReadSegment(path)
+            self._next_seq = entries[-1][0] + 1 if entries else first
+            if complete:
+                self._current = path
+            elif not entries:
+                os.remove(path)
+
+    @property
+    def next_seq(self):
+        """Sequence number of the next command."""
+        return self._next_seq
+
+    def Append(self, command):
+        """Queue a command to be written.
+
+        Returns:
+          The sequence number of the command.
+        """
+        seq = self._next_seq
+        self._next_seq += 1
+        self._queue.put((seq, time.time(), command))
+        return seq
+
+    def Start(self):
+        self._thread = threading.Thread(target=self._Run, name="history")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def Stop(self):
+        """Write the queued commands and stop the thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        else:
+            self._Write(self._Drain())
+
+    def _Run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            deadline = time.time() + self._sync_interval
+            while batch[-1] is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Queue.Empty:
+                    break
+            batch.extend(self._Drain())
+            # None is queued by Stop.
+            stop = None in batch
+            try:
+                self._Write(batch)
+            except (IOError, OSError), e:
+                # The commands are lost, but the game goes on.
+                self.error = e
+
+    def _Drain(self):
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except Queue.Empty:
+                return entries
+
+    def _Write(self, entries):
+        """Append entries as one gzip member, then rotate if needed."""
+        entries = [entry for entry in entries if entry is not None]
+        if not entries:
+            return
+        if self._current is None:
+            self._current = self._SegmentPath(entries[0][0])
+        data = "".join("%d\t%.3f\t%s\n" % entry for entry in entries)
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        with open(self._current, "ab") as f:
+            f.write(compressor.compress(data) + compressor.flush())
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        if size >= self._segment_bytes:
+            self._current = self._SegmentPath(entries[-1][0] + 1)
+            for _, path in self.Segments()[:-self._keep_segments]:
+                os.remove(path)
+
+    def _SegmentPath(self, first_seq):
+        return os.path.join(self._directory,
+                            "%s.%012d.gz" % (self._prefix, first_seq))
+
+
+def _ReadSegment(path):
+    """Read the complete lines of a segment.
+
+    Returns:
+      A tuple of (list of (seq, time, command), whether the last gzip member
+      is complete).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    chunks = []
+    complete = True
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            chunks.append(decompressor.decompress(data))
+        except zlib.error:
+            complete = False
+            break
+        data = decompressor.unused_data
+        if not data:
+            # Bytes after the end of a member are left over, but a member
+            # which is cut short takes them.
+            try:
+                decompressor.decompress("\0")
+                complete = bool(decompressor.unused_data)
+            except zlib.error:
+                complete = False
+    # The last piece is empty, or a line which is still being written.
+    lines = "".join(chunks).split("\n")[:-1]
+    entries = []
+    for line in lines:
+        seq, timestamp, command = line.split("\t", 2)
+        entries.append((int(seq), float(timestamp), command))
+    return entries, complete
+
+
+def FormatEntries(entries):
+    return ["%d\t%s\t%s" % (seq, time.strftime("%Y-%m-%d %H:%M:%S",
+                                               time.localtime(timestamp)),
+                            command)
+            for seq, timestamp, command in entries]
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    subparsers = arg_parser.add_subparsers(dest="mode")
+    tail = subparsers.add_parser("tail")
+    tail.add_argument("directory")
+    tail.add_argument("--lines", type=int, default=20)
+    tail.add_argument("--prefix", default="history")
+    range_parser = subparsers.add_parser("range")
+    range_parser.add_argument("directory")
+    range_parser.add_argument("first", type=int)
+    range_parser.add_argument("last", type=int)
+    range_parser.add_argument("--prefix", default="history")
+    args = arg_parser.parse_args(argv[1:])
+
+    if not os.path.isdir(args.directory):
+        print >> sys.stderr, "No such directory: %s" % args.directory
+        return 1
+    log = HistoryReader(args.directory, prefix=args.prefix)
+    if args.mode == "tail":
+        entries = log.Tail(args.lines)
+    else:
+        entries = log.Range(args.first, args.last)
+    print "\n".join(FormatEntries(entries))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import my_game_history
+import my_game_parser
+
+
+class TestHistoryLog(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._directory = os.path.join(self._tmp_dir, "logs")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _Commands(self, entries):
+        return [command for _, _, command in entries]
+
+    def test_write_and_read(self):
+        log = my_game_history.HistoryLog(self._directory, sync_interval=0.01)
+        log.Start()
+        for i in xrange(10):
+            self.assertEqual(log.Append("go\tright %d" % i), i)
+        log.Stop()
+        self.assertEqual(log.error, None)
+        self.assertEqual(len(log.Segments()), 1)
+        self.assertEqual(self._Commands(log.Tail(2)),
+                         ["go\tright 8", "go\tright 9"])
+        self.assertEqual([seq for seq, _, _ in log.Range(3, 5)], [3, 4, 5])
+        self.assertEqual(log.Tail(0), [])
+
+        # A new log continues the numbering in the same segment.
+        log = my_game_history.HistoryLog(self._directory)
+        self.assertEqual(log.next_seq, 10)
+        log.Append("look")
+        log.Stop()
+        self.assertEqual(len(log.Segments()), 1)
+        self.assertEqual(log.Tail(20)[-1][0::2], (10, "look"))
+        self.assertEqual(len(log.Tail(20)), 11)
+
+    def test_rotation(self):
+        log = my_game_history.HistoryLog(self._directory, segment_bytes=1,
+                                         keep_segments=3)
+        for i in xrange(5):
+            log.Append("command %d" % i)
+            log.Stop()
+        # Each write fills a segment, and only the last 3 are kept.
+        self.assertEqual([first for first, _ in log.Segments()], [2, 3, 4])
+        self.assertEqual(self._Commands(log.Tail(10)),
+                         ["command 2", "command 3", "command 4"])
+        self.assertEqual(self._Commands(log.Range(0, 3)),
+                         ["command 2", "command 3"])
+        self.assertEqual(self._Commands(log.Range(4, 100)), ["command 4"])
+
+    def test_torn_write(self):
+        log = my_game_history.HistoryLog(self._directory)
+        log.Append("one")
+        log.Stop()
+        log.Append("two")
+        log.Stop()
+        _, path = log.Segments()[0]
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data[:-5])
+        # The torn batch is read as far as it got.
+        self.assertEqual(self._Commands(log.Tail(5)), ["one", "two"])
+        with open(path, "wb") as f:
+            f.write(data[:-20])
+        self.assertEqual(self._Commands(log.Tail(5)), ["one"])
+        # New commands go to a new segment.
+        log = my_game_history.HistoryLog(self._directory)
+        self.assertEqual(log.next_seq, 1)
+        log.Append("three")
+        log.Stop()
+        self.assertEqual(len(log.Segments()), 2)
+        self.assertEqual(self._Commands(log.Tail(5)), ["one", "three"])
+
+    def test_reader_changes_nothing(self):
+        log = my_game_history.HistoryLog(self._directory)
+        log.Append("one")
+        log.Stop()
+        # A segment whose first batch is still being written.
+        path = os.path.join(self._directory, "history.000000000001.gz")
+        with open(path, "wb") as f:
+            f.write("\x1f\x8b")
+        reader = my_game_history.HistoryReader(self._directory)
+        self.assertEqual(self._Commands(reader.Tail(5)), ["one"])
+        self.assertEqual(self._Commands(reader.Range(0, 5)), ["one"])
+        self.assertEqual(my_game_history.main(
+            ["my_game_history.py", "tail", self._directory]), 0)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(len(reader.Segments()), 2)
+        # Only a writer cleans it up.
+        my_game_history.HistoryLog(self._directory)
+        self.assertFalse(os.path.exists(path))
+
+    def test_game_interface(self):
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        player, game_interface = parser.player, parser.game_interface
+        self.assertTrue(player.Start())
+        log = my_game_history.HistoryLog(self._directory)
+        game_interface.history_log = log
+        commands = ["look", "go right"] * game_interface.HISTORY_SIZE
+        for command in commands:
+            game_interface.ExecuteCommand(player, command)
+        log.Stop()
+        # Only the last commands are kept in memory, but all are logged.
+        self.assertEqual(game_interface.command_history,
+                         commands[-game_interface.HISTORY_SIZE:])
+        self.assertEqual(self._Commands(log.Tail(len(commands))), commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
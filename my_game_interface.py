@@ -1,5 +1,118 @@
+import collections
 import functools
-import os
+import inspect
+
+import my_game_output
+import my_game_stats
+
+
+# Key of the value stored at the node of a LookupIndex trie where an alias ends.
+_END = None
+
+
+def _TakesArgument(action):
+    """Whether action takes an argument after the player.
+
+    Returns:
+      True or False, or None if action can not be inspected.
+    """
+    try:
+        spec = inspect.getargspec(action)
+    except TypeError:
+        return None
+    return len(spec.args) > 1 or spec.varargs is not None
+
+
+class LookupIndex(object):
+    """Precompiled lookup structure over the alias tables of a GameInterface.
+
+    Aliases are stored in tries keyed on whole words, so a command is resolved
+    in time proportional to its number of words rather than the number of
+    aliases.
+    """
+
+    def __init__(self, move_aliases, action_aliases, direction_aliases):
+        """Build the index.
+
+        Args:
+          move_aliases:  List of move verbs.
+          action_aliases:  Dict of verb to a method of my_game_player.Player.
+          direction_aliases:  Dict of direction to a Move* method of
+            my_game_player.Player.
+        """
+        # Values at the end of verbs are (is_move, action).
+        self._verbs = {}
+        # Dict of action to whether it takes an argument, see _TakesArgument.
+        self._takes_argument = {}
+        for verb, action in action_aliases.iteritems():
+            self._Insert(self._verbs, verb, (False, action))
+            self._takes_argument[action] = _TakesArgument(action)
+        # Move aliases take precedence over actions with the same verb.
+        for verb in move_aliases:
+            self._Insert(self._verbs, verb, (True, None))
+        self._directions = {}
+        for direction, action in direction_aliases.iteritems():
+            self._Insert(self._directions, direction, action)
+
+    @staticmethod
+    def _Insert(trie, alias, value):
+        node = trie
+        for word in alias.lower().split():
+            node = node.setdefault(word, {})
+        node[_END] = value
+
+    @staticmethod
+    def _LongestMatch(trie, words, start):
+        """Find the longest alias in trie which words[start:] begins with.
+
+        Returns:
+          A tuple of (number of words matched, value), or (0, None) if no alias
+          matches.
+        """
+        node = trie
+        match = (0, None)
+        for i in xrange(start, len(words)):
+            node = node.get(words[i])
+            if node is None:
+                break
+            if _END in node:
+                match = (i - start + 1, node[_END])
+        return match
+
+    def Lookup(self, command):
+        """Look up the action for an already normalized command.
+
+        The longest matching verb wins.  For move verbs the following words
+        are looked up as a direction, ignoring any words after it.
+
+        Args:
+          command:  Lower case command stripped of punctuation.
+
+        Returns:
+          As for GameInterface.LookupAction.
+        """
+        words = command.split()
+        length, value = self._LongestMatch(self._verbs, words, 0)
+        if not length:
+            return (None, None)
+        is_move, action = value
+        if is_move:
+            # Directional move commands do not take arguments.
+            return (self._LongestMatch(self._directions, words, length)[1],
+                    None)
+        # Keep the arguments as typed, after the words of the verb.
+        parts = command.split(None, length)
+        return (action, parts[length] if len(parts) > length else "")
+
+    def TakesArgument(self, action):
+        """Whether an action of the action aliases takes an argument.
+
+        Returns:
+          True or False, or None for moves and actions which can not be
+          inspected.
+        """
+        return self._takes_argument.get(action)
+
 
 class GameInterface(object):
     """Command line interface for the game.
@@ -11,13 +124,33 @@ class GameInterface(object):
 
     EXIT_CMD = "exit"
     DEBUG_CMD = "debug"
+    HELP_CMD = "help"
+    SAVE_CMD = "save"
+    UNDO_CMD = "undo"
+    REDO_CMD = "redo"
+    UNKNOWN_MSG = "I don't understand that.  Try 'help'."
+    # Number of commands kept in memory.  A my_game_history.HistoryLog keeps
+    # all of them.
+    HISTORY_SIZE = 1000
 
     def __init__(self):
-        self._command_history = []
+        self._command_history = collections.deque(maxlen=self.HISTORY_SIZE)
+        # my_game_history.HistoryLog of every command, if there is one.
+        self._history_log = None
+        # my_game_stats.Stats of the commands, if they are measured.
+        self._stats = None
+        self._profiler = my_game_stats.Profiler()
+        # Sessions played by remote clients must not profile the server or
+        # reset the shared stats.
+        self._debug_commands = True
         self._action_aliases = {}
         self._move_aliases = []
         self._direction_aliases = {}
         self._game_text = {}
+        # Built on first use, and rebuilt after the alias tables change.
+        self._lookup_index = None
+        # my_game_save.SaveFile of the game, if it is being saved.
+        self._save_file = None
 
     @property
     def name(self):
@@ -45,7 +178,83 @@ class GameInterface(object):
 
     @property
     def command_history(self):
-        return self._command_history
+        """A new list of the last HISTORY_SIZE commands, oldest first."""
+        return list(self._command_history)
+
+    @property
+    def history_log(self):
+        return self._history_log
+
+    @history_log.setter
+    def history_log(self, h):
+        self._history_log = h
+
+    @property
+    def move_aliases(self):
+        return self._move_aliases
+
+    @property
+    def action_aliases(self):
+        return self._action_aliases
+
+    @property
+    def direction_aliases(self):
+        return self._direction_aliases
+
+    @property
+    def lookup_index(self):
+        """The LookupIndex over the current alias tables."""
+        if self._lookup_index is None:
+            self._lookup_index = LookupIndex(
+                self._move_aliases, self._action_aliases,
+                self._direction_aliases)
+        return self._lookup_index
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @stats.setter
+    def stats(self, s):
+        self._stats = s
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    @property
+    def debug_commands(self):
+        """Whether "debug ..." commands are understood."""
+        return self._debug_commands
+
+    @debug_commands.setter
+    def debug_commands(self, d):
+        self._debug_commands = d
+
+    @property
+    def save_file(self):
+        return self._save_file
+
+    @save_file.setter
+    def save_file(self, s):
+        self._save_file = s
+
+    def NewSession(self):
+        """Returns a new interface with its own command history.
+
+        The alias tables and game text are shared with this interface, not
+        copied, so they must not be changed while sessions are in use.
+        """
+        session = GameInterface()
+        session._action_aliases = self._action_aliases
+        session._move_aliases = self._move_aliases
+        session._direction_aliases = self._direction_aliases
+        session._game_text = self._game_text
+        session._lookup_index = self.lookup_index
+        # Sessions are measured together.
+        session._stats = self._stats
+        session._debug_commands = False
+        return session
 
     def AddMoveAlias(self, verb):
         """Aliase from the confirmation file for known move verbs.
@@ -57,6 +266,7 @@ class GameInterface(object):
           verb:  String representing an alias for 'move'.
         """
         self._move_aliases.append(verb)
+        self._lookup_index = None
 
     def AddActionAlias(self, verb, action):
         """Aliases from the configuration file for known game actions.
@@ -66,6 +276,7 @@ class GameInterface(object):
           action:  A method of my_game_player.Player
         """
         self._action_aliases[verb] = action
+        self._lookup_index = None
 
     def AddDirectionAlias(self, direction, action):
         """Sub-set of directions for the my_game_player.Player.Move() method
@@ -75,15 +286,25 @@ class GameInterface(object):
           action:  A Move* method of my_game_player.Player
         """
         self._direction_aliases[direction] = action
+        self._lookup_index = None
 
     def DebugInfo(self):
         return ["GAME: %s" % self.name,
                 "EXPOSITION: %s" % self.exposition,
                 "HELP: %s" % self.help]
 
+    def _AddToHistory(self, command):
+        self._command_history.append(command)
+        if self._history_log is not None:
+            self._history_log.Append(command)
+
     def LookupAction(self, command):
         """Look up the action to perform for the given command.
 
+        Aliases are matched on whole words and the longest matching alias
+        wins, e.g. "throw away" over "throw".  The arguments are the rest of
+        the command after the alias.
+
         Args:
           command:  String representing the command issued by the player.
 
@@ -94,23 +315,125 @@ class GameInterface(object):
         """
         # Strip punctuation as well as whitespace.
         command = command.strip(".,!? ").lower()
-        command_parts = command.split()
-        # First check if it is a move command.
-        for m in self._move_aliases:
-            if command.startswith(m) and m.split()[0] == command_parts[0]:
-                # If it is a move command, but we do not understand the
-                # direction, we return None.
-                # Directional move commands do not take arguments.
-                return (self._direction_aliases.get(command_parts[1], None),
-                        None)
-        # Next check for other actions
-        for a in self._action_aliases:
-            if command.startswith(a) and a.split()[0] == command_parts[0]:
-                arguments = command.replace(a, "").strip()
-                return (self._action_aliases[a], arguments)
-        return (None, None)
-
-    def Run(self, player, debug_mode=False):
+        # If it is a move command, but we do not understand the direction, the
+        # action is None.
+        return self.lookup_index.Lookup(command)
+
+    def ExecuteCommand(self, player, command):
+        """Apply a single command to the player, without any console output.
+
+        The command is recorded in the command history.
+
+        Args:
+          player:  A started my_game_player.Player object.
+          command:  String representing the command issued by the player.
+
+        Returns:
+          A tuple of (True/False, message) as returned by the player action.
+          The help command returns the help text, and commands we do not
+          understand, or actions without the item they need, return False.
+        """
+        return self._Execute(player, command)[1:]
+
+    def _Execute(self, player, command):
+        """As ExecuteCommand, but returns (action, success, message)."""
+        # Debug commands take file names, which keep their case.
+        typed = command.strip(".,!? ")
+        command = typed.lower()
+        if self._save_file is None:
+            return self._ExecuteNormalized(player, command, typed)
+        if command == self.SAVE_CMD:
+            self._AddToHistory(command)
+            if self._save_file.Save():
+                return None, True, "Game saved."
+            return None, True, "Nothing changed since the last save."
+        # Commands must not run while a checkpoint is being taken.
+        with self._save_file.lock:
+            return self._ExecuteNormalized(player, command, typed)
+
+    def _ExecuteNormalized(self, player, command, typed):
+        stats = self._stats
+        if stats is not None:
+            start = my_game_stats.Now()
+        action, arguments = self.LookupAction(command)
+        if stats is not None:
+            looked_up = my_game_stats.Now()
+            stats.Record("lookup", looked_up - start)
+        if action is not None:
+            takes_argument = self.lookup_index.TakesArgument(action)
+            if takes_argument is None:
+                takes_argument = bool(arguments)
+            if not takes_argument:
+                # Words after an action which needs none are ignored, as
+                # they are after the direction of a move.
+                success, msg = action(player)
+            elif arguments:
+                success, msg = action(player, arguments)
+            else:
+                success, msg = False, "%s what?" % command.capitalize()
+            if stats is not None:
+                name = getattr(action, "__name__", "action")
+                stats.Record(name, my_game_stats.Now() - looked_up)
+                stats.Increment(name + (".success" if success else ".failure"))
+        elif command == self.HELP_CMD:
+            success, msg = True, self.help
+        elif command == self.UNDO_CMD:
+            success, msg = player.Undo()
+        elif command == self.REDO_CMD:
+            success, msg = player.Redo()
+        elif (self._debug_commands
+              and command.split(None, 1)[:1] == [self.DEBUG_CMD]):
+            success, msg = self._Debug(player, typed.split()[1:])
+        else:
+            success, msg = False, self.UNKNOWN_MSG
+        self._AddToHistory(command)
+        if stats is not None:
+            stats.Record("turn", my_game_stats.Now() - start)
+        return action, success, msg
+
+    def _Debug(self, player, arguments):
+        """Run a "debug ..." command.
+
+        Args:
+          player:  The my_game_player.Player playing.
+          arguments:  List of the words after "debug", as typed.
+
+        Returns:
+          A tuple of (True/False, message).
+        """
+        filenames = arguments[2:]
+        arguments = [argument.lower() for argument in arguments]
+        if arguments == ["stats"]:
+            if self._stats is None:
+                return (False, "Stats are not enabled.")
+            return (True, "\n".join(self._stats.Format()))
+        if arguments == ["stats", "reset"]:
+            if self._stats is None:
+                return (False, "Stats are not enabled.")
+            self._stats.Reset()
+            return (True, "Stats reset.")
+        if arguments == ["profile", "start"]:
+            if self._profiler.running:
+                return (False, "Already profiling.")
+            self._profiler.Start()
+            return (True, "Profiling.  Use 'debug profile stop' to see the"
+                    " results.")
+        if arguments[:2] == ["profile", "stop"] and len(arguments) <= 3:
+            if not self._profiler.running:
+                return (False, "Not profiling.")
+            name = filenames[0] if filenames else self._profiler.FILENAME
+            path = self._profiler.Path(name)
+            if path is None:
+                return (False, "Give a file name without a directory.")
+            try:
+                lines = self._profiler.Stop(name)
+            except (IOError, OSError), e:
+                return (False, "Could not write %s: %s" % (path, e))
+            return (True, "\n".join(["Wrote %s" % path] + lines))
+        return (False, "Debug commands: stats, stats reset, profile start,"
+                " profile stop [file].")
+
+    def Run(self, player, debug_mode=False, output=None):
         """Main method of interaction.
 
         This method takes as a parameter the primary game interaction element,
@@ -119,30 +442,35 @@ class GameInterface(object):
 
         Args:
           player:  A my_game_player.Player object.
+          debug_mode:  Whether to draw the map before every prompt.
+          output:  A my_game_output.Output to write the game text to,
+            my_game_output.DefaultOutput() if None.
         """
+        if output is None:
+            output = my_game_output.DefaultOutput()
         player.Start()
-        os.system('cls')
-        os.system('clear')
-        print self.exposition
+        output.Clear()
+        output.Write(self.exposition)
         curr_command = None
-        while curr_command != self.EXIT_CMD:
+        try:
+            while curr_command != self.EXIT_CMD:
+                if debug_mode:
+                    output.Write("\n".join(player.GetDebugDisplay()))
+                output.Write("> ", end="")
+                output.Flush()
+                typed = raw_input()
+                curr_command = typed.strip(".,!? ").lower()
+                if curr_command == self.EXIT_CMD:
+                    self._AddToHistory(curr_command)
+                    continue
+                action, success, msg = self._Execute(player, typed)
+                if action is not None:
+                    output.Clear()
+                output.Write(msg)
+            if self._profiler.running:
+                output.Write(self._Debug(player, ["profile", "stop"])[1])
+            output.Write("Goodbye!")
             if debug_mode:
-                player.PrintDebugOutput()
-            curr_command = raw_input("> ").strip(".,!? ").lower()
-            action, arguments = self.LookupAction(curr_command)
-            if action is not None:
-                if arguments:
-                    success, msg = action(player, arguments)
-                else:
-                    success, msg = action(player)
-                os.system('cls')
-                os.system('clear')
-                print msg
-            elif curr_command == "help":
-                print self.help
-            elif curr_command != self.EXIT_CMD:
-                print "I don't understand that.  Try 'help'."
-            self._command_history.append(curr_command)
-        print "Goodbye!"
-        if debug_mode:
-            print "\n".join(self._command_history)
+                output.Write("\n".join(self._command_history))
+        finally:
+            output.Flush()
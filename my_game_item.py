@@ -1,20 +1,55 @@
-import copy
+import my_game_utils
+
+# Room states 0 to TABLE_STATES - 1 fit in a transition table, see
+# ItemDefinition.transition_table.
+TABLE_STATES = 255
+
+
+def CompileTransitionTable(state_changes):
+    """Compile state changes into a table for bytearray.translate.
+
+    Args:
+      state_changes:  Dict of old state to new state.
+
+    Returns:
+      A 256 character string which maps each state to the state it changes to,
+      or None if a state does not fit in a byte below TABLE_STATES.
+    """
+    table = bytearray(range(256))
+    for old_state, new_state in state_changes.iteritems():
+        if not (0 <= old_state < TABLE_STATES
+                and 0 <= new_state < TABLE_STATES):
+            return None
+        table[old_state] = new_state
+    return str(table)
+
 
 class ItemMapper(object):
     """Class to maintain all possible game items.
 
     This class, when instantiated, acts like a datastore mapping between a game
-    item name and a copy of that game item.
+    item name and an immutable ItemDefinition of that game item.  The
+    definitions are shared by every caller, so looking one up does not copy
+    it.
     """
 
     def __init__(self):
         # A default no-op item.
-        self._default_item = GameItem()
+        self._default_item = ItemDefinition.FromGameItem(GameItem())
         self._all_items = {}
+        # IDs of the names of the items of this world, see
+        # my_game_utils.Multiset.
+        self._names = my_game_utils.NameRegistry()
+
+    @property
+    def names(self):
+        """my_game_utils.NameRegistry of the item names of this world."""
+        return self._names
 
     @property
     def all_items(self):
-        return self._all_items
+        """A new dict of item name to ItemDefinition."""
+        return dict(self._all_items)
 
     @property
     def default_item(self):
@@ -22,30 +57,109 @@ class ItemMapper(object):
 
     @default_item.setter
     def default_item(self, i):
-        self._default_item = i
+        self._default_item = ItemDefinition.FromGameItem(i)
 
     def AddItem(self, name, item):
-        """Add or potentially override an existing entry with a copy of item.
+        """Add or potentially override an existing entry with a frozen item.
+
+        Later changes to item do not affect the stored definition.
 
         Args:
           name:  String name of item.
-          item:  A GameItem object.
+          item:  A GameItem or ItemDefinition object.
         """
-        self._all_items[name] = copy.deepcopy(item)
+        # Items are registered as they are parsed, before the map, so the
+        # items of [ITEMS] have the smallest IDs.
+        self._names.Id(name)
+        self._all_items[name] = ItemDefinition.FromGameItem(item)
 
     def GetItem(self, name):
         """Returns the named item.
 
-        Caller takes control of the returned object.
+        The returned definition is shared and immutable.
 
         Args:
           name:  Name of item to get.
         
         Returns:
-          A copy of the stored item if found.  Otherwise, returns the default
+          The stored ItemDefinition if found.  Otherwise, returns the default
           item.
         """
-        return copy.deepcopy(self._all_items.get(name, self._default_item))
+        return self._all_items.get(name, self._default_item)
+
+
+class ItemDefinition(object):
+    """The shared, immutable definition of a game item.
+
+    Holds the same name, state changes and reusable flag as a GameItem, but
+    none of them can be changed once it is made, so one definition can be
+    handed to every player without copying.  The state an item is in during a
+    game (which room or inventory holds it) is kept by its owner, not here.
+    """
+
+    __slots__ = ("_name", "_state_changes", "_reusable", "_radius",
+                 "_transition_table")
+
+    def __init__(self, name, state_changes, reusable, radius=0):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_state_changes", dict(state_changes))
+        object.__setattr__(self, "_reusable", reusable)
+        object.__setattr__(self, "_radius", radius)
+        object.__setattr__(self, "_transition_table",
+                           CompileTransitionTable(state_changes))
+
+    @classmethod
+    def FromGameItem(cls, item):
+        """Returns a frozen definition of item, or item if already frozen."""
+        if isinstance(item, cls):
+            return item
+        return cls(item.name, item.state_changes, item.reusable, item.radius)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ItemDefinition is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ItemDefinition is immutable")
+
+    def __eq__(self, o):
+        return self._name == o.name
+
+    @property
+    def sort_id(self):
+        return self._name
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def state_changes(self):
+        """A new dict of old state to new state."""
+        return dict(self._state_changes)
+
+    @property
+    def reusable(self):
+        return self._reusable
+
+    @property
+    def radius(self):
+        return self._radius
+
+    @property
+    def transition_table(self):
+        """State changes compiled by CompileTransitionTable, or None."""
+        return self._transition_table
+
+    def __str__(self):
+        return self._name
+
+    def UseItem(self, curr_state):
+        """As GameItem.UseItem."""
+        return self._state_changes.get(curr_state, curr_state)
+
+    def DebugInfo(self):
+        return _DebugInfo(self._name, self._state_changes, self._reusable,
+                          self._radius)
 
 
 class GameItem(object):
@@ -56,12 +170,16 @@ class GameItem(object):
     in a dict.  If the state of the room where the item is being used does not
     have an entry in this dict, there is no effect and the state remains
     unchanged.
+
+    An item with a radius greater than 0 affects every room within that many
+    rooms of the player, in a square around the player, at once.
     """
 
     def __init__(self):
         self._name = None
         self._state_changes = {}
         self.reusable = True
+        self._radius = 0
 
     def __eq__(self, o):
         return self._name == o.name
@@ -78,6 +196,10 @@ class GameItem(object):
     def name(self, n):
         self._name = n
 
+    @property
+    def state_changes(self):
+        return self._state_changes
+
     @property
     def reusable(self):
         return self._reusable
@@ -86,6 +208,15 @@ class GameItem(object):
     def reusable(self, n):
         self._reusable = n
 
+    @property
+    def radius(self):
+        return self._radius
+
+    @radius.setter
+    def radius(self, r):
+        assert r >= 0
+        self._radius = r
+
     def AddStateChange(self, old_state, new_state):
         """Add or update ability to change a room from old_state to new_state.
 
@@ -116,10 +247,18 @@ class GameItem(object):
         return curr_state
 
     def DebugInfo(self):
-        output = []
-        for old_state, new_state in self._state_changes.iteritems():
-            output.append("change %d to %d" % (old_state, new_state))
-        return ["%s can:" % self._name] + sorted(output) + [
-            "reusable: %s" % ("yes" if self._reusable else "no")]
+        return _DebugInfo(self._name, self._state_changes, self._reusable,
+                          self._radius)
+
+
+def _DebugInfo(name, state_changes, reusable, radius):
+    output = []
+    for old_state, new_state in state_changes.iteritems():
+        output.append("change %d to %d" % (old_state, new_state))
+    output = ["%s can:" % name] + sorted(output) + [
+        "reusable: %s" % ("yes" if reusable else "no")]
+    if radius:
+        output.append("radius: %d" % radius)
+    return output
                   
         
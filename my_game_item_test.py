@@ -28,6 +28,36 @@ class TestItemMapper(unittest.TestCase):
         self.assertEqual(item.UseItem(3), 2)
         self.assertEqual(stored_item.UseItem(3), 3)
 
+    def test_names(self):
+        other = my_game_item.ItemMapper()
+        self.item_mapper.AddItem("A", my_game_item.GameItem())
+        self.item_mapper.AddItem("B", my_game_item.GameItem())
+        other.AddItem("B", my_game_item.GameItem())
+        self.assertEqual(self.item_mapper.names.Find("B"), 1)
+        self.assertEqual(other.names.Find("B"), 0)
+        self.assertEqual(other.names.Find("A"), None)
+
+    def test_shared_immutable_item(self):
+        item = my_game_item.GameItem()
+        item.name = "A"
+        item.AddStateChange(1, 0)
+        self.item_mapper.AddItem("A", item)
+        stored_item = self.item_mapper.GetItem("A")
+        # Lookups share one definition instead of copying it.
+        self.assertTrue(stored_item is self.item_mapper.GetItem("A"))
+        self.assertRaises(AttributeError, setattr, stored_item, "reusable",
+                          False)
+        self.assertRaises(AttributeError, setattr, stored_item, "_name", "B")
+        stored_item.state_changes[2] = 0
+        self.assertEqual(stored_item.UseItem(2), 2)
+        self.item_mapper.all_items["B"] = item
+        self.assertEqual(self.item_mapper.all_items.keys(), ["A"])
+        self.assertEqual(stored_item.DebugInfo(),
+                         ["A can:", "change 1 to 0", "reusable: yes"])
+        # Adding a definition stores it as is.
+        self.item_mapper.AddItem("B", stored_item)
+        self.assertTrue(self.item_mapper.GetItem("B") is stored_item)
+
     def test_add_item(self):
         item_1 = my_game_item.GameItem()
         item_1.AddStateChange(1, 0)
@@ -76,6 +106,21 @@ class TestGameItem(unittest.TestCase):
                           "change 3 to 1",
                           "reusable: no"])
 
+    def test_radius(self):
+        self.game_item.radius = 3
+        self.assertEqual(self.game_item.DebugInfo()[-1], "radius: 3")
+        item = my_game_item.ItemDefinition.FromGameItem(self.game_item)
+        self.assertEqual(item.radius, 3)
+        self.assertEqual(item.DebugInfo(), self.game_item.DebugInfo())
+
+    def test_transition_table(self):
+        item = my_game_item.ItemDefinition.FromGameItem(self.game_item)
+        self.assertEqual(bytearray([0, 1, 2, 3, 4]).translate(
+            item.transition_table), bytearray([0, 0, 0, 1, 4]))
+        self.game_item.AddStateChange(300, 0)
+        item = my_game_item.ItemDefinition.FromGameItem(self.game_item)
+        self.assertEqual(item.transition_table, None)
+
     def test_usage(self):
         self.assertEqual(self.game_item.UseItem(1), 0)
         self.assertEqual(self.game_item.UseItem(2), 0)
@@ -0,0 +1,122 @@
+"""Journal of player actions for undo and redo.
+
+Instead of copying the player and map before every command, each action which
+changes the game records small tuples describing what it changed, e.g. that
+an item moved from a room into the inventory.  Undoing an action applies its
+tuples backwards, and redoing applies them forwards, so a step costs as much
+as the action itself did.  The tuples only refer to coordinates, states and
+item names, so rooms and the inventory are never copied.
+
+The journal keeps at most depth actions.
+"""
+import collections
+
+
+# Operations, the first element of each recorded tuple.
+# (MOVE, old y, old x, new y, new x)
+MOVE = 0
+# (TAKE, y, x, item):  An item moved from the room at (y, x) to the inventory.
+TAKE = 1
+# (DROP, y, x, item):  An item moved from the inventory to the room at (y, x).
+DROP = 2
+# (USE_UP, item):  An item was removed from the inventory.
+USE_UP = 3
+# (STATE, y, x, old state, new state)
+STATE = 4
+
+
+class Journal(object):
+    """Bounded undo and redo history of the actions of one player."""
+
+    # Actions which change more than this many things, e.g. using an item on a
+    # huge area, clear the journal instead of being recorded.  Their
+    # operations are dropped as soon as there are too many, so an open group
+    # never holds more than this.
+    MAX_OPERATIONS = 10000
+
+    def __init__(self, depth=100):
+        """Create a journal.
+
+        Args:
+          depth:  Number of actions which can be undone.
+        """
+        self._undo = collections.deque(maxlen=depth)
+        self._redo = []
+        # Operations of the action being recorded, and how many Begin calls
+        # are open.
+        self._operations = []
+        self._nesting = 0
+        # Whether the action being recorded has too many operations to undo.
+        self._too_large = False
+
+    @property
+    def depth(self):
+        return self._undo.maxlen
+
+    @property
+    def undo_count(self):
+        return len(self._undo)
+
+    @property
+    def redo_count(self):
+        return len(self._redo)
+
+    def Begin(self):
+        """Group the operations recorded until the matching Commit."""
+        self._nesting += 1
+
+    def Commit(self):
+        """End a group started by Begin."""
+        self._nesting -= 1
+        if not self._nesting:
+            operations = self._operations
+            self._operations = []
+            if self._too_large:
+                # The action can not be undone, and neither can the ones
+                # before it, whose changes it may have overwritten.
+                self._too_large = False
+                self.Clear()
+            else:
+                self._Push(operations)
+
+    def Record(self, operation):
+        """Record one operation, as its own action unless a group is open."""
+        if not self._nesting:
+            self._Push([operation])
+        elif not self._too_large:
+            self._operations.append(operation)
+            if len(self._operations) > self.MAX_OPERATIONS:
+                self._operations = []
+                self._too_large = True
+
+    def _Push(self, operations):
+        if not operations:
+            return
+        self._redo = []
+        self._undo.append(tuple(operations))
+
+    def PopUndo(self):
+        """Returns the operations of the last action to undo, or None.
+
+        The action moves to the redo history.
+        """
+        if not self._undo:
+            return None
+        operations = self._undo.pop()
+        self._redo.append(operations)
+        return operations
+
+    def PopRedo(self):
+        """Returns the operations of the last undone action, or None.
+
+        The action moves back to the undo history.
+        """
+        if not self._redo:
+            return None
+        operations = self._redo.pop()
+        self._undo.append(operations)
+        return operations
+
+    def Clear(self):
+        self._undo.clear()
+        self._redo = []
@@ -0,0 +1,121 @@
+import unittest
+
+import my_game_journal
+import my_game_parser
+
+
+class TestJournal(unittest.TestCase):
+
+    def test_undo_and_redo(self):
+        journal = my_game_journal.Journal(depth=2)
+        self.assertEqual(journal.depth, 2)
+        self.assertEqual(journal.PopUndo(), None)
+        self.assertEqual(journal.PopRedo(), None)
+        journal.Record((my_game_journal.USE_UP, "a"))
+        journal.Begin()
+        journal.Record((my_game_journal.USE_UP, "b"))
+        journal.Begin()
+        journal.Record((my_game_journal.USE_UP, "c"))
+        journal.Commit()
+        self.assertEqual(journal.undo_count, 1)
+        journal.Commit()
+        self.assertEqual(journal.undo_count, 2)
+        self.assertEqual(journal.PopUndo(), ((my_game_journal.USE_UP, "b"),
+                                             (my_game_journal.USE_UP, "c")))
+        self.assertEqual((journal.undo_count, journal.redo_count), (1, 1))
+        self.assertEqual(journal.PopRedo(), ((my_game_journal.USE_UP, "b"),
+                                             (my_game_journal.USE_UP, "c")))
+        self.assertEqual(journal.PopRedo(), None)
+        journal.PopUndo()
+        # A new action can't be redone over.
+        journal.Record((my_game_journal.USE_UP, "d"))
+        self.assertEqual(journal.redo_count, 0)
+        # Only the last depth actions are kept.
+        journal.Record((my_game_journal.USE_UP, "e"))
+        self.assertEqual(journal.undo_count, 2)
+        self.assertEqual(journal.PopUndo(), ((my_game_journal.USE_UP, "e"),))
+        self.assertEqual(journal.PopUndo(), ((my_game_journal.USE_UP, "d"),))
+        self.assertEqual(journal.PopUndo(), None)
+
+    def test_empty_and_large_actions(self):
+        journal = my_game_journal.Journal()
+        journal.Begin()
+        journal.Commit()
+        self.assertEqual(journal.undo_count, 0)
+        journal.Record((my_game_journal.USE_UP, "a"))
+        journal.Begin()
+        for _ in xrange(journal.MAX_OPERATIONS * 3):
+            journal.Record((my_game_journal.USE_UP, "a"))
+            # The open group does not grow past the limit.
+            self.assertTrue(len(journal._operations)
+                            <= journal.MAX_OPERATIONS)
+        journal.Commit()
+        self.assertEqual(journal.undo_count, 0)
+        # Later actions are recorded again.
+        journal.Begin()
+        journal.Record((my_game_journal.USE_UP, "a"))
+        journal.Commit()
+        self.assertEqual(journal.undo_count, 1)
+
+
+class TestUndo(unittest.TestCase):
+
+    def setUp(self):
+        self._player, self._game_interface = self._NewGame()
+        self._player.journal = my_game_journal.Journal()
+
+    def _NewGame(self):
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        self.assertTrue(parser.player.Start())
+        return parser.player, parser.game_interface
+
+    def _Play(self, commands):
+        return [self._game_interface.ExecuteCommand(self._player, command)
+                for command in commands]
+
+    def _State(self, player):
+        return (player.y_pos, player.x_pos, player.inventory,
+                player.curr_room.state,
+                [(y, x, room.state, room.contents)
+                 for y, x, room in player.game_map.IterRooms()])
+
+    def test_undo_everything(self):
+        start = self._State(self._player)
+        commands = ["take foam", "go right", "take foam", "drop foam",
+                    "go down", "use co2", "look", "go to 5, 4",
+                    "use foam", "take bogus"]
+        states = [start]
+        for command in commands:
+            self._Play([command])
+            states.append(self._State(self._player))
+        # Commands which changed nothing are not undone.
+        changed = [i for i in xrange(len(commands))
+                   if states[i] != states[i + 1]]
+        for i in reversed(changed):
+            self.assertTrue(self._Play(["undo"])[0][0])
+            self.assertEqual(self._State(self._player), states[i])
+        self.assertEqual(self._Play(["undo"]),
+                         [(False, "Nothing to undo.")])
+        self.assertEqual(self._State(self._player), start)
+        for i in changed:
+            self.assertTrue(self._Play(["redo"])[0][0])
+            self.assertEqual(self._State(self._player), states[i + 1])
+        self.assertEqual(self._Play(["redo"]),
+                         [(False, "Nothing to redo.")])
+
+    def test_travel_is_one_action(self):
+        self._Play(["go to 5, 4"])
+        self.assertEqual((self._player.y_pos, self._player.x_pos), (5, 4))
+        self._Play(["undo"])
+        self.assertEqual((self._player.y_pos, self._player.x_pos), (0, 4))
+        self.assertEqual(self._player.journal.undo_count, 0)
+
+    def test_disabled(self):
+        player, game_interface = self._NewGame()
+        self.assertEqual(game_interface.ExecuteCommand(player, "undo"),
+                         (False, "Undo is not enabled."))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,270 @@
+import heapq
+
+import my_game_path
+
+
 class GameMapError(Exception):
     pass
 
+
+class MapStorage(object):
+    """Interface for the cells of a GameMap.
+
+    Subclasses implement Get, Set and Iter and the cells property.  The hooks
+    below are no-ops for storage which keeps every room in memory.
+    """
+
+    def MarkChanged(self, y, x):
+        """Called after the state or contents of the room at (y, x) changed."""
+        pass
+
+    def PageAround(self, y, x, session=None):
+        """Called when the player arrives at (y, x).
+
+        session is the OverlayMap of the player if the storage is shared by
+        several sessions, None for the player of the map itself.
+        """
+        pass
+
+    def IsPinned(self, y, x, session=None):
+        """Whether (y, x) is kept in memory around the player of session, so
+        reading it pages nothing in."""
+        return True
+
+    def Flush(self):
+        """Write any changes back to where the storage was loaded from."""
+        pass
+
+
+class DenseStorage(MapStorage):
+    """Stores every cell of the map in a two-dimensional list."""
+
+    STORAGE_TYPE = "dense"
+
+    def __init__(self, height, width):
+        self._rows = [[None] * width for _ in range(height)]
+
+    @property
+    def cells(self):
+        return self._rows
+
+    def Get(self, y, x):
+        return self._rows[y][x]
+
+    def Set(self, y, x, room):
+        self._rows[y][x] = room
+
+    def Iter(self):
+        """Yields (y, x, room) for every room in row-major order."""
+        for y, row in enumerate(self._rows):
+            for x, room in enumerate(row):
+                if room is not None:
+                    yield y, x, room
+
+
+class SparseStorage(MapStorage):
+    """Stores only the cells which hold rooms in a dict keyed by (y, x)."""
+
+    STORAGE_TYPE = "sparse"
+
+    def __init__(self, height, width):
+        self._cells = {}
+
+    @property
+    def cells(self):
+        return self._cells
+
+    def Get(self, y, x):
+        return self._cells.get((y, x))
+
+    def Set(self, y, x, room):
+        if room is None:
+            self._cells.pop((y, x), None)
+        else:
+            self._cells[(y, x)] = room
+
+    def Iter(self):
+        for (y, x) in sorted(self._cells):
+            yield y, x, self._cells[(y, x)]
+
+
+class ChunkedStorage(MapStorage):
+    """Stores the map as fixed-size square chunks, allocated on demand.
+
+    A chunk is a flat list of CHUNK_SIZE * CHUNK_SIZE cells which is only
+    allocated once a room is placed in it, and freed once it is empty again.
+    """
+
+    STORAGE_TYPE = "chunked"
+    CHUNK_SIZE = 32
+
+    def __init__(self, height, width, chunk_size=CHUNK_SIZE):
+        self._chunk_size = chunk_size
+        # Dict of (chunk y, chunk x) to [number of rooms, cells].
+        self._chunks = {}
+
+    @property
+    def cells(self):
+        return self._chunks
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    def Get(self, y, x):
+        size = self._chunk_size
+        chunk = self._chunks.get((y // size, x // size))
+        if chunk is None:
+            return None
+        return chunk[1][(y % size) * size + x % size]
+
+    def Set(self, y, x, room):
+        size = self._chunk_size
+        key = (y // size, x // size)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            if room is None:
+                return
+            chunk = self._chunks[key] = [0, [None] * (size * size)]
+        i = (y % size) * size + x % size
+        chunk[0] += (room is not None) - (chunk[1][i] is not None)
+        chunk[1][i] = room
+        if not chunk[0]:
+            del self._chunks[key]
+
+    def Iter(self):
+        size = self._chunk_size
+        rooms = []
+        for (cy, cx), (_, cells) in self._chunks.iteritems():
+            for i, room in enumerate(cells):
+                if room is not None:
+                    rooms.append((cy * size + i // size, cx * size + i % size,
+                                  room))
+        rooms.sort(key=lambda r: (r[0], r[1]))
+        return iter(rooms)
+
+
+class StateGrid(object):
+    """Mirror of the states of every room of a map, one byte per cell.
+
+    Each row of the map is a bytearray, so an item's transition table (see
+    my_game_item.CompileTransitionTable) is applied to a whole span of a row
+    with one bytearray.translate call instead of room by room.
+
+    The grid has a byte for every cell, so it is only built for dense maps,
+    which already have a cell for every coordinate.  The grid of an OverlayMap
+    shares the rows of its template's grid, and copies a row the first time
+    it changes.
+    """
+
+    # Byte of a cell without a room.  No transition table maps it.
+    NO_ROOM = 255
+
+    def __init__(self, height, width):
+        self._rows = [bytearray(chr(self.NO_ROOM) * width)
+                      for _ in xrange(height)]
+        # Indexes of the rows which belong to another grid, see Share.
+        self._shared = set()
+        # Dict of table to the states it changes, as characters.
+        self._changing = {}
+
+    @classmethod
+    def Share(cls, base):
+        """Returns a grid with the states of base, sharing its rows.
+
+        Rows are copied the first time they change, so base never changes.
+        base must not change while the new grid is in use.
+        """
+        grid = cls.__new__(cls)
+        grid._rows = list(base._rows)
+        grid._shared = set(xrange(len(grid._rows)))
+        grid._changing = base._changing
+        return grid
+
+    def _OwnRow(self, y):
+        """Returns row y, copying it first if it is shared."""
+        if y in self._shared:
+            self._shared.discard(y)
+            self._rows[y] = bytearray(self._rows[y])
+        return self._rows[y]
+
+    @classmethod
+    def FromStates(cls, height, width, states):
+        """Build a grid.
+
+        Args:
+          height:  Height of the map.
+          width:  Width of the map.
+          states:  Iterable of (y, x, state) of each room.
+
+        Returns:
+          A StateGrid, or None if a state does not fit in a byte below NO_ROOM.
+        """
+        grid = cls(height, width)
+        for y, x, state in states:
+            if not grid.Set(y, x, state):
+                return None
+        return grid
+
+    @property
+    def rows(self):
+        return self._rows
+
+    def Get(self, y, x):
+        """Returns the state at (y, x), or None if there is no room."""
+        state = self._rows[y][x]
+        return None if state == self.NO_ROOM else state
+
+    def Set(self, y, x, state):
+        """Set the state at (y, x), None for no room.
+
+        Returns:
+          False if the state does not fit in the grid, True otherwise.
+        """
+        if state is None:
+            state = self.NO_ROOM
+        elif not (isinstance(state, (int, long))
+                  and 0 <= state < self.NO_ROOM):
+            return False
+        if self._rows[y][x] != state:
+            self._OwnRow(y)[x] = state
+        return True
+
+    def Apply(self, table, y0, x0, y1, x1):
+        """Apply a transition table to the rectangle [y0, y1) x [x0, x1).
+
+        Args:
+          table:  A 256 character translation table.
+          y0, x0, y1, x1:  Rectangle, already clipped to the map.
+
+        Returns:
+          A list of (y, x, new state) for each cell which changed.
+        """
+        # Only cells whose state the table changes need to be found.
+        changing = self._changing.get(table)
+        if changing is None:
+            changing = self._changing[table] = [
+                chr(s) for s in xrange(self.NO_ROOM) if table[s] != chr(s)]
+        changes = []
+        for y in xrange(y0, y1):
+            row = self._rows[y]
+            span = row[x0:x1]
+            new_span = span.translate(table)
+            if new_span == span:
+                continue
+            for c in changing:
+                x = span.find(c)
+                while x != -1:
+                    changes.append((y, x0 + x, new_span[x]))
+                    x = span.find(c, x + 1)
+            self._OwnRow(y)[x0:x1] = new_span
+        return changes
+
+
 class GameMap(object):
     """Object representing game map state.
 
-    The map is represented by a two-dimensional list with the origin at the top
+    The map is represented by a two-dimensional grid with the origin at the top
     left hand corner.  Each room has an (y, x) coordinate to facilitate easier
     spacial reasoning, i.e.:
 
@@ -15,16 +275,60 @@ class GameMap(object):
       |                         |
       V                         V
     (h, 0) -----------------> (h, w)
+
+    How the grid is stored is chosen by the storage type:
+      dense:  A list of lists with a cell for every coordinate.  This is the
+        default and the fastest for small or mostly full maps.
+      sparse:  A dict of only the coordinates which hold rooms.
+      chunked:  Square chunks of cells which are only allocated when they hold
+        rooms.
     """
 
+    STORAGE_TYPES = {
+        "dense": DenseStorage,
+        "sparse": SparseStorage,
+        "chunked": ChunkedStorage,
+        }
+
     def __init__(self):
-        self._game_map = None
+        self._storage = None
+        self._storage_type = "dense"
         self._height = None
         self._width = None
+        # StateGrid built on the first area use of a dense map, False if the
+        # states do not fit in one.
+        self._state_grid = None
+        # my_game_path.ConnectivityIndex, dropped when rooms are added or
+        # removed.
+        self._connectivity = None
+        # Incremented whenever a room is added or removed.
+        self._topology_version = 0
+        # Set of (y, x) of the rooms changed since the last TakeDirty, None
+        # until changes are tracked.
+        self._dirty = None
 
     @property
     def game_map(self):
-        return self._game_map
+        """The underlying cells of the storage, None until initialized."""
+        if self._storage is None:
+            return None
+        return self._storage.cells
+
+    @property
+    def initialized(self):
+        return self._storage is not None
+
+    @property
+    def storage(self):
+        return self._storage_type
+
+    @storage.setter
+    def storage(self, s):
+        if s not in self.STORAGE_TYPES:
+            raise GameMapError("Unknown map storage: %s" % s)
+        if self._storage is not None:
+            raise GameMapError("Storage must be set before initializing")
+        self._storage_type = s
 
     @property
     def height(self):
@@ -44,17 +348,25 @@ class GameMap(object):
         assert w > 0
         self._width = w
 
-    def Initialize(self):
+    def Initialize(self, storage=None):
         """Initialize an empty game map with the current dimensions.
 
+        Args:
+          storage:  Optional MapStorage to use, e.g. a
+            my_game_region.RegionStorage, instead of a new empty storage of
+            the current storage type.
+
         Raises:
           GameMapError if the dimensions have not been set.
         """
         if not self.height or not self.width:
             raise GameMapError("Map is not set")
-        self._game_map = []
-        for h in range(self.height):
-            self.game_map.append([None] * self.width)
+        if storage is not None:
+            self._storage_type = storage.STORAGE_TYPE
+            self._storage = storage
+            return
+        self._storage = self.STORAGE_TYPES[self._storage_type](
+            self.height, self.width)
 
     def SetRoom(self, y, x, room):
         """Define the room at a given coordinate.
@@ -76,10 +388,48 @@ class GameMap(object):
           GameMapError if you try to set a value which is outside the
             dimensions of the map.
         """
-        if y < 0 or y >= self.height or x < 0 or x >= self.width:
+        if (self._storage is None
+            or y < 0 or y >= self.height or x < 0 or x >= self.width):
             raise GameMapError("Invalid space (%d, %d)", y, x)
-        self.game_map[y][x] = room
-        return self.game_map[y][x]
+        if (room is None) != (self._storage.Get(y, x) is None):
+            self._connectivity = None
+            self._topology_version += 1
+        self._storage.Set(y, x, room)
+        self._UpdateStateGrid(y, x, room)
+        self._MarkDirty(y, x)
+        return room
+
+    def SetRooms(self, rooms):
+        """As SetRoom for each (y, x, room) of an iterable, in order.
+
+        This is faster than calling SetRoom for each room, e.g. to build a
+        map from a parsed config.
+
+        Raises:
+          GameMapError as SetRoom on the first room which is outside the
+            dimensions of the map.  The rooms before it are set.
+        """
+        if self._storage is None:
+            raise GameMapError("Map is not set")
+        height = self.height
+        width = self.width
+        get = self._storage.Get
+        set_room = self._storage.Set
+        topology_changed = False
+        try:
+            for y, x, room in rooms:
+                if y < 0 or y >= height or x < 0 or x >= width:
+                    raise GameMapError("Invalid space (%d, %d)", y, x)
+                if (room is None) != (get(y, x) is None):
+                    topology_changed = True
+                set_room(y, x, room)
+                if self._state_grid or self._dirty is not None:
+                    self._UpdateStateGrid(y, x, room)
+                    self._MarkDirty(y, x)
+        finally:
+            if topology_changed:
+                self._connectivity = None
+                self._topology_version += 1
 
     def GetRoom(self, y, x):
         """Get object at location.
@@ -93,17 +443,185 @@ class GameMap(object):
           coordinate has not been defined or if the request position is out of
           bounds.
         """
-        if y < 0 or y >= self.height or x < 0 or x >= self.width:
+        if (self._storage is None
+            or y < 0 or y >= self.height or x < 0 or x >= self.width):
             return None
-        return self.game_map[y][x]
-    
+        return self._storage.Get(y, x)
+
+    def HasRoom(self, y, x):
+        """Returns True iff there is a room at (y, x)."""
+        return self.GetRoom(y, x) is not None
+
+    def PeekRoom(self, y, x):
+        """As GetRoom, for a caller which only reads the room."""
+        return self.GetRoom(y, x)
+
+    def MarkChanged(self, y, x):
+        """Record that the state or contents of the room at (y, x) changed.
+
+        Callers which change a room returned by GetRoom must call this so that
+        storage backed by files writes the room back.
+        """
+        if self._storage is not None:
+            self._storage.MarkChanged(y, x)
+            self._UpdateStateGrid(y, x, self._storage.Get(y, x))
+            self._MarkDirty(y, x)
+
+    def _MarkStorageChanged(self, y, x):
+        """As MarkChanged, for a change the state grid already has."""
+        self._storage.MarkChanged(y, x)
+        self._MarkDirty(y, x)
+
+    def TakeDirty(self):
+        """Returns the set of (y, x) of the rooms changed since the last call.
+
+        Changes are only tracked after the first call, which returns an empty
+        set, so that building a map does not keep a set of every room.
+        """
+        dirty = self._dirty or set()
+        self._dirty = set()
+        return dirty
+
+    def _MarkDirty(self, y, x):
+        if self._dirty is not None:
+            self._dirty.add((y, x))
+
+    def _UpdateStateGrid(self, y, x, room):
+        if self._state_grid and not self._state_grid.Set(
+                y, x, None if room is None else room.state):
+            self._state_grid = False
+
+    @property
+    def state_grid(self):
+        """StateGrid mirroring the room states.
+
+        None unless the map is dense, or if the states do not fit.  A grid of
+        a sparse or chunked map would take far more memory than its rooms,
+        and one of a region map would page in every chunk.
+        """
+        if not self.initialized or self.storage != "dense":
+            return None
+        if self._state_grid is None:
+            self._state_grid = StateGrid.FromStates(
+                self.height, self.width, self.IterStates()) or False
+        return self._state_grid or None
+
+    @property
+    def topology_version(self):
+        """Number which changes whenever a room is added or removed."""
+        return self._topology_version
+
+    @property
+    def connectivity(self):
+        """my_game_path.ConnectivityIndex of the rooms of this map."""
+        if self._connectivity is None:
+            self._connectivity = my_game_path.ConnectivityIndex(self)
+        return self._connectivity
+
+    def IterStates(self):
+        """Yields (y, x, state) for every defined room."""
+        for y, x, room in self.IterRooms():
+            yield y, x, room.state
+
+    def UseItemInArea(self, item, y, x, with_states=False):
+        """Use an item on every room within item.radius of (y, x).
+
+        Uses the state grid when the map is dense and the item and the room
+        states fit in one, and UseItemInAreaByRoom otherwise.
+
+        Args:
+          item:  A my_game_item.ItemDefinition.
+          y:  Y-coordinate of the center of the area.
+          x:  X-coordinate of the center of the area.
+          with_states:  Whether to include the old and new states in the
+            result.
+
+        Returns:
+          A list of (y, x) of the rooms whose state changed, or of (y, x, old
+          state, new state) if with_states is True.
+        """
+        table = item.transition_table
+        grid = self.state_grid if table is not None else None
+        if grid is None:
+            return self.UseItemInAreaByRoom(item, y, x, with_states)
+        changes = grid.Apply(table, *self._Area(item.radius, y, x))
+        # The area is within the map, so skip GetRoom's bounds checks.
+        get_room = (self._storage.Get if self._storage is not None
+                    else self.GetRoom)
+        changed = []
+        for y, x, state in changes:
+            room = get_room(y, x)
+            if with_states:
+                changed.append((y, x, room.state, state))
+            else:
+                changed.append((y, x))
+            room.state = state
+            self._MarkStorageChanged(y, x)
+        return changed
+
+    def UseItemInAreaByRoom(self, item, y, x, with_states=False):
+        """As UseItemInArea, but changes the rooms one at a time."""
+        y0, x0, y1, x1 = self._Area(item.radius, y, x)
+        changed = []
+        for y in xrange(y0, y1):
+            for x in xrange(x0, x1):
+                room = self.GetRoom(y, x)
+                if room is None:
+                    continue
+                old_state = room.state
+                if room.TryChangeState(item.UseItem(old_state)):
+                    self.MarkChanged(y, x)
+                    if with_states:
+                        changed.append((y, x, old_state, room.state))
+                    else:
+                        changed.append((y, x))
+        return changed
+
+    def _Area(self, radius, y, x):
+        """Returns the square (y0, x0, y1, x1) around (y, x) within the map."""
+        return (max(0, y - radius), max(0, x - radius),
+                min(self.height, y + radius + 1),
+                min(self.width, x + radius + 1))
+
+    def IsPinned(self, y, x, session=None):
+        """Whether the room at (y, x) can be read without paging anything in.
+
+        Always True unless the map is paged in from disk, e.g. by a
+        my_game_region.RegionStorage.
+
+        Args:
+          session:  OverlayMap asking, see MapStorage.PageAround.
+        """
+        return (self._storage is not None
+                and self._storage.IsPinned(y, x, session=session))
+
+    def PageAround(self, y, x, session=None):
+        """Let the storage prepare the part of the map around the player.
+
+        Args:
+          session:  OverlayMap of the player, see MapStorage.PageAround.
+        """
+        if self._storage is not None:
+            self._storage.PageAround(y, x, session=session)
+
+    def Flush(self):
+        """Write any changed rooms back to the files the map was loaded from."""
+        if self._storage is not None:
+            self._storage.Flush()
+
+    def IterRooms(self):
+        """Yields (y, x, room) for every defined room in row-major order."""
+        if self._storage is None:
+            return iter([])
+        return self._storage.Iter()
+
     def DebugInfo(self, y_player=None, x_player=None):
         """Debug method to visualize game board."""
         output_rows = []
         for y in range(self.height):
             curr_row = []
             for x in range(self.width):
-                if self.game_map[y][x] is not None:
+                if self.HasRoom(y, x):
                     if (y_player is not None
                         and x_player is not None
                         and y == y_player
@@ -121,3 +639,150 @@ class GameMap(object):
         for r in self.DebugInfo(y_player=y_player, x_player=x_player):
             print "|%s|" % r
         print "+%s+" % ("-" * self.width)
+
+
+class OverlayMap(GameMap):
+    """A per-session, mutable view of a shared template GameMap.
+
+    Rooms are copied from the template the first time they are requested, so
+    creating a session only costs the rooms the player actually visits and the
+    template itself is never modified.
+    """
+
+    def __init__(self, template):
+        """Create an overlay.
+
+        Args:
+          template:  A GameMap of my_game_room.Room objects which must not
+            change while this overlay is in use.
+        """
+        super(OverlayMap, self).__init__()
+        self._template = template
+        self._height = template.height
+        self._width = template.width
+        # Dict of (y, x) to the session's copy of the room, or None if the room
+        # was removed in this session.
+        self._rooms = {}
+        # Until rooms are added or removed, the template's connectivity
+        # applies.
+        self._topology_changed = False
+
+    @property
+    def template(self):
+        return self._template
+
+    @property
+    def game_map(self):
+        return self._template.game_map
+
+    @property
+    def initialized(self):
+        return self._template.initialized
+
+    @property
+    def storage(self):
+        return self._template.storage
+
+    @property
+    def state_grid(self):
+        """As GameMap.state_grid, sharing the rows of the template's grid."""
+        if self._state_grid is None:
+            template_grid = self._template.state_grid
+            grid = None
+            if template_grid is not None:
+                grid = StateGrid.Share(template_grid)
+                for (y, x), room in self._rooms.iteritems():
+                    if not grid.Set(y, x, None if room is None else room.state):
+                        grid = None
+                        break
+            self._state_grid = grid or False
+        return self._state_grid or None
+
+    @property
+    def connectivity(self):
+        if not self._topology_changed:
+            return self._template.connectivity
+        return super(OverlayMap, self).connectivity
+
+    def Initialize(self):
+        raise GameMapError("An overlay can not be re-initialized")
+
+    def SetRoom(self, y, x, room):
+        if y < 0 or y >= self.height or x < 0 or x >= self.width:
+            raise GameMapError("Invalid space (%d, %d)", y, x)
+        if (room is not None) != self.HasRoom(y, x):
+            self._connectivity = None
+            self._topology_version += 1
+            self._topology_changed = True
+        self._rooms[(y, x)] = room
+        self._UpdateStateGrid(y, x, room)
+        self._MarkDirty(y, x)
+        return room
+
+    def SetRooms(self, rooms):
+        for y, x, room in rooms:
+            self.SetRoom(y, x, room)
+
+    def GetRoom(self, y, x):
+        try:
+            return self._rooms[(y, x)]
+        except KeyError:
+            pass
+        room = self._template.GetRoom(y, x)
+        if room is None:
+            return None
+        room = room.Copy()
+        self._rooms[(y, x)] = room
+        return room
+
+    def HasRoom(self, y, x):
+        if (y, x) in self._rooms:
+            return self._rooms[(y, x)] is not None
+        return self._template.HasRoom(y, x)
+
+    def PeekRoom(self, y, x):
+        # Rooms which are only read do not need to be copied.
+        if (y, x) in self._rooms:
+            return self._rooms[(y, x)]
+        return self._template.GetRoom(y, x)
+
+    def MarkChanged(self, y, x):
+        # Changes only apply to this session's copies of the rooms.
+        self._UpdateStateGrid(y, x, self.GetRoom(y, x))
+        self._MarkDirty(y, x)
+
+    def _MarkStorageChanged(self, y, x):
+        self._MarkDirty(y, x)
+
+    def IterStates(self):
+        # Read the template's rooms instead of copying them.
+        for y, x, room in self._template.IterRooms():
+            if (y, x) not in self._rooms:
+                yield y, x, room.state
+        for (y, x), room in self._rooms.iteritems():
+            if room is not None:
+                yield y, x, room.state
+
+    def IsPinned(self, y, x, session=None):
+        # Each session has its own pinned chunks in the shared storage.
+        return ((y, x) in self._rooms
+                or self._template.IsPinned(y, x, session=self))
+
+    def PageAround(self, y, x, session=None):
+        self._template.PageAround(y, x, session=self)
+
+    def Flush(self):
+        pass
+
+    def IterRooms(self):
+        """As GameMap.IterRooms, without copying any rooms.
+
+        Rooms this session has not touched are the template's, so as with
+        PeekRoom they must not be changed; use GetRoom for that.
+        """
+        rooms = self._rooms
+        untouched = ((y, x, room) for y, x, room in self._template.IterRooms()
+                     if (y, x) not in rooms)
+        own = sorted((y, x, room) for (y, x), room in rooms.iteritems()
+                     if room is not None)
+        return heapq.merge(untouched, own)
@@ -2,7 +2,9 @@
 import unittest
 
 # Game specific imports.
+import my_game_item
 import my_game_map
+import my_game_room
 
 
 class TestGameMap(unittest.TestCase):
@@ -79,5 +81,258 @@ class TestGameMap(unittest.TestCase):
         self.assertEqual(output[9], " ###### ")
 
 
+class TestMapStorage(unittest.TestCase):
+
+    def _NewMap(self, storage):
+        game_map = my_game_map.GameMap()
+        game_map.storage = storage
+        game_map.height = 100
+        game_map.width = 70
+        game_map.Initialize()
+        return game_map
+
+    def test_unknown_storage(self):
+        game_map = my_game_map.GameMap()
+        with self.assertRaises(my_game_map.GameMapError):
+            game_map.storage = "tape"
+        game_map.height = 1
+        game_map.width = 1
+        game_map.Initialize()
+        with self.assertRaises(my_game_map.GameMapError):
+            game_map.storage = "sparse"
+
+    def test_same_behavior(self):
+        points = [(0, 0), (0, 69), (99, 0), (99, 69), (33, 33), (64, 31),
+                  (31, 64), (32, 32)]
+        for storage in sorted(my_game_map.GameMap.STORAGE_TYPES):
+            game_map = self._NewMap(storage)
+            self.assertEqual(game_map.storage, storage)
+            for i, (y, x) in enumerate(points):
+                self.assertEqual(game_map.SetRoom(y, x, str(i)), str(i))
+            for y, x in [(-1, 0), (0, -1), (100, 0), (0, 70)]:
+                with self.assertRaises(my_game_map.GameMapError):
+                    game_map.SetRoom(y, x, "X")
+                self.assertEqual(game_map.GetRoom(y, x), None)
+            for i, (y, x) in enumerate(points):
+                self.assertEqual(game_map.GetRoom(y, x), str(i))
+            self.assertEqual(game_map.GetRoom(1, 1), None)
+            self.assertEqual(
+                list(game_map.IterRooms()),
+                sorted((y, x, str(i)) for i, (y, x) in enumerate(points)))
+            output = game_map.DebugInfo()
+            self.assertEqual(len(output), 100)
+            self.assertEqual(output[0], " " + "#" * 68 + " ")
+            self.assertEqual(output[33][33], " ")
+            self.assertEqual(output[33][34], "#")
+            game_map.SetRoom(33, 33, None)
+            self.assertEqual(game_map.GetRoom(33, 33), None)
+            self.assertEqual(game_map.DebugInfo()[33], "#" * 70)
+
+    def test_set_rooms(self):
+        points = [(0, 0), (99, 69), (33, 33), (40, 40)]
+        for storage in sorted(my_game_map.GameMap.STORAGE_TYPES):
+            game_map = self._NewMap(storage)
+            version = game_map.topology_version
+            game_map.SetRooms((y, x, str(i)) for i, (y, x) in enumerate(points))
+            self.assertEqual(
+                list(game_map.IterRooms()),
+                sorted((y, x, str(i)) for i, (y, x) in enumerate(points)))
+            self.assertNotEqual(game_map.topology_version, version)
+            # Rooms before the first one outside the map are set.
+            with self.assertRaises(my_game_map.GameMapError):
+                game_map.SetRooms([(1, 1, "A"), (100, 0, "B"), (2, 2, "C")])
+            self.assertEqual(game_map.GetRoom(1, 1), "A")
+            self.assertEqual(game_map.GetRoom(2, 2), None)
+        with self.assertRaises(my_game_map.GameMapError):
+            my_game_map.GameMap().SetRooms([(0, 0, "A")])
+
+    def test_chunks_are_allocated_on_demand(self):
+        game_map = self._NewMap("chunked")
+        self.assertEqual(game_map.game_map, {})
+        game_map.SetRoom(40, 40, "A")
+        game_map.SetRoom(41, 41, "B")
+        self.assertEqual(len(game_map.game_map), 1)
+        game_map.SetRoom(0, 0, None)
+        self.assertEqual(len(game_map.game_map), 1)
+        game_map.SetRoom(40, 40, None)
+        self.assertEqual(len(game_map.game_map), 1)
+        game_map.SetRoom(41, 41, None)
+        self.assertEqual(game_map.game_map, {})
+
+
+class TestStateGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.item = my_game_item.GameItem()
+        self.item.AddStateChange(1, 0)
+        self.item.AddStateChange(2, 1)
+        self.item.radius = 1
+
+    def _NewMap(self, storage="dense"):
+        # +-----+
+        # |12#21|
+        # |0211#|
+        # |#1#22|
+        # +-----+
+        game_map = my_game_map.GameMap()
+        game_map.storage = storage
+        game_map.height = 3
+        game_map.width = 5
+        game_map.Initialize()
+        for y, row in enumerate(["12#21", "0211#", "#1#22"]):
+            for x, c in enumerate(row):
+                if c != "#":
+                    room = my_game_room.Room()
+                    room.state = int(c)
+                    game_map.SetRoom(y, x, room)
+        return game_map
+
+    def _States(self, game_map):
+        return [(y, x, room.state) for y, x, room in game_map.IterRooms()]
+
+    def test_apply(self):
+        grid = my_game_map.StateGrid(2, 4)
+        self.assertTrue(grid.Set(0, 1, 2))
+        self.assertTrue(grid.Set(1, 1, 1))
+        self.assertTrue(grid.Set(1, 2, 3))
+        self.assertFalse(grid.Set(1, 3, 255))
+        self.assertFalse(grid.Set(1, 3, "x"))
+        self.assertEqual(grid.Get(1, 3), None)
+        table = my_game_item.CompileTransitionTable({1: 0, 2: 1})
+        self.assertEqual(sorted(grid.Apply(table, 0, 0, 2, 2)),
+                         [(0, 1, 1), (1, 1, 0)])
+        self.assertEqual([grid.Get(0, 1), grid.Get(1, 1), grid.Get(1, 2)],
+                         [1, 0, 3])
+
+    def test_area_use_matches_room_by_room(self):
+        item = my_game_item.ItemDefinition.FromGameItem(self.item)
+        for storage in sorted(my_game_map.GameMap.STORAGE_TYPES):
+            game_map = self._NewMap(storage)
+            by_room = self._NewMap(storage)
+            for y, x in [(0, 0), (1, 3), (2, 4), (1, 1)]:
+                self.assertEqual(
+                    sorted(game_map.UseItemInArea(item, y, x)),
+                    sorted(by_room.UseItemInAreaByRoom(item, y, x)))
+                self.assertEqual(self._States(game_map),
+                                 self._States(by_room))
+            self.assertEqual(game_map.UseItemInArea(item, 1, 1), [])
+
+    def test_grid_only_for_dense_maps(self):
+        item = my_game_item.ItemDefinition.FromGameItem(self.item)
+        for storage in ["sparse", "chunked"]:
+            game_map = self._NewMap(storage)
+            self.assertEqual(game_map.state_grid, None)
+            self.assertEqual(sorted(game_map.UseItemInArea(item, 0, 0)),
+                             [(0, 0), (0, 1), (1, 1)])
+            self.assertEqual(game_map._state_grid, None)
+
+    def test_grid_follows_rooms(self):
+        game_map = self._NewMap()
+        item = my_game_item.ItemDefinition.FromGameItem(self.item)
+        self.assertEqual(game_map.state_grid.Get(0, 0), 1)
+        game_map.GetRoom(0, 0).state = 2
+        game_map.MarkChanged(0, 0)
+        game_map.SetRoom(0, 2, game_map.GetRoom(0, 1).Copy())
+        game_map.SetRoom(1, 0, None)
+        self.assertEqual(
+            sorted(game_map.UseItemInArea(item, 0, 1)),
+            [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2)])
+        self.assertEqual([game_map.GetRoom(0, x).state for x in range(3)],
+                         [1, 1, 1])
+        # States which do not fit in the grid fall back to room by room.
+        game_map.GetRoom(2, 1).state = 1000
+        game_map.MarkChanged(2, 1)
+        self.assertEqual(game_map.state_grid, None)
+        self.assertEqual(sorted(game_map.UseItemInArea(item, 2, 0)),
+                         [(1, 1)])
+
+    def test_overlay(self):
+        template = self._NewMap()
+        overlay = my_game_map.OverlayMap(template)
+        item = my_game_item.ItemDefinition.FromGameItem(self.item)
+        overlay.SetRoom(1, 4, my_game_room.Room())
+        overlay.GetRoom(1, 4).state = 2
+        overlay.MarkChanged(1, 4)
+        self.assertEqual(sorted(overlay.UseItemInArea(item, 1, 4)),
+                         [(0, 3), (0, 4), (1, 3), (1, 4), (2, 3), (2, 4)])
+        self.assertEqual(overlay.GetRoom(1, 4).state, 1)
+        self.assertEqual(template.GetRoom(0, 4).state, 1)
+        self.assertEqual(overlay.GetRoom(0, 4).state, 0)
+
+    def test_overlay_grid_shares_template_rows(self):
+        template = self._NewMap()
+        item = my_game_item.ItemDefinition.FromGameItem(self.item)
+        overlay = my_game_map.OverlayMap(template)
+        overlay.GetRoom(2, 1).state = 0
+        overlay.MarkChanged(2, 1)
+        grid = overlay.state_grid
+        template_grid = template.state_grid
+        # Only the rows this session changed are its own.
+        self.assertTrue(grid.rows[0] is template_grid.rows[0])
+        self.assertFalse(grid.rows[2] is template_grid.rows[2])
+        self.assertEqual([grid.Get(2, 1), template_grid.Get(2, 1)], [0, 1])
+        self.assertEqual(sorted(overlay.UseItemInArea(item, 0, 0)),
+                         [(0, 0), (0, 1), (1, 1)])
+        self.assertFalse(grid.rows[0] is template_grid.rows[0])
+        self.assertEqual([template_grid.Get(0, 0), grid.Get(0, 0)], [1, 0])
+        self.assertEqual(template.GetRoom(0, 0).state, 1)
+        # Other sessions start from the template's states.
+        other = my_game_map.OverlayMap(template)
+        self.assertEqual(other.state_grid.Get(0, 0), 1)
+        self.assertEqual(other.state_grid.Get(2, 1), 1)
+
+
+class TestOverlayMap(unittest.TestCase):
+
+    def setUp(self):
+        self.template = my_game_map.GameMap()
+        self.template.height = 2
+        self.template.width = 3
+        self.template.Initialize()
+        for y, x in [(0, 0), (0, 1), (1, 2)]:
+            room = my_game_room.Room()
+            room.state = y * 10 + x
+            room.AddContent("A")
+            self.template.SetRoom(y, x, room)
+        self.overlay = my_game_map.OverlayMap(self.template)
+
+    def test_copy_on_access(self):
+        self.assertEqual(self.overlay.height, 2)
+        self.assertEqual(self.overlay.width, 3)
+        self.assertEqual(self.overlay.DebugInfo(), ["  #", "## "])
+        room = self.overlay.GetRoom(0, 1)
+        self.assertTrue(room is not self.template.GetRoom(0, 1))
+        self.assertTrue(room is self.overlay.GetRoom(0, 1))
+        room.state = 5
+        room.AddContent("B")
+        self.assertEqual(self.template.GetRoom(0, 1).state, 1)
+        self.assertEqual(self.template.GetRoom(0, 1).contents, ["A"])
+        self.assertEqual(self.overlay.GetRoom(0, 2), None)
+        self.assertEqual(self.overlay.GetRoom(2, 0), None)
+
+    def test_set_room(self):
+        with self.assertRaises(my_game_map.GameMapError):
+            self.overlay.SetRoom(2, 0, my_game_room.Room())
+        self.overlay.SetRoom(0, 2, my_game_room.Room())
+        self.overlay.SetRoom(0, 0, None)
+        self.assertEqual(self.overlay.DebugInfo(), ["#  ", "## "])
+        self.assertEqual(self.template.DebugInfo(), ["  #", "## "])
+        self.assertEqual([(y, x) for y, x, _ in self.overlay.IterRooms()],
+                         [(0, 1), (0, 2), (1, 2)])
+
+    def test_iterating_does_not_copy(self):
+        self.assertEqual(
+            [(y, x, room.state) for y, x, room in self.overlay.IterRooms()],
+            [(0, 0, 0), (0, 1, 1), (1, 2, 12)])
+        self.assertEqual(self.overlay._rooms, {})
+        # The session's own rooms replace the template's.
+        room = self.overlay.GetRoom(0, 1)
+        room.state = 5
+        rooms = list(self.overlay.IterRooms())
+        self.assertTrue(rooms[1][2] is room)
+        self.assertTrue(rooms[0][2] is self.template.GetRoom(0, 0))
+        self.assertEqual(self.overlay._rooms.keys(), [(0, 1)])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,122 @@
+"""Where the text of the game is written.
+
+GameInterface.Run writes everything it shows the player to an Output instead
+of printing it.  Writes are buffered and sent in one go by Flush, which the
+command loop calls once per turn before waiting for the next command.
+Clearing the screen is done by the backend, e.g. with an ANSI escape sequence
+instead of running a clear command in a shell.
+
+Backends:
+  TerminalOutput:  A terminal which understands ANSI escape sequences.
+  StreamOutput:  Any file, e.g. stdout piped to another program.  Clearing
+    does nothing.
+  CaptureOutput:  Keeps the text in memory, e.g. for tests.
+  SocketOutput:  A network connection, with telnet line endings.
+"""
+import sys
+
+
+# Moves the cursor to the top left and clears the screen.
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+
+
+class Output(object):
+    """Buffered output.  Subclasses implement _Send."""
+
+    def __init__(self):
+        self._buffer = []
+
+    def Write(self, text, end="\n"):
+        """Buffer text to send on the next Flush.  None writes only end."""
+        if text is not None:
+            self._buffer.append(text)
+        self._buffer.append(end)
+
+    def Clear(self):
+        """Clear the screen, if the backend has one."""
+        pass
+
+    def Flush(self):
+        """Send the buffered text."""
+        data = "".join(self._buffer)
+        self._buffer = []
+        if data:
+            self._Send(data)
+
+    def _Send(self, data):
+        raise NotImplementedError
+
+
+class StreamOutput(Output):
+    """Writes to a file object, stdout by default."""
+
+    def __init__(self, stream=None):
+        super(StreamOutput, self).__init__()
+        self._stream = stream
+
+    def _Send(self, data):
+        stream = self._stream or sys.stdout
+        stream.write(data)
+        stream.flush()
+
+
+class TerminalOutput(StreamOutput):
+    """Writes to an ANSI terminal, stdout by default."""
+
+    def Clear(self):
+        # Whatever is waiting to be sent would be cleared straight away.
+        self._buffer = [CLEAR_SCREEN]
+
+
+class CaptureOutput(Output):
+    """Keeps everything sent in memory."""
+
+    def __init__(self):
+        super(CaptureOutput, self).__init__()
+        self._sent = []
+        self.clears = 0
+        self.flushes = 0
+
+    @property
+    def text(self):
+        """All the text sent so far."""
+        return "".join(self._sent)
+
+    def Clear(self):
+        self.clears += 1
+
+    def _Send(self, data):
+        self.flushes += 1
+        self._sent.append(data)
+
+
+class SocketOutput(Output):
+    """Writes to a network connection."""
+
+    def __init__(self, send, ansi=False):
+        """Create an output.
+
+        Args:
+          send:  Function called with the data to send, e.g. the sendall
+            method of a socket or the push method of an asynchat.async_chat.
+          ansi:  Whether the client understands ANSI escape sequences, and so
+            can clear the screen.
+        """
+        super(SocketOutput, self).__init__()
+        self._send = send
+        self._ansi = ansi
+
+    def Clear(self):
+        if self._ansi:
+            self._buffer = [CLEAR_SCREEN]
+
+    def _Send(self, data):
+        self._send(data.replace("\n", "\r\n"))
+
+
+def DefaultOutput():
+    """Returns a TerminalOutput if stdout is a terminal, else a StreamOutput."""
+    isatty = getattr(sys.stdout, "isatty", None)
+    if isatty is not None and isatty():
+        return TerminalOutput()
+    return StreamOutput()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import unittest
+
+import my_game_output
+import my_game_parser
+
+
+class TestOutput(unittest.TestCase):
+
+    def test_stream_output(self):
+        stream = StringIO.StringIO()
+        output = my_game_output.StreamOutput(stream)
+        output.Write("Hello")
+        output.Write("> ", end="")
+        output.Clear()
+        self.assertEqual(stream.getvalue(), "")
+        output.Flush()
+        self.assertEqual(stream.getvalue(), "Hello\n> ")
+
+    def test_terminal_output(self):
+        stream = StringIO.StringIO()
+        output = my_game_output.TerminalOutput(stream)
+        output.Write("Gone")
+        output.Clear()
+        output.Write("Hello")
+        output.Flush()
+        self.assertEqual(stream.getvalue(),
+                         my_game_output.CLEAR_SCREEN + "Hello\n")
+
+    def test_write_none(self):
+        stream = StringIO.StringIO()
+        output = my_game_output.StreamOutput(stream)
+        output.Write(None)
+        output.Write("Hello")
+        output.Flush()
+        self.assertEqual(stream.getvalue(), "\nHello\n")
+
+    def test_socket_output(self):
+        sent = []
+        output = my_game_output.SocketOutput(sent.append)
+        output.Write("a\nb")
+        output.Clear()
+        output.Flush()
+        output.Flush()
+        self.assertEqual(sent, ["a\r\nb\r\n"])
+        output = my_game_output.SocketOutput(sent.append, ansi=True)
+        output.Clear()
+        output.Write("c")
+        output.Flush()
+        self.assertEqual(sent[1], my_game_output.CLEAR_SCREEN + "c\r\n")
+
+
+class TestRun(unittest.TestCase):
+
+    def setUp(self):
+        self._stdin = sys.stdin
+
+    def tearDown(self):
+        sys.stdin = self._stdin
+
+    def test_run(self):
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        sys.stdin = StringIO.StringIO("go right\nbogus\nexit\n")
+        output = my_game_output.CaptureOutput()
+        parser.game_interface.Run(parser.player, debug_mode=True,
+                                  output=output)
+        text = output.text
+        self.assertTrue(text.startswith(parser.game_interface.exposition))
+        self.assertTrue("Moved to a new room." in text)
+        self.assertTrue(parser.game_interface.UNKNOWN_MSG in text)
+        self.assertTrue(text.endswith("Goodbye!\ngo right\nbogus\nexit\n"))
+        self.assertEqual(text.count("> "), 3)
+        # The map is drawn before every prompt.
+        self.assertEqual(len([line for line in text.split("\n")
+                              if line.startswith("|") and "P" in line]), 3)
+        # The screen is cleared at the start and after each understood
+        # command, and the output is sent once per prompt and at the end.
+        self.assertEqual(output.clears, 2)
+        self.assertEqual(output.flushes, 4)
+
+    def test_run_without_game_text(self):
+        # A config without exposition: and help: lines.
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        config = os.path.join(tmp_dir, "no_text.game")
+        with open("configs/small_test.game") as f:
+            lines = [line for line in f
+                     if not line.startswith(("exposition:", "help:"))]
+        with open(config, "w") as f:
+            f.writelines(lines)
+        parser = my_game_parser.GameParser()
+        parser.Parse(config, use_snapshot=False)
+        self.assertEqual(parser.game_interface.exposition, None)
+        self.assertEqual(parser.game_interface.help, None)
+        sys.stdin = StringIO.StringIO("help\nexit\n")
+        output = my_game_output.CaptureOutput()
+        parser.game_interface.Run(parser.player, output=output)
+        self.assertEqual(output.text, "\n> \n> Goodbye!\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
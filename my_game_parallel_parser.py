@@ -0,0 +1,288 @@
+"""Opt-in parallel parsing of large [MAP] sections.
+
+The [MAP] section of procedurally generated worlds can contain tens of
+millions of map points.  ParallelGameParser parses every other section line by
+line like GameParser in streaming mode, but splits the body of the [MAP]
+section into byte ranges which are parsed by a pool of worker processes.
+
+Workers do all the text parsing and return compact columns of coordinates and
+states, with the contents of each room as an index into a table of the
+distinct contents of the chunk.  The parent process builds the contents of
+each distinct entry once, copies it into each of its rooms and adds the rooms
+to the game map in bulk, in file order, so the resulting world, and the first
+error reported, are identical to the serial parser.
+"""
+import marshal
+import mmap
+import multiprocessing
+import re
+
+import my_game_map
+import my_game_parser
+import my_game_room
+import my_game_utils
+
+
+# Same as GameParser.SECTION_RE, but to search a whole file for headers.
+SECTION_LINE_RE = re.compile(r"^\[([A-Z_]+)\]$", re.M)
+
+# Keys in the [MAP] section which are not map points.
+_MAP_KEYS = frozenset(
+    ["storage", "dimensions", "regions", "player_start"])
+
+
+def _ParseMapChunk(args):
+    """Parse a byte range of the [MAP] section body in a worker process.
+
+    Args:
+      args:  A tuple of (filename, start, end) where start and end are byte
+        offsets aligned to the start of a line.
+
+    Returns:
+      A tuple of (line_count, points, lines, error) where:
+        line_count is the number of lines in the chunk.
+        points is a marshalled tuple of (lines, ys, xs, states, contents,
+          table).  The first five are lists with an entry for each map
+          point in file order: its relative line, coordinates, state and an
+          index into table, the list of distinct tuples of non-empty item
+          names.  Marshalling is much cheaper to send back to the parent than
+          pickling.
+        lines is a list of (point count, relative line, line parts) of the
+          keys which are not map points, for the parent to parse with
+          ParseMap after the first point count points.
+        error is None, or a tuple of (relative line, exception args) for the
+          first line which could not be parsed.  No points or lines are
+          returned after an error.
+    """
+    filename, start, end = args
+    with open(filename, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.split("\n")
+    if data.endswith("\n"):
+        lines.pop()
+    point_lines = []
+    ys = []
+    xs = []
+    states = []
+    contents = []
+    table = {}
+    other_lines = []
+    error = None
+    for i, line in enumerate(lines):
+        if not line.strip() or line.startswith("#"):
+            continue
+        line_parts = line.strip().split(":")
+        if line_parts[0] in _MAP_KEYS:
+            other_lines.append((len(ys), i, line_parts))
+            continue
+        try:
+            y, x, state, items = my_game_parser.ParseMapPointParts(line_parts)
+        except my_game_parser.ParseError, e:
+            error = (i, e.args)
+            break
+        items = tuple(filter(None, items))
+        index = table.get(items)
+        if index is None:
+            index = table[items] = len(table)
+        point_lines.append(i)
+        ys.append(y)
+        xs.append(x)
+        states.append(state)
+        contents.append(index)
+    table = sorted(table, key=table.get)
+    points = marshal.dumps((point_lines, ys, xs, states, contents, table))
+    return (len(lines), points, other_lines, error)
+
+
+class ParallelGameParser(my_game_parser.GameParser):
+    """A GameParser which parses large [MAP] sections in worker processes.
+
+    Parsing is always done in streaming mode, so errors carry the line number
+    they were found on.
+    """
+
+    # Default size of each byte range of the [MAP] section given to a worker.
+    DEFAULT_CHUNK_BYTES = 1 << 20
+
+    def __init__(self, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """Create a parser.
+
+        Args:
+          workers:  Number of worker processes.  Defaults to the number of
+            CPUs.
+          chunk_bytes:  Approximate size of each byte range of the [MAP]
+            section handed to a worker.  [MAP] sections smaller than this are
+            parsed serially.
+        """
+        super(ParallelGameParser, self).__init__(streaming=True)
+        self._workers = workers or multiprocessing.cpu_count()
+        self._chunk_bytes = chunk_bytes
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def _ParseText(self, filename, progress_callback):
+        lines = 0
+        with open(filename, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, mmap.error):
+                # Empty file, there is nothing to parse.
+                mapped = None
+            if mapped is None:
+                if progress_callback:
+                    progress_callback(0, 0)
+                return
+            try:
+                while True:
+                    line = mapped.readline()
+                    if not line:
+                        break
+                    lines += 1
+                    prev_section = self._curr_section
+                    try:
+                        self.ParseLine(line)
+                    except my_game_parser.ParseError, e:
+                        if e.line_number is None:
+                            e.line_number = lines
+                        raise
+                    if (self._curr_section == "MAP"
+                        and prev_section != self._curr_section):
+                        # This was the [MAP] header.
+                        start = mapped.tell()
+                        match = SECTION_LINE_RE.search(mapped, start)
+                        end = match.start() if match else mapped.size()
+                        if end - start > self._chunk_bytes:
+                            lines = self._ParseMapBody(
+                                filename, mapped, start, end, lines,
+                                progress_callback)
+                            mapped.seek(end)
+                    if (progress_callback
+                        and lines % self.PROGRESS_INTERVAL == 0):
+                        progress_callback(lines, mapped.tell())
+            finally:
+                consumed = mapped.tell()
+                mapped.close()
+        if progress_callback:
+            progress_callback(lines, consumed)
+
+    def _Chunks(self, mapped, start, end):
+        """Split [start, end) into byte ranges aligned to line starts."""
+        chunks = []
+        while start < end:
+            chunk_end = min(start + self._chunk_bytes, end)
+            if chunk_end < end:
+                newline = mapped.find("\n", chunk_end - 1, end)
+                chunk_end = end if newline == -1 else newline + 1
+            chunks.append((start, chunk_end))
+            start = chunk_end
+        return chunks
+
+    def _ParseMapBody(self, filename, mapped, start, end, lines,
+                      progress_callback):
+        """Parse the [MAP] body in [start, end) with a pool of workers.
+
+        Args:
+          filename:  Path of the config file.
+          mapped:  The memory-mapped config file.
+          start:  Byte offset of the first line of the body.
+          end:  Byte offset after the last line of the body.
+          lines:  Number of lines consumed before the body.
+          progress_callback:  As for GameParser.Parse.
+
+        Returns:
+          The number of lines consumed after the body.
+
+        Raises:
+          ParseError, with the line number of the offending line, on the first
+          line which can not be parsed.
+        """
+        chunks = self._Chunks(mapped, start, end)
+        pool = multiprocessing.Pool(self._workers)
+        try:
+            results = pool.imap(
+                _ParseMapChunk,
+                [(filename, s, e) for s, e in chunks])
+            for (chunk_start, chunk_end), (
+                    line_count, points, other_lines, error) in zip(
+                        chunks, results):
+                points = marshal.loads(points)
+                done = 0
+                for count, i, line_parts in other_lines + [
+                        (len(points[0]), None, None)]:
+                    self._AddPoints(points, done, count, mapped,
+                                    chunk_start, lines)
+                    done = count
+                    if line_parts is None:
+                        break
+                    try:
+                        self.ParseMap(line_parts)
+                    except my_game_parser.ParseError, e:
+                        e.line_number = lines + i + 1
+                        raise
+                if error is not None:
+                    i, args = error
+                    e = my_game_parser.ParseError(*args)
+                    e.line_number = lines + i + 1
+                    raise e
+                lines += line_count
+                if progress_callback:
+                    progress_callback(lines, chunk_end)
+        finally:
+            pool.terminate()
+            pool.join()
+        return lines
+
+    def _AddPoints(self, points, first, last, mapped, chunk_start, lines):
+        """Add map points parsed by a worker, as GameParser.ParseMap would.
+
+        Args:
+          points:  The unmarshalled points of a chunk, see _ParseMapChunk.
+          first:  Index of the first point to add.
+          last:  Index after the last point to add.
+          mapped:  The memory-mapped config file.
+          chunk_start:  Byte offset of the chunk.
+          lines:  Number of lines consumed before the chunk.
+        """
+        if first == last:
+            return
+        point_lines, ys, xs, states, contents, table = points
+        game_map = self._player.game_map
+        if not game_map.initialized:
+            e = my_game_parser.ParseError(
+                "Map points must come after dimensions: %s",
+                self._LineParts(mapped, chunk_start, point_lines[first]))
+            e.line_number = lines + point_lines[first] + 1
+            raise e
+        names = self._player.item_mapper.names
+        # Each distinct contents is built once and copied into its rooms.
+        prototypes = [my_game_utils.Multiset(items, names) for items in table]
+        from_contents = my_game_room.Room.FromContents
+        try:
+            game_map.SetRooms(
+                (ys[i], xs[i],
+                 from_contents(states[i], prototypes[contents[i]].Copy()))
+                for i in xrange(first, last))
+        except my_game_map.GameMapError, e:
+            error = my_game_parser.ParseError(
+                "Unable to initialize map after parsing:\n%s", e)
+            # The rooms are set in order up to the first one outside the map.
+            for i in xrange(first, last):
+                if not (0 <= ys[i] < game_map.height
+                        and 0 <= xs[i] < game_map.width):
+                    error.line_number = lines + point_lines[i] + 1
+                    break
+            raise error
+
+    @staticmethod
+    def _LineParts(mapped, chunk_start, i):
+        """Returns the parts of line i of the chunk at chunk_start."""
+        start = chunk_start
+        for _ in xrange(i):
+            start = mapped.find("\n", start) + 1
+        end = mapped.find("\n", start)
+        if end == -1:
+            end = mapped.size()
+        return mapped[start:end].strip().split(":")
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import my_game_benchmark
+import my_game_parallel_parser
+import my_game_parser
+
+
+class TestParallelGameParser(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._config = os.path.join(self._tmp_dir, "generated.game")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _Parse(self, parser):
+        parser.Parse(self._config, use_snapshot=False)
+        return parser
+
+    def _Rooms(self, parser):
+        return [(y, x, r.state, r.contents)
+                for y, x, r in parser.player.game_map.IterRooms()]
+
+    def _ParseError(self, parser):
+        with self.assertRaises(my_game_parser.ParseError) as context:
+            self._Parse(parser)
+        return context.exception
+
+    def test_same_as_serial(self):
+        my_game_benchmark.GenerateWorld(self._config, 40, 50)
+        serial = self._Parse(my_game_parser.GameParser(streaming=True))
+        for workers in [1, 3]:
+            progress = []
+            parallel = my_game_parallel_parser.ParallelGameParser(
+                workers=workers, chunk_bytes=256)
+            parallel.Parse(
+                self._config, use_snapshot=False,
+                progress_callback=lambda l, b: progress.append((l, b)))
+            self.assertEqual(self._Rooms(parallel), self._Rooms(serial))
+            self.assertEqual(parallel.player.game_map.DebugInfo(),
+                             serial.player.game_map.DebugInfo())
+            self.assertEqual(parallel.player.inventory,
+                             serial.player.inventory)
+            self.assertEqual(
+                (parallel.player.y_pos, parallel.player.x_pos),
+                (serial.player.y_pos, serial.player.x_pos))
+            self.assertEqual(
+                parallel.game_interface.LookupAction("go up")[0],
+                serial.game_interface.LookupAction("go up")[0])
+            with open(self._config) as f:
+                data = f.read()
+            self.assertEqual(progress[-1],
+                             (len(data.splitlines()), len(data)))
+
+    def test_small_map_is_serial(self):
+        parser = my_game_parallel_parser.ParallelGameParser(workers=2)
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        serial = my_game_parser.GameParser()
+        serial.Parse("configs/iss_fire.game", use_snapshot=False)
+        self.assertEqual(self._Rooms(parser), self._Rooms(serial))
+
+    def test_error_line_numbers(self):
+        my_game_benchmark.GenerateWorld(self._config, 40, 50)
+        with open(self._config) as f:
+            lines = f.readlines()
+        bad_line = len(lines) - 40
+        lines[bad_line - 1] = "1:x:0:foam\n"
+        # A second bad line must not be reported instead of the first.
+        lines[bad_line + 5] = "1:y:0:foam\n"
+        with open(self._config, "w") as f:
+            f.write("".join(lines))
+
+        serial_error = self._ParseError(
+            my_game_parser.GameParser(streaming=True))
+        parallel_error = self._ParseError(
+            my_game_parallel_parser.ParallelGameParser(
+                workers=3, chunk_bytes=256))
+        self.assertEqual(serial_error.line_number, bad_line)
+        self.assertEqual(parallel_error.line_number, bad_line)
+        self.assertEqual(parallel_error.args, serial_error.args)
+
+    def test_points_before_dimensions(self):
+        my_game_benchmark.GenerateWorld(self._config, 40, 50)
+        with open(self._config) as f:
+            lines = f.readlines()
+        start = lines.index("[MAP]\n") + 1
+        # Move the dimensions below the first map points.
+        dimensions = lines.pop(start)
+        lines.insert(start + 5, dimensions)
+        with open(self._config, "w") as f:
+            f.write("".join(lines))
+        serial_error = self._ParseError(
+            my_game_parser.GameParser(streaming=True))
+        parallel_error = self._ParseError(
+            my_game_parallel_parser.ParallelGameParser(
+                workers=2, chunk_bytes=256))
+        self.assertEqual(parallel_error.line_number, serial_error.line_number)
+        self.assertEqual(parallel_error.args, serial_error.args)
+
+    def test_out_of_bounds_line_number(self):
+        my_game_benchmark.GenerateWorld(self._config, 40, 50)
+        with open(self._config) as f:
+            lines = f.readlines()
+        bad_line = len(lines) - 100
+        lines[bad_line - 1] = "100:100:0:foam\n"
+        with open(self._config, "w") as f:
+            f.write("".join(lines))
+        parallel_error = self._ParseError(
+            my_game_parallel_parser.ParallelGameParser(
+                workers=2, chunk_bytes=256))
+        self.assertEqual(parallel_error.line_number, bad_line)
+
+
+if __name__ == "__main__":
+    unittest.main()
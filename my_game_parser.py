@@ -1,15 +1,38 @@
 import functools
+import os
 import re
 
 import my_game_interface
 import my_game_item
 import my_game_map
 import my_game_player
+import my_game_region
 import my_game_room
+import my_game_snapshot
 
 
 class ParseError(Exception):
-    pass
+    # 1-based line of the config file the error was found on, if known.
+    line_number = None
+
+
+def ParseMapPointParts(line_parts):
+    """Convert the parts of a map point line into its values.
+
+    Args:
+      line_parts:  An array of the config file line, split on ":".
+
+    Returns:
+      A tuple of (y, x, state, items).
+
+    Raises:
+      ParseError if we are unable to parse the map point.
+    """
+    try:
+        return (int(line_parts[0]), int(line_parts[1]), int(line_parts[2]),
+                line_parts[3:])
+    except (ValueError, IndexError):
+        raise ParseError("Unable to parse map point: %s", line_parts)
 
 
 class GameParser(object):
@@ -21,7 +44,20 @@ class GameParser(object):
 
     SECTION_RE = re.compile(r"^\[([A-Z_]+)\]$")
 
-    def __init__(self):
+    # How many lines to parse between calls to the progress callback.
+    PROGRESS_INTERVAL = 10000
+
+    def __init__(self, streaming=False):
+        """Create a parser.
+
+        Args:
+          streaming:  If True, every line is parsed as soon as it is read
+            instead of buffering a whole [SECTION] first, so memory use does
+            not grow with the size of a section.
+        """
+        self._streaming = streaming
+        # Relative paths in the config are relative to the config file.
+        self._config_dir = ""
         self._curr_section = None
         self._section_lines = []  # A list of lines in the current [SECTION]
         self._game_interface = my_game_interface.GameInterface()
@@ -36,6 +72,10 @@ class GameParser(object):
         # Create a setter for testing.
         self._curr_section = s
 
+    @property
+    def streaming(self):
+        return self._streaming
+
     @property
     def section_lines(self):
         return self._section_lines
@@ -57,12 +97,84 @@ class GameParser(object):
     def player(self):
         return self._player
 
-    def Parse(self, filename):
+    def Parse(self, filename, use_snapshot=True, progress_callback=None):
+        """Parse the config file, or its compiled snapshot if it is fresh.
+
+        Args:
+          filename:  Path to the .game config file.
+          use_snapshot:  If True and a snapshot of the config exists which is
+            newer than the config, load the snapshot instead of parsing the
+            text.  A snapshot which can not be loaded is ignored.
+          progress_callback:  Optional function called as
+            progress_callback(lines, bytes) every PROGRESS_INTERVAL lines and
+            once at the end of the file with the number of lines and bytes of
+            the config consumed so far.
+        """
+        self._config_dir = os.path.dirname(filename)
+        if use_snapshot and my_game_snapshot.IsFresh(filename):
+            try:
+                my_game_snapshot.Load(
+                    self._player, self._game_interface,
+                    my_game_snapshot.SnapshotPath(filename))
+                return
+            except my_game_snapshot.SnapshotError:
+                # Start again from a clean slate and fall back to the text.
+                self._game_interface = my_game_interface.GameInterface()
+                self._player = my_game_player.Player()
+        self._ParseText(filename, progress_callback)
+
+    def _ParseText(self, filename, progress_callback):
+        """Parse the text of the config file line by line.
+
+        In streaming mode, a ParseError is annotated with the line number of
+        the line which caused it.
+        """
+        lines = 0
+        consumed = 0
         with open(filename, "r") as f:
             for line in f:
-                self.ParseLine(line)
+                lines += 1
+                consumed += len(line)
+                try:
+                    self.ParseLine(line)
+                except ParseError, e:
+                    if self._streaming and e.line_number is None:
+                        e.line_number = lines
+                    raise
+                if progress_callback and lines % self.PROGRESS_INTERVAL == 0:
+                    progress_callback(lines, consumed)
             # Parse last section.
             self.ParseSection(self._curr_section)
+        if progress_callback:
+            progress_callback(lines, consumed)
+
+    def Compile(self, filename):
+        """Parse the config file and write a snapshot next to it.
+
+        Args:
+          filename:  Path to the .game config file.
+
+        Returns:
+          The path of the written snapshot.
+        """
+        self.Parse(filename, use_snapshot=False)
+        snapshot_filename = my_game_snapshot.SnapshotPath(filename)
+        my_game_snapshot.Compile(
+            self._player, self._game_interface, snapshot_filename)
+        return snapshot_filename
+
+    def UnreachableRooms(self):
+        """Report the rooms the player can never get to.
+
+        Returns:
+          A sorted list of (y, x) of the rooms which are not connected to the
+          player's starting room, or None if the map or start is not set.
+        """
+        game_map = self._player.game_map
+        y, x = self._player.y_pos, self._player.x_pos
+        if not game_map.initialized or y is None or x is None:
+            return None
+        return game_map.connectivity.Unreachable(y, x)
 
     def ParseGameLine(self, line_parts):
         """Parse a line from the [GAME] section of the config.
@@ -90,7 +202,7 @@ class GameParser(object):
                 # We can't use Player.AddItem here because the player's current
                 # room hasn't been fully initialized.  We are not adding items
                 # from the room, but from the initial game state.
-                self._player.inventory.append(item)
+                self._player.GiveItem(item)
         elif key == "player_inventory_capacity":
             self._player._max_inventory_size = int(line_parts[1])
         else:
@@ -122,7 +234,9 @@ class GameParser(object):
 
         Assumes lines of the form:
           <name>:<colon-separated list of state-changing effects>
-        where state-changing effect is of the form "old_state_id>new_state_id".
+        where state-changing effect is of the form "old_state_id>new_state_id",
+        or "radius=N" to use the item on every room within N rooms of the
+        player.
 
         Args:
           line_parts:  An array of the config file line, split on ":".
@@ -133,6 +247,13 @@ class GameParser(object):
         key = line_parts[0]
         item = my_game_item.GameItem()
         for effect in line_parts[1:]:
+            if effect.startswith("radius="):
+                try:
+                    item.radius = int(effect[len("radius="):])
+                except ValueError:
+                    raise ParseError(
+                        "Error parsing radius for %s: %s", key, effect)
+                continue
             try:
                 old_state, new_state = [int(s) for s in effect.split(">")]
             except ValueError:
@@ -152,15 +273,20 @@ class GameParser(object):
         Raises:
           ParseError if we are unable to parse the map point.
         """
-        try:
-            y = int(line_parts[0])
-            x = int(line_parts[1])
-            state = int(line_parts[2])
-            items = line_parts[3:]
-        except ValueError:
-            raise ParseError("Unable to parse map point: %s", line_parts)
-        
-        new_room = my_game_room.Room()
+        y, x, state, items = ParseMapPointParts(line_parts)
+        self.AddMapPoint(y, x, state, items)
+
+    def AddMapPoint(self, y, x, state, items):
+        """Add a room parsed from a map point to the game map.
+
+        Args:
+          y:  Integer Y-coordinate of the room.
+          x:  Integer X-coordinate of the room.
+          state:  Integer initial state ID of the room.
+          items:  List of item names in the room, which may contain empty
+            strings.
+        """
+        new_room = my_game_room.Room(self._player.item_mapper.names)
         new_room.state = state
         for i in items:
             if i:
@@ -172,8 +298,10 @@ class GameParser(object):
 
         This section contains the following fields in order.  They must be in
         order or the map will fail to parse.
-          height
-          width
+          storage (optional, one of my_game_map.GameMap.STORAGE_TYPES)
+          dimensions (height and width), or regions (a directory written by
+            my_game_region.WriteRegions, relative to the config file, and
+            optionally the number of chunks to keep in memory)
           player_start
           as well as a series of lines to define the rooms on the map
 
@@ -185,13 +313,26 @@ class GameParser(object):
         """
         key = line_parts[0]
         try:
-            if key == "dimensions":
+            if key == "storage":
+                self._player.game_map.storage = line_parts[1].strip()
+            elif key == "dimensions":
                 self._player.game_map.height = int(line_parts[1])
                 self._player.game_map.width = int(line_parts[2])
                 self._player.game_map.Initialize()
+            elif key == "regions":
+                kwargs = {"names": self._player.item_mapper.names}
+                if len(line_parts) > 2:
+                    kwargs["max_chunks"] = int(line_parts[2])
+                my_game_region.LoadRegions(
+                    self._player.game_map,
+                    os.path.join(self._config_dir, line_parts[1].strip()),
+                    **kwargs)
             elif key == "player_start":
                 self._player.y_pos = int(line_parts[1])
                 self._player.x_pos = int(line_parts[2])
+            elif not self._player.game_map.initialized:
+                raise ParseError(
+                    "Map points must come after dimensions: %s", line_parts)
             else:
                 self.ParseMapPoint(line_parts)
         except ValueError:
@@ -199,6 +340,8 @@ class GameParser(object):
                 "Unrecognized line in [MAP] section: %s", line_parts)
         except my_game_map.GameMapError, e:
             raise ParseError("Unable to initialize map after parsing:\n%s", e)
+        except my_game_region.RegionError, e:
+            raise ParseError("Unable to load map regions:\n%s", e)
 
     def ParseAlias(self, alias, line_parts):
         """Parse the [ALIASES_*] sections of the config.
@@ -236,6 +379,9 @@ class GameParser(object):
         elif alias == "INSPECT":
             self._game_interface.AddActionAlias(
                 key, my_game_player.Player.Inspect)
+        elif alias == "TRAVEL":
+            self._game_interface.AddActionAlias(
+                key, my_game_player.Player.TravelTo)
         else:
             raise ParseError("Unrecognized ALIASES section: %s", alias)
 
@@ -253,19 +399,31 @@ class GameParser(object):
             # This is the first section we have encountered.
             return
         for line in self._section_lines:
-            line_parts = line.strip().split(":")
-            if section == "GAME":
-                self.ParseGameLine(line_parts)
-            elif section == "ROOM_STATES":
-                self.ParseRoomState(line_parts)
-            elif section == "ITEMS":
-                self.ParseItem(line_parts)
-            elif section == "MAP":
-                self.ParseMap(line_parts)
-            elif section.startswith("ALIASES_"):
-                alias = section.replace("ALIASES_", "")
-                self.ParseAlias(alias, line_parts)
-    
+            self.ParseSectionLine(section, line)
+
+    def ParseSectionLine(self, section, line):
+        """Parses a single config line under the named section.
+
+        Args:
+          section:  String name for section the line belongs to.
+          line:  String config line.
+        """
+        if not section:
+            # Lines before the first section are ignored.
+            return
+        line_parts = line.strip().split(":")
+        if section == "GAME":
+            self.ParseGameLine(line_parts)
+        elif section == "ROOM_STATES":
+            self.ParseRoomState(line_parts)
+        elif section == "ITEMS":
+            self.ParseItem(line_parts)
+        elif section == "MAP":
+            self.ParseMap(line_parts)
+        elif section.startswith("ALIASES_"):
+            alias = section.replace("ALIASES_", "")
+            self.ParseAlias(alias, line_parts)
+
     def ParseLine(self, line):
         if not line.strip() or line.startswith("#"):
             # Ignore empty lines and comments.
@@ -275,5 +433,7 @@ class GameParser(object):
             self.ParseSection(self._curr_section)
             self._curr_section = match.group(1) 
             self._section_lines = []
+        elif self._streaming:
+            self.ParseSectionLine(self._curr_section, line)
         else:
             self._section_lines.append(line)
@@ -1,6 +1,7 @@
 import unittest
 
 import my_game_parser
+import my_game_player
 
 
 class TestGameParser(unittest.TestCase):
@@ -73,6 +74,13 @@ class TestGameParser(unittest.TestCase):
         # Items withou no effects are OK.
         self._game_parser.section_lines = ["water"]
         self._game_parser.ParseSection("ITEMS")
+        self._game_parser.section_lines = ["sprinkler:radius=2:1>0"]
+        self._game_parser.ParseSection("ITEMS")
+        self.assertEqual(item_mapper.GetItem("sprinkler").radius, 2)
+        self.assertEqual(item_mapper.GetItem("sprinkler").UseItem(1), 0)
+        self._game_parser.section_lines = ["sprinkler:radius=far"]
+        with self.assertRaises(my_game_parser.ParseError):
+            self._game_parser.ParseSection("ITEMS")
 
     def test_parse_map(self):
         self._game_parser.section_lines = [
@@ -104,6 +112,45 @@ class TestGameParser(unittest.TestCase):
         self.assertEqual(game_map.GetRoom(15, 0), None)
         self.assertEqual(game_map.GetRoom(0, 30), None)
 
+    def test_parse_map_storage(self):
+        self._game_parser.section_lines = [
+            "storage:chunked",
+            "dimensions:100000:100000",
+            "99999:99999:1:water",
+            ]
+        self._game_parser.ParseSection("MAP")
+        game_map = self._game_parser.player.game_map
+        self.assertEqual(game_map.storage, "chunked")
+        self.assertEqual(game_map.GetRoom(99999, 99999).contents, ["water"])
+        self.assertEqual(game_map.GetRoom(0, 0), None)
+        # Storage can not change once the map has been initialized.
+        self._game_parser.section_lines = ["storage:sparse"]
+        with self.assertRaises(my_game_parser.ParseError):
+            self._game_parser.ParseSection("MAP")
+
+    def test_unreachable_rooms(self):
+        self.assertEqual(self._game_parser.UnreachableRooms(), None)
+        self._game_parser.section_lines = [
+            "dimensions:3:3",
+            "player_start:0:0",
+            "0:0:0:",
+            "0:1:0:",
+            "2:2:0:",
+            "1:2:0:",
+            "2:0:0:",
+            ]
+        self._game_parser.ParseSection("MAP")
+        self.assertEqual(self._game_parser.UnreachableRooms(),
+                         [(1, 2), (2, 0), (2, 2)])
+
+    def test_parse_map_point_before_dimensions(self):
+        self._game_parser.section_lines = [
+            "2:2:0:water:CO2",
+            "dimensions:15:30",
+            ]
+        with self.assertRaises(my_game_parser.ParseError):
+            self._game_parser.ParseSection("MAP")
+
     def test_parse_aliases(self):
         self._game_parser.section_lines = ["go", "move", "run"]
         self._game_parser.ParseSection("ALIASES_MOVE")
@@ -146,6 +193,48 @@ class TestGameParser(unittest.TestCase):
         # These action commands are not understood.
         self.assertEqual(game_interface.LookupAction("used somewhere")[0], None)
         self.assertEqual(game_interface.LookupAction("inspector")[0], None)
+        self.assertEqual(game_interface.LookupAction(""), (None, None))
+        self.assertEqual(game_interface.LookupAction("go"), (None, None))
+
+    def test_lookup_multi_word_aliases(self):
+        self._game_parser.section_lines = ["go", "head on"]
+        self._game_parser.ParseSection("ALIASES_MOVE")
+        self._game_parser.section_lines = ["up", "far up"]
+        self._game_parser.ParseSection("ALIASES_UP")
+        self._game_parser.section_lines = ["throw", "throw away"]
+        self._game_parser.ParseSection("ALIASES_DROP")
+        self._game_parser.section_lines = ["use"]
+        self._game_parser.ParseSection("ALIASES_USE")
+        game_interface = self._game_parser.game_interface
+        player = my_game_player.Player
+
+        self.assertEqual(game_interface.LookupAction("head on up"),
+                         (player.MoveUp, None))
+        self.assertEqual(game_interface.LookupAction("go far up please"),
+                         (player.MoveUp, None))
+        self.assertEqual(game_interface.LookupAction("head up"), (None, None))
+        self.assertEqual(game_interface.LookupAction("throw away the  ball"),
+                         (player.DropItem, "the  ball"))
+        self.assertEqual(game_interface.LookupAction("throw ball"),
+                         (player.DropItem, "ball"))
+        # Arguments which contain the alias are not changed.
+        self.assertEqual(game_interface.LookupAction("use user manual"),
+                         (player.UseItem, "user manual"))
+        self.assertEqual(game_interface.LookupAction("throw throw away"),
+                         (player.DropItem, "throw away"))
+
+        # The index is rebuilt when aliases are added.
+        self.assertEqual(game_interface.LookupAction("climb up"),
+                         (None, None))
+        game_interface.AddMoveAlias("climb")
+        self.assertEqual(game_interface.LookupAction("climb up"),
+                         (player.MoveUp, None))
+        game_interface.AddDirectionAlias("skyward", player.MoveUp)
+        self.assertEqual(game_interface.LookupAction("go skyward"),
+                         (player.MoveUp, None))
+        game_interface.AddActionAlias("toss", player.DropItem)
+        self.assertEqual(game_interface.LookupAction("toss it"),
+                         (player.DropItem, "it"))
 
 
 class FullTest(unittest.TestCase):
@@ -186,6 +275,77 @@ class FullTest(unittest.TestCase):
         self.assertNotEqual(game_interface.LookupAction("go left")[0], None)
         self.assertNotEqual(game_interface.LookupAction("USE baton")[0], None)
         self.assertNotEqual(game_interface.LookupAction("Inspect.")[0], None)
+        # "go to" is a longer alias than the "go" move verb.
+        self.assertEqual(game_interface.LookupAction("go to 5, 9"),
+                         (my_game_player.Player.TravelTo, "5, 9"))
+        self.assertEqual(self._parser.UnreachableRooms(), [])
+
+    def test_worlds_have_their_own_item_ids(self):
+        self._parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        other = my_game_parser.GameParser()
+        other.Parse("configs/small_test.game", use_snapshot=False)
+        names = self._parser.player.item_mapper.names
+        other_names = other.player.item_mapper.names
+        self.assertFalse(names is other_names)
+        # Items of [ITEMS] get the smallest IDs of their own world.
+        self.assertEqual((names.Find("foam"), names.Find("co2")), (0, 1))
+        self.assertEqual(other_names.Find("a"), 0)
+        self.assertEqual(names.Find("a"), None)
+        self.assertEqual(other_names.Find("foam"), None)
+        room = self._parser.player.game_map.GetRoom(0, 4)
+        self.assertTrue(room._contents.names is names)
+        self.assertTrue(room.Copy()._contents.names is names)
+
+    def test_execute_without_arguments(self):
+        self._parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        player = self._parser.player
+        game_interface = self._parser.game_interface
+        self.assertTrue(player.Start())
+        # Actions which need an item fail without one instead of raising.
+        for command, verb in [("take", "Take"), ("drop", "Drop"),
+                              ("use", "Use"), ("grab.", "Grab"),
+                              ("go to", "Go to")]:
+            self.assertEqual(game_interface.ExecuteCommand(player, command),
+                             (False, "%s what?" % verb))
+        # Words after an action which takes none are ignored.
+        self.assertEqual(game_interface.ExecuteCommand(player, "look around"),
+                         game_interface.ExecuteCommand(player, "look"))
+        self.assertEqual(game_interface.command_history[:2],
+                         ["take", "drop"])
+
+    def test_streaming(self):
+        progress = []
+        streaming_parser = my_game_parser.GameParser(streaming=True)
+        streaming_parser.Parse(
+            "configs/iss_fire.game", use_snapshot=False,
+            progress_callback=lambda l, b: progress.append((l, b)))
+        self._parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        # Nothing is buffered while streaming.
+        self.assertEqual(streaming_parser.section_lines, [])
+        with open("configs/iss_fire.game") as f:
+            data = f.read()
+        self.assertEqual(progress[-1], (len(data.splitlines()), len(data)))
+
+        self.assertEqual(streaming_parser.game_interface.DebugInfo(),
+                         self._parser.game_interface.DebugInfo())
+        self.assertEqual(streaming_parser.player.game_map.DebugInfo(),
+                         self._parser.player.game_map.DebugInfo())
+        self.assertEqual(streaming_parser.player.inventory,
+                         self._parser.player.inventory)
+        self.assertEqual(
+            [(y, x, r.state, r.contents)
+             for y, x, r in streaming_parser.player.game_map.IterRooms()],
+            [(y, x, r.state, r.contents)
+             for y, x, r in self._parser.player.game_map.IterRooms()])
+
+    def test_streaming_ordering(self):
+        parser = my_game_parser.GameParser(streaming=True)
+        parser.ParseLine("[MAP]")
+        with self.assertRaises(my_game_parser.ParseError):
+            parser.ParseLine("0:0:0:")
+        parser.ParseLine("dimensions:1:1")
+        parser.ParseLine("0:0:0:")
+        self.assertEqual(parser.player.game_map.GetRoom(0, 0).state, 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""Connectivity and shortest paths between the rooms of a GameMap.
+
+The player moves between rooms which are next to each other up, down, left or
+right, so the rooms form a graph on the grid.  A ConnectivityIndex labels the
+connected components of that graph and answers shortest path questions with
+breadth-first searches, caching a distance and next hop table for each target.
+
+An index can be limited to part of the map, e.g. to the chunks of a region map
+which are in memory, so that searching it does not page in the rest.
+"""
+import collections
+
+
+# Offsets of the rooms the player can move to, as in my_game_player.Player.
+NEIGHBORS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+class ConnectivityIndex(object):
+    """Lazily computed connectivity of the rooms of a GameMap.
+
+    The index only depends on which coordinates hold rooms.  GameMap drops
+    it when SetRoom adds or removes a room, but not when a room's state or
+    contents change.
+    """
+
+    # Total number of rooms in the distance tables kept.  Each table has an
+    # entry for every room of the target's component, which on a large map
+    # can be most of the map.  Tables larger than this are not kept.
+    MAX_ENTRIES = 1 << 17
+
+    def __init__(self, game_map, within=None):
+        """Create an index.
+
+        Args:
+          game_map:  A my_game_map.GameMap, which must not add or remove rooms
+            while this index is in use.
+          within:  Optional function called with (y, x), which returns False
+            for coordinates the index must not read, e.g. GameMap.IsPinned.
+            Rooms there are treated as missing.  The rooms within must not
+            change while this index is in use.
+        """
+        self._game_map = game_map
+        self._within = within
+        # Dict of (y, x) to component number, built on first use.
+        self._components = None
+        self._component_sizes = []
+        # Least recently used distance tables, by target, and the total
+        # number of entries in them.
+        self._tables = collections.OrderedDict()
+        self._entries = 0
+
+    def _HasRoom(self, y, x):
+        if self._within is not None and not self._within(y, x):
+            return False
+        return self._game_map.HasRoom(y, x)
+
+    def _Neighbors(self, y, x):
+        has_room = self._HasRoom
+        for dy, dx in NEIGHBORS:
+            if has_room(y + dy, x + dx):
+                yield y + dy, x + dx
+
+    def _BuildComponents(self):
+        components = {}
+        sizes = []
+        for y, x, _ in self._game_map.IterStates():
+            if (y, x) in components or not self._HasRoom(y, x):
+                continue
+            number = len(sizes)
+            components[(y, x)] = number
+            size = 1
+            queue = collections.deque([(y, x)])
+            while queue:
+                room = queue.popleft()
+                for neighbor in self._Neighbors(*room):
+                    if neighbor not in components:
+                        components[neighbor] = number
+                        size += 1
+                        queue.append(neighbor)
+            sizes.append(size)
+        self._components = components
+        self._component_sizes = sizes
+
+    @property
+    def components(self):
+        """Dict of (y, x) of each room to its component number."""
+        if self._components is None:
+            self._BuildComponents()
+        return self._components
+
+    @property
+    def component_sizes(self):
+        """List of the number of rooms in each component."""
+        self.components
+        return self._component_sizes
+
+    def Component(self, y, x):
+        """Returns the component number of the room at (y, x), or None."""
+        return self.components.get((y, x))
+
+    def Reachable(self, start, target):
+        """Whether there is a path between the rooms at start and target."""
+        component = self.Component(*start)
+        return component is not None and component == self.Component(*target)
+
+    def Unreachable(self, y, x):
+        """Returns the sorted (y, x) of every room not reachable from (y, x)."""
+        component = self.Component(y, x)
+        return sorted(room for room, c in self.components.iteritems()
+                      if c != component)
+
+    def DistanceTable(self, target):
+        """Breadth-first search out from target.
+
+        Args:
+          target:  (y, x) of a room.
+
+        Returns:
+          A dict of (y, x) of every room which can reach target to a tuple of
+          (distance to target, (y, x) of the next room on a shortest path to
+          target).  The next room of target itself is None.
+        """
+        table = self._tables.pop(target, None)
+        if table is not None:
+            self._tables[target] = table
+            return table
+        table = {}
+        if self._HasRoom(*target):
+            table[target] = (0, None)
+            queue = collections.deque([target])
+            while queue:
+                room = queue.popleft()
+                distance = table[room][0] + 1
+                for neighbor in self._Neighbors(*room):
+                    if neighbor not in table:
+                        table[neighbor] = (distance, room)
+                        queue.append(neighbor)
+        if len(table) <= self.MAX_ENTRIES:
+            while self._entries + len(table) > self.MAX_ENTRIES:
+                self._entries -= len(self._tables.popitem(last=False)[1])
+            self._tables[target] = table
+            self._entries += len(table)
+        return table
+
+    def Distance(self, start, target):
+        """Returns the number of moves from start to target, or None."""
+        entry = self.DistanceTable(target).get(start)
+        return None if entry is None else entry[0]
+
+    def NextHop(self, start, target):
+        """Returns the (y, x) of the next room from start to target, or None."""
+        entry = self.DistanceTable(target).get(start)
+        return None if entry is None else entry[1]
+
+    def Path(self, start, target):
+        """Returns the rooms after start on a shortest path to target.
+
+        Returns:
+          A list of (y, x) ending with target, empty if start is target, or
+          None if target can not be reached.
+        """
+        table = self.DistanceTable(target)
+        if start not in table:
+            return None
+        path = []
+        room = table[start][1]
+        while room is not None:
+            path.append(room)
+            room = table[room][1]
+        return path
+
+    def PathToNearest(self, start, predicate):
+        """Breadth-first search from start for the closest matching room.
+
+        The rooms searched for can change at any time, e.g. when items are
+        picked up, so this search is not cached.
+
+        Args:
+          start:  (y, x) of a room.
+          predicate:  Function called with (y, x) of a room, which returns
+            True for the rooms to look for.
+
+        Returns:
+          As for Path, to the closest room for which predicate is True.  Ties
+          are broken by the order of NEIGHBORS.
+        """
+        if not self._HasRoom(*start):
+            return None
+        previous = {start: None}
+        queue = collections.deque([start])
+        while queue:
+            room = queue.popleft()
+            if predicate(*room):
+                path = []
+                while room != start:
+                    path.append(room)
+                    room = previous[room]
+                path.reverse()
+                return path
+            for neighbor in self._Neighbors(*room):
+                if neighbor not in previous:
+                    previous[neighbor] = room
+                    queue.append(neighbor)
+        return None
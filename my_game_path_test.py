@@ -0,0 +1,108 @@
+# Generic imports.
+import unittest
+
+# Game specific imports.
+import my_game_map
+import my_game_room
+
+
+class TestConnectivityIndex(unittest.TestCase):
+
+    def setUp(self):
+        # +------+
+        # |  #   |
+        # |# # ##|
+        # |    # |
+        # |######|
+        # +------+
+        self.game_map = my_game_map.GameMap()
+        self.game_map.height = 4
+        self.game_map.width = 6
+        self.game_map.Initialize()
+        for y, row in enumerate(["  #   ", "# # ##", "    # ", "######"]):
+            for x, c in enumerate(row):
+                if c == " ":
+                    self.game_map.SetRoom(y, x, my_game_room.Room())
+        self.index = self.game_map.connectivity
+
+    def test_components(self):
+        self.assertEqual(self.index.Component(0, 0), 0)
+        self.assertEqual(self.index.Component(2, 3), 0)
+        self.assertEqual(self.index.Component(0, 3), 0)
+        self.assertEqual(self.index.Component(2, 5), 1)
+        self.assertEqual(self.index.Component(3, 0), None)
+        self.assertEqual(self.index.component_sizes, [11, 1])
+        self.assertTrue(self.index.Reachable((0, 0), (0, 5)))
+        self.assertFalse(self.index.Reachable((0, 0), (2, 5)))
+        self.assertFalse(self.index.Reachable((3, 0), (3, 0)))
+        self.assertEqual(self.index.Unreachable(0, 0), [(2, 5)])
+        self.assertEqual(len(self.index.Unreachable(2, 5)), 11)
+
+    def test_paths(self):
+        self.assertEqual(self.index.Distance((0, 0), (0, 5)), 9)
+        self.assertEqual(self.index.NextHop((0, 0), (0, 5)), (0, 1))
+        self.assertEqual(
+            self.index.Path((0, 0), (0, 3)),
+            [(0, 1), (1, 1), (2, 1), (2, 2), (2, 3), (1, 3), (0, 3)])
+        self.assertEqual(self.index.Path((0, 3), (0, 3)), [])
+        self.assertEqual(self.index.Distance((0, 3), (0, 3)), 0)
+        self.assertEqual(self.index.Path((0, 0), (2, 5)), None)
+        self.assertEqual(self.index.Path((0, 0), (3, 3)), None)
+        self.assertEqual(self.index.NextHop((2, 5), (0, 0)), None)
+
+    def test_path_to_nearest(self):
+        self.assertEqual(
+            self.index.PathToNearest((0, 0), lambda y, x: x >= 3),
+            [(0, 1), (1, 1), (2, 1), (2, 2), (2, 3)])
+        self.assertEqual(self.index.PathToNearest((0, 0), lambda y, x: True),
+                         [])
+        self.assertEqual(
+            self.index.PathToNearest((0, 0), lambda y, x: (y, x) == (2, 5)),
+            None)
+        self.assertEqual(self.index.PathToNearest((3, 3), lambda y, x: True),
+                         None)
+
+    def test_distance_tables_are_cached(self):
+        table = self.index.DistanceTable((0, 5))
+        self.assertTrue(self.index.DistanceTable((0, 5)) is table)
+        for y in range(3):
+            self.index.DistanceTable((y, 0))
+        # Each table of the large component has 11 entries.
+        self.index.MAX_ENTRIES = 22
+        self.index.DistanceTable((0, 1))
+        self.assertFalse(self.index.DistanceTable((0, 5)) is table)
+        table = self.index.DistanceTable((0, 1))
+        self.assertTrue(self.index.DistanceTable((0, 1)) is table)
+        # Tables which do not fit are not kept.
+        self.index.MAX_ENTRIES = 10
+        table = self.index.DistanceTable((0, 0))
+        self.assertFalse(self.index.DistanceTable((0, 0)) is table)
+        self.assertTrue(self.index.DistanceTable((2, 5)) is
+                        self.index.DistanceTable((2, 5)))
+
+    def test_invalidated_by_topology_changes(self):
+        room = self.game_map.GetRoom(0, 0)
+        room.state = 3
+        self.game_map.SetRoom(0, 0, room)
+        self.game_map.MarkChanged(0, 0)
+        self.assertTrue(self.game_map.connectivity is self.index)
+        self.game_map.SetRoom(3, 3, None)
+        self.assertTrue(self.game_map.connectivity is self.index)
+        self.game_map.SetRoom(1, 5, my_game_room.Room())
+        index = self.game_map.connectivity
+        self.assertFalse(index is self.index)
+        self.assertEqual(index.Distance((0, 0), (2, 5)), 11)
+
+    def test_overlay_shares_template_index(self):
+        overlay = my_game_map.OverlayMap(self.game_map)
+        self.assertTrue(overlay.connectivity is self.index)
+        overlay.SetRoom(0, 0, overlay.GetRoom(0, 0))
+        self.assertTrue(overlay.connectivity is self.index)
+        overlay.SetRoom(1, 5, my_game_room.Room())
+        self.assertFalse(overlay.connectivity is self.index)
+        self.assertEqual(overlay.connectivity.Unreachable(0, 0), [])
+        self.assertEqual(self.index.Unreachable(0, 0), [(2, 5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,10 @@
+import re
+
 import my_game_item
+import my_game_journal
 import my_game_map
+import my_game_path
+import my_game_render
 import my_game_room
 import my_game_utils
 
@@ -9,17 +14,33 @@ class Player(object):
     All in-game actions should be represented by this object.
     """
 
+    # Destinations of TravelTo, e.g. "3, 4", "(3, 4)" or "nearest foam".
+    COORDINATES_RE = re.compile(r"^\(?\s*(-?\d+)\s*[, ]\s*(-?\d+)\s*\)?$")
+    NEAREST = "nearest "
+
+    # Templates of the messages showing a room state, see
+    # my_game_room.RoomStateMapper.GetMessage.
+    MOVE_MSG = "Moved to a new room.  It is [%s]."
+    USE_MSG = "Used %s and now the room is [%s]"
+    INSPECT_MSG = ("The room is [%s].  There are [%s]."
+                   "  You currently have [%s].")
+
     def __init__(self):
         self._curr_room = None
         self._y_pos = None
         self._x_pos = None
-        # Inventory is sorted.
-        self._inventory = []
         self._max_inventory_size = 0
         # Objects tied to the player.
         self._game_map = my_game_map.GameMap()
         self._room_state_mapper = my_game_room.RoomStateMapper()
         self._item_mapper = my_game_item.ItemMapper()
+        # Inventory is kept as counts of each item.
+        self._inventory = my_game_utils.Multiset(
+            names=self._item_mapper.names)
+        # my_game_journal.Journal of the actions to undo, if undo is enabled.
+        self._journal = None
+        # my_game_render.MapRenderer of the debug output, made on first use.
+        self._renderer = None
 
     @property
     def game_map(self):
@@ -55,11 +76,17 @@ class Player(object):
 
     @property
     def inventory(self):
-        return self._inventory
+        """A new sorted list of the names of the items in the inventory."""
+        return self._inventory.Items()
 
     @inventory.setter
     def inventory(self, i):
-        self._inventory = i
+        self._inventory = my_game_utils.Multiset(i, self._item_mapper.names)
+
+    @property
+    def inventory_size(self):
+        """Number of items in the inventory."""
+        return len(self._inventory)
 
     @property
     def max_inventory_size(self):
@@ -84,6 +111,17 @@ class Player(object):
     @item_mapper.setter
     def item_mapper(self, m):
         self._item_mapper = m
+        # Keep the inventory in the IDs of the new world.
+        self._inventory = my_game_utils.Multiset(self._inventory.Items(),
+                                                 m.names)
+
+    @property
+    def journal(self):
+        return self._journal
+
+    @journal.setter
+    def journal(self, j):
+        self._journal = j
 
     def Start(self):
         """Check the player is on a valid game map and a valid room.
@@ -105,16 +143,30 @@ class Player(object):
             if (self._curr_room is not None
                 and self._room_state_mapper
                 and self._item_mapper):
+                self._game_map.PageAround(self._y_pos, self._x_pos)
                 return True
         return False
 
+    def GiveItem(self, item):
+        """Put an item straight into the inventory, e.g. at the game start.
+
+        Unlike AddItem, the item does not come from the current room and the
+        inventory capacity is not checked.
+
+        Args:
+          item:  String name of item to add to inventory.
+        """
+        self._inventory.Add(item)
+
+    def HasItem(self, item):
+        """Whether the inventory holds at least one of the named item."""
+        return item in self._inventory
+
     # These are the five major actions a player can take...
     # ...Add [item]
     def AddItem(self, item):
         """Attempt to add an item to player inventory.
 
-        Inventory is stored in sorted order.
-
         Args:
           item:  String name of item add to inventory.
 
@@ -127,8 +179,9 @@ class Player(object):
         if item_obj is None:
             return (False, "No %s in here." % item)
         if len(self._inventory) < self._max_inventory_size:
-            self._inventory.append(item)
-            self._inventory.sort()
+            self._inventory.Add(item)
+            self._game_map.MarkChanged(self._y_pos, self._x_pos)
+            self._Record((my_game_journal.TAKE, self._y_pos, self._x_pos, item))
             return (True, "%s successfully added to inventory." % item)
         # Add the item back if the player can't take it.
         self._curr_room.AddContent(item_obj)
@@ -147,13 +200,15 @@ class Player(object):
           was successfully removed from inventory and added to the room's
           contents.
         """
-        dropped_item = my_game_utils.RemoveContent(self._inventory, item)
+        dropped_item = self._inventory.Remove(item)
         if dropped_item is None:
             return (False, "You can't lose what you don't have.")
         # This assumes the curr_room exists, which may not always be the case.
         # However, as this is part of gameplay, it is unlikely to get there from
         # outside the command interface.
         self._curr_room.AddContent(dropped_item)
+        self._game_map.MarkChanged(self._y_pos, self._x_pos)
+        self._Record((my_game_journal.DROP, self._y_pos, self._x_pos, item))
         return (True, "Dropped %s." % item)
 
     # ...Use [item]
@@ -172,32 +227,60 @@ class Player(object):
           was used successfully, i.e. it had some effect on the room.  False
           otherwise.
         """
-        # Temporarily remove the item.
-        item = my_game_utils.RemoveContent(self._inventory, item)
-        if item is None:
+        if item not in self._inventory:
             return (False, "Don't have one of those.")
+        if self._journal is None:
+            return self._UseItem(item)
+        self._journal.Begin()
+        try:
+            return self._UseItem(item)
+        finally:
+            self._journal.Commit()
+
+    def _UseItem(self, item):
+        # Temporarily remove the item.
+        item = self._inventory.Remove(item)
+        self._Record((my_game_journal.USE_UP, item))
         item_obj = self._item_mapper.GetItem(item)
         # Put item back if it is reusable.
         if item_obj.reusable:
             self.AddItem(item)
-        new_state = item_obj.UseItem(self._curr_room.state)
+        if item_obj.radius:
+            # Old states are only needed to undo the use.
+            journal = self._journal
+            changed = self._game_map.UseItemInArea(
+                item_obj, self._y_pos, self._x_pos,
+                with_states=journal is not None)
+            if journal is not None:
+                for y, x, old_state, new_state in changed:
+                    journal.Record((my_game_journal.STATE, y, x, old_state,
+                                    new_state))
+            if changed:
+                new_cond = self._room_state_mapper.GetStateDisplay(
+                    self._curr_room.state)
+                return (True,
+                        "Used %s on %d rooms and now the room is [%s]" % (
+                            item, len(changed), new_cond))
+            return (False, "Using %s had no effect." % item)
+        old_state = self._curr_room.state
+        new_state = item_obj.UseItem(old_state)
         if self._curr_room.TryChangeState(new_state):
-            new_cond = ", ".join(self._room_state_mapper.GetState(new_state))
-            return (True,
-                    "Used %s and now the room is [%s]" % (item, new_cond))
+            self._game_map.MarkChanged(self._y_pos, self._x_pos)
+            self._Record((my_game_journal.STATE, self._y_pos, self._x_pos,
+                          old_state, self._curr_room.state))
+            return (True, self._room_state_mapper.GetMessage(
+                self.USE_MSG, new_state, item))
         return (False, "Using %s had no effect." % item)
 
     # ...Inspect [environment]
     def Inspect(self):
         """Return readable details of current inventory and room as a dict."""
         return (True,
-                ("The room is [%(room)s]."
-                 "  There are [%(room_contents)s]."
-                 "  You currently have [%(inventory)s]."
-                 % {"room": ", ".join(self.GetRoomDisplay()),
-                    "room_contents": ", ".join(self.GetRoomContentsDisplay()),
-                    "inventory": ", ".join(self.GetInventoryDisplay())
-                   }))
+                self.INSPECT_MSG % (
+                    self._room_state_mapper.GetStateDisplay(
+                        self._curr_room.state),
+                    ", ".join(self.GetRoomContentsDisplay()),
+                    ", ".join(self.GetInventoryDisplay())))
 
     # ...Move
     def Move(self, new_y, new_x):
@@ -214,12 +297,133 @@ class Player(object):
         new_room = self.game_map.GetRoom(new_y, new_x)
         if new_room is None:
             return (False, "Can't go that way.")
+        self._Record((my_game_journal.MOVE, self._y_pos, self._x_pos,
+                      new_y, new_x))
         self._y_pos = new_y
         self._x_pos = new_x
         self._curr_room = new_room
+        self._game_map.PageAround(new_y, new_x)
+        return (True, self._room_state_mapper.GetMessage(
+            self.MOVE_MSG, new_room.state))
+
+    # ...Travel
+    def TravelTo(self, destination):
+        """Move along a shortest path to a room.
+
+        Args:
+          destination:  String "y, x" coordinates of a room, or "nearest
+            <item>" for the closest room with that item in it.
+
+        Returns:
+          A tuple of (True/False, message).  True iff the player moved.
+        """
+        start = (self._y_pos, self._x_pos)
+        connectivity = self._game_map.connectivity
+        if self._game_map.storage == "regions":
+            # Searching the whole map would page it all in.  Only the rooms
+            # pinned around the player are searched.
+            connectivity = my_game_path.ConnectivityIndex(
+                self._game_map, within=self._game_map.IsPinned)
+        match = self.COORDINATES_RE.match(destination.strip())
+        if match:
+            target = (int(match.group(1)), int(match.group(2)))
+            if not self._game_map.IsPinned(*target):
+                return (False, "That is too far away to travel to.")
+            path = connectivity.Path(start, target)
+        elif destination.startswith(self.NEAREST):
+            item = destination[len(self.NEAREST):].strip()
+            peek_room = self._game_map.PeekRoom
+            path = connectivity.PathToNearest(
+                start, lambda y, x: peek_room(y, x).HasContent(item))
+        else:
+            return (False, "Go to where?  Try coordinates like 3, 4 or"
+                    " \"nearest <item>\".")
+        if path is None:
+            return (False, "Can't find a way there.")
+        if not path:
+            return (False, "You are already there.")
+        # The whole trip is undone at once.
+        if self._journal is not None:
+            self._journal.Begin()
+        try:
+            for y, x in path:
+                self.Move(y, x)
+        finally:
+            if self._journal is not None:
+                self._journal.Commit()
         return (True,
-                ("Moved to a new room.  It is [%s]."
-                 % ", ".join(self._room_state_mapper.GetState(new_room.state))))
+                ("Travelled %d rooms to (%d, %d).  It is [%s]."
+                 % (len(path), self._y_pos, self._x_pos,
+                    self._room_state_mapper.GetStateDisplay(
+                        self._curr_room.state))))
+
+    # ...Undo and redo
+    def Undo(self):
+        """Undo the last action which changed the game.
+
+        Returns:
+          A tuple of (True/False, message).  False if there is nothing to undo.
+        """
+        if self._journal is None:
+            return (False, "Undo is not enabled.")
+        operations = self._journal.PopUndo()
+        if operations is None:
+            return (False, "Nothing to undo.")
+        for operation in reversed(operations):
+            self._ApplyOperation(operation, False)
+        return (True, "Undone.  %s" % self.Inspect()[1])
+
+    def Redo(self):
+        """Redo the last undone action.
+
+        Returns:
+          A tuple of (True/False, message).  False if there is nothing to redo.
+        """
+        if self._journal is None:
+            return (False, "Undo is not enabled.")
+        operations = self._journal.PopRedo()
+        if operations is None:
+            return (False, "Nothing to redo.")
+        for operation in operations:
+            self._ApplyOperation(operation, True)
+        return (True, "Redone.  %s" % self.Inspect()[1])
+
+    def _Record(self, operation):
+        if self._journal is not None:
+            self._journal.Record(operation)
+
+    def _ApplyOperation(self, operation, forward):
+        """Apply a journal operation, or its inverse if forward is False."""
+        kind = operation[0]
+        if kind == my_game_journal.MOVE:
+            if forward:
+                y, x = operation[3], operation[4]
+            else:
+                y, x = operation[1], operation[2]
+            self._y_pos = y
+            self._x_pos = x
+            self._curr_room = self._game_map.GetRoom(y, x)
+            self._game_map.PageAround(y, x)
+        elif kind == my_game_journal.USE_UP:
+            if forward:
+                self._inventory.Remove(operation[1])
+            else:
+                self._inventory.Add(operation[1])
+        elif kind == my_game_journal.STATE:
+            _, y, x, old_state, new_state = operation
+            self._game_map.GetRoom(y, x).state = (
+                new_state if forward else old_state)
+            self._game_map.MarkChanged(y, x)
+        else:
+            _, y, x, item = operation
+            room = self._game_map.GetRoom(y, x)
+            if (kind == my_game_journal.TAKE) == forward:
+                room.RemoveContent(item)
+                self._inventory.Add(item)
+            else:
+                self._inventory.Remove(item)
+                room.AddContent(item)
+            self._game_map.MarkChanged(y, x)
 
     def MoveUp(self):
         return self.Move(self._y_pos-1, self._x_pos)
@@ -241,12 +445,18 @@ class Player(object):
 
     def GetRoomContentsDisplay(self):
         """Return readable contents of the current room."""
-        return my_game_utils.GetContentsDisplay(self._curr_room.contents)
+        return self._curr_room.GetContentsDisplay()
 
     def GetInventoryDisplay(self):
         """Return readable details of current inventory."""
-        return my_game_utils.GetContentsDisplay(self._inventory)
+        return self._inventory.GetContentsDisplay()
+
+    def GetDebugDisplay(self):
+        """Return lines drawing the part of the map around the player."""
+        if (self._renderer is None
+            or self._renderer.game_map is not self._game_map):
+            self._renderer = my_game_render.MapRenderer(self._game_map)
+        return self._renderer.Render(self._y_pos, self._x_pos)
 
     def PrintDebugOutput(self):
-        self._game_map.PrintDebugOutput(
-            y_player=self._y_pos, x_player=self._x_pos)
+        print "\n".join(self.GetDebugDisplay())
@@ -1,6 +1,7 @@
 import unittest
 
 import my_game_item
+import my_game_journal
 import my_game_map
 import my_game_player
 import my_game_room
@@ -136,6 +137,44 @@ class TestPlayer(unittest.TestCase):
         self._player.x_pos = 1
         self.assertFalse(self._player.Start())
 
+    def test_travel_to(self):
+        # +---+
+        # |1 #|
+        # |# 2|
+        # |3 #|
+        # +---+
+        game_map = my_game_map.GameMap()
+        game_map.height = 3
+        game_map.width = 3
+        game_map.Initialize()
+        for y, row in enumerate(["1 #", "# 2", "3 #"]):
+            for x, c in enumerate(row):
+                if c != "#":
+                    room = my_game_room.Room()
+                    room.state = 0 if c == " " else int(c)
+                    game_map.SetRoom(y, x, room)
+        game_map.GetRoom(2, 0).AddContent("foam")
+        game_map.GetRoom(1, 2).AddContent("foam")
+        state_mapper = my_game_room.RoomStateMapper()
+        state_mapper.AddState(3, ["smoky"])
+        self._player.game_map = game_map
+        self._player.item_mapper = my_game_item.ItemMapper()
+        self._player.room_state_mapper = state_mapper
+        self._player.y_pos = 0
+        self._player.x_pos = 0
+        self.assertTrue(self._player.Start())
+
+        self.assertEqual(self._player.TravelTo("(2, 0)"),
+                         (True, "Travelled 4 rooms to (2, 0).  It is [smoky]."))
+        self.assertEqual(self._player.curr_room, game_map.GetRoom(2, 0))
+        self.assertFalse(self._player.TravelTo("2 0")[0])
+        self.assertFalse(self._player.TravelTo("0, 2")[0])
+        self.assertFalse(self._player.TravelTo("somewhere")[0])
+        self.assertFalse(self._player.TravelTo("nearest co2")[0])
+        self.assertTrue(self._player.TravelTo("0,0")[0])
+        self.assertTrue(self._player.TravelTo("nearest foam")[0])
+        self.assertEqual((self._player.y_pos, self._player.x_pos), (1, 2))
+
     def test_add_items(self):
         self.assertEqual(self._player.inventory, [])
         self.assertFalse(self._player.AddItem("A")[0])
@@ -185,6 +224,26 @@ class TestPlayer(unittest.TestCase):
         self.assertFalse(self._player.DropItem("C")[0])
         self.assertEqual(self._player.inventory, [])
 
+    def test_give_item(self):
+        # Given items skip the room and the capacity check.
+        self._player.GiveItem("Z")
+        self._player.GiveItem("Z")
+        self._player.GiveItem("Y")
+        self.assertEqual(self._player.inventory, ["Y", "Z", "Z"])
+        self.assertEqual(self._player.inventory_size, 3)
+        self.assertTrue(self._player.HasItem("Z"))
+        self.assertFalse(self._player.HasItem("A"))
+        self.assertEqual(self._player.GetInventoryDisplay(), ["1xY", "2xZ"])
+        self.assertEqual(self._player.curr_room.contents,
+                         ["A", "A", "A", "B", "B", "B", "B", "C", "C", "C",
+                          "C"])
+        self._player.max_inventory_size = 4
+        self.assertTrue(self._player.AddItem("A")[0])
+        self.assertFalse(self._player.AddItem("A")[0])
+        self.assertTrue(self._player.DropItem("Z")[0])
+        self.assertEqual(self._player.inventory_size, 3)
+        self.assertEqual(self._player.inventory, ["A", "Y", "Z"])
+
     def test_use_item(self):
         self._player.curr_room.AddContent("E")
         item_mapper = my_game_item.ItemMapper()
@@ -251,6 +310,73 @@ class TestPlayer(unittest.TestCase):
         self.assertEqual(self._player.inventory, ["A", "B", "C"])
         self.assertEqual(self._player.curr_room.state, 0)
 
+    def test_use_area_item(self):
+        game_map = my_game_map.GameMap()
+        game_map.height = 1
+        game_map.width = 4
+        game_map.Initialize()
+        for x, state in enumerate([1, 1, 0, 1]):
+            room = my_game_room.Room()
+            room.state = state
+            game_map.SetRoom(0, x, room)
+        item_mapper = my_game_item.ItemMapper()
+        sprinkler = my_game_item.GameItem()
+        sprinkler.AddStateChange(1, 0)
+        sprinkler.radius = 1
+        item_mapper.AddItem("S", sprinkler)
+        state_mapper = my_game_room.RoomStateMapper()
+        state_mapper.AddState(0, ["dry"])
+        self._player.game_map = game_map
+        self._player.item_mapper = item_mapper
+        self._player.room_state_mapper = state_mapper
+        self._player.y_pos = 0
+        self._player.x_pos = 1
+        self.assertTrue(self._player.Start())
+        self._player.GiveItem("S")
+        self._player.GiveItem("S")
+        self.assertEqual(
+            self._player.UseItem("S"),
+            (True, "Used S on 2 rooms and now the room is [dry]"))
+        self.assertEqual([r.state for _, _, r in game_map.IterRooms()],
+                         [0, 0, 0, 1])
+        self.assertFalse(self._player.UseItem("S")[0])
+
+    def test_undo_area_item(self):
+        game_map = my_game_map.GameMap()
+        game_map.height = 1
+        game_map.width = 4
+        game_map.Initialize()
+        for x, state in enumerate([1, 1, 0, 1]):
+            room = my_game_room.Room()
+            room.state = state
+            game_map.SetRoom(0, x, room)
+        item_mapper = my_game_item.ItemMapper()
+        sprinkler = my_game_item.GameItem()
+        sprinkler.AddStateChange(1, 0)
+        sprinkler.reusable = False
+        sprinkler.radius = 1
+        item_mapper.AddItem("S", sprinkler)
+        self._player.game_map = game_map
+        self._player.item_mapper = item_mapper
+        self._player.y_pos = 0
+        self._player.x_pos = 1
+        self._player.journal = my_game_journal.Journal()
+        self.assertTrue(self._player.Start())
+        self._player.GiveItem("S")
+        self.assertTrue(self._player.UseItem("S")[0])
+        self.assertEqual(self._player.inventory, [])
+        self.assertTrue(self._player.Undo()[0])
+        self.assertEqual([r.state for _, _, r in game_map.IterRooms()],
+                         [1, 1, 0, 1])
+        self.assertEqual(self._player.inventory, ["S"])
+        # The state grid was updated too, so the item works again.
+        self.assertTrue(self._player.Redo()[0])
+        self.assertEqual([r.state for _, _, r in game_map.IterRooms()],
+                         [0, 0, 0, 1])
+        self.assertTrue(self._player.Undo()[0])
+        self.assertEqual(self._player.UseItem("S")[0], True)
+        self.assertFalse(self._player.Redo()[0])
+
     def test_inspect(self):
         state_mapper = my_game_room.RoomStateMapper()
         self._player.room_state_mapper = state_mapper
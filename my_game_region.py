@@ -0,0 +1,291 @@
+"""Game maps paged in from on-disk region files.
+
+The largest generated worlds do not fit in memory even with sparse storage.
+A region directory stores the map as square chunks, one file per chunk which
+holds any rooms, plus a manifest with the dimensions of the map:
+
+  <directory>/manifest      marshal of (version, height, width, chunk size)
+  <directory>/<cy>_<cx>.rgn marshal of a list of (cell index, state, contents)
+
+RegionStorage keeps a bounded number of chunks in memory.  Chunks around the
+player are paged in as the player moves and pinned, the least recently used
+of the others are evicted, and chunks whose rooms changed are written back.
+Changed chunks still in memory are written by GameMap.Flush, which game.py
+calls when the game exits.
+"""
+import collections
+import marshal
+import os
+import sys
+import weakref
+
+import my_game_map
+import my_game_room
+import my_game_utils
+
+
+REGION_VERSION = 1
+MANIFEST = "manifest"
+CHUNK_SUFFIX = ".rgn"
+
+
+class RegionError(Exception):
+    pass
+
+
+def _ChunkFilename(directory, key):
+    return os.path.join(directory, "%d_%d%s" % (key[0], key[1], CHUNK_SUFFIX))
+
+
+def _WriteFile(filename, data):
+    """Atomically replace filename with the marshalled data."""
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        marshal.dump(data, f)
+    os.rename(tmp_filename, filename)
+
+
+def WriteRegions(game_map, directory,
+                 chunk_size=my_game_map.ChunkedStorage.CHUNK_SIZE):
+    """Write the rooms of a game map as region files.
+
+    Args:
+      game_map:  An initialized my_game_map.GameMap of my_game_room.Room.
+      directory:  Directory to write to.  It is created if it does not exist.
+      chunk_size:  Width and height of each chunk.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    chunks = collections.defaultdict(list)
+    for y, x, room in game_map.IterRooms():
+        chunks[(y // chunk_size, x // chunk_size)].append(
+            ((y % chunk_size) * chunk_size + x % chunk_size,
+             room.state, list(room.contents)))
+    for key, rooms in chunks.iteritems():
+        _WriteFile(_ChunkFilename(directory, key), rooms)
+    _WriteFile(os.path.join(directory, MANIFEST),
+               (REGION_VERSION, game_map.height, game_map.width, chunk_size))
+
+
+class RegionStorage(my_game_map.MapStorage):
+    """my_game_map.MapStorage paging chunks from a region directory.
+
+    Room objects of chunks which are not pinned around the player are only
+    valid until the chunk is evicted.  Changes to them must be reported with
+    GameMap.MarkChanged to be written back.
+    """
+
+    STORAGE_TYPE = "regions"
+    DEFAULT_MAX_CHUNKS = 64
+
+    def __init__(self, directory, max_chunks=DEFAULT_MAX_CHUNKS,
+                 page_radius=1, names=None):
+        """Open a region directory.
+
+        Args:
+          directory:  Directory written by WriteRegions.
+          max_chunks:  Memory budget as the number of chunks to keep in
+            memory.  It is exceeded only if more chunks than that are pinned.
+          page_radius:  Chunks within this many chunks of the player are paged
+            in and pinned when the player moves.
+          names:  my_game_utils.NameRegistry of the item names of the world,
+            usually ItemMapper.names, for the rooms paged in.
+
+        Raises:
+          RegionError if the manifest is missing or unreadable.
+        """
+        self._directory = directory
+        self._max_chunks = max_chunks
+        self._page_radius = page_radius
+        self._names = names
+        try:
+            with open(os.path.join(directory, MANIFEST), "rb") as f:
+                (version, self._height, self._width,
+                 self._chunk_size) = marshal.load(f)
+        except (IOError, EOFError, ValueError, TypeError):
+            raise RegionError("Unable to read region manifest in %s"
+                              % directory)
+        if version != REGION_VERSION:
+            raise RegionError("Unsupported region version %d in %s"
+                              % (version, directory))
+        # Dict of chunk key to [cells, dirty] in least recently used order.
+        self._chunks = collections.OrderedDict()
+        # Chunks pinned around the player of the map, and around the player
+        # of each live session sharing it.
+        self._pinned = frozenset()
+        self._session_pins = weakref.WeakKeyDictionary()
+        self._loads = 0
+        self._writes = 0
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    @property
+    def cells(self):
+        return self._chunks
+
+    @property
+    def loads(self):
+        return self._loads
+
+    @property
+    def writes(self):
+        return self._writes
+
+    def _Key(self, y, x):
+        return (y // self._chunk_size, x // self._chunk_size)
+
+    def _Index(self, y, x):
+        return (y % self._chunk_size) * self._chunk_size + x % self._chunk_size
+
+    def _Chunk(self, key):
+        """Returns the resident [cells, dirty] of a chunk, paging it in."""
+        chunk = self._chunks.pop(key, None)
+        if chunk is None:
+            chunk = [[None] * (self._chunk_size * self._chunk_size), False]
+            filename = _ChunkFilename(self._directory, key)
+            if os.path.exists(filename):
+                with open(filename, "rb") as f:
+                    rooms = marshal.load(f)
+                cells = chunk[0]
+                from_contents = my_game_room.Room.FromContents
+                for i, state, contents in rooms:
+                    cells[i] = from_contents(
+                        state, my_game_utils.Multiset(contents, self._names))
+                self._loads += 1
+            self._chunks[key] = chunk
+            # The chunk just paged in is the most recently used one, and the
+            # caller is about to use it, so it is never evicted here.
+            self._Evict(keep=key)
+        else:
+            self._chunks[key] = chunk
+        return chunk
+
+    def _Write(self, key, chunk):
+        rooms = [(i, room.state, list(room.contents))
+                 for i, room in enumerate(chunk[0]) if room is not None]
+        filename = _ChunkFilename(self._directory, key)
+        if rooms:
+            _WriteFile(filename, rooms)
+        elif os.path.exists(filename):
+            os.remove(filename)
+        chunk[1] = False
+        self._writes += 1
+
+    def _Evict(self, keep=None):
+        """Evict least recently used chunks which are not pinned or keep."""
+        if len(self._chunks) <= self._max_chunks:
+            return
+        pinned = self._pinned.union(*self._session_pins.values())
+        for key in list(self._chunks):
+            if len(self._chunks) <= self._max_chunks:
+                break
+            if key in pinned or key == keep:
+                continue
+            chunk = self._chunks.pop(key)
+            if chunk[1]:
+                self._Write(key, chunk)
+
+    def Get(self, y, x):
+        return self._Chunk(self._Key(y, x))[0][self._Index(y, x)]
+
+    def Set(self, y, x, room):
+        chunk = self._Chunk(self._Key(y, x))
+        chunk[0][self._Index(y, x)] = room
+        chunk[1] = True
+
+    def MarkChanged(self, y, x):
+        self._Chunk(self._Key(y, x))[1] = True
+
+    def PageAround(self, y, x, session=None):
+        cy, cx = self._Key(y, x)
+        r = self._page_radius
+        pinned = frozenset(
+            (ky, kx) for ky in range(cy - r, cy + r + 1)
+            for kx in range(cx - r, cx + r + 1)
+            if ky >= 0 and kx >= 0
+            and ky * self._chunk_size < self._height
+            and kx * self._chunk_size < self._width)
+        if session is None:
+            self._pinned = pinned
+        else:
+            self._session_pins[session] = pinned
+        for key in pinned:
+            self._Chunk(key)
+        self._Evict()
+
+    def IsPinned(self, y, x, session=None):
+        if session is None:
+            pinned = self._pinned
+        else:
+            pinned = self._session_pins.get(session, ())
+        return self._Key(y, x) in pinned
+
+    def Flush(self):
+        for key, chunk in self._chunks.iteritems():
+            if chunk[1]:
+                self._Write(key, chunk)
+
+    def Iter(self):
+        """Yields (y, x, room) chunk by chunk, row-major within a chunk."""
+        keys = set(self._chunks)
+        for filename in os.listdir(self._directory):
+            if filename.endswith(CHUNK_SUFFIX):
+                cy, cx = filename[:-len(CHUNK_SUFFIX)].split("_")
+                keys.add((int(cy), int(cx)))
+        size = self._chunk_size
+        for cy, cx in sorted(keys):
+            cells = self._Chunk((cy, cx))[0]
+            for i, room in enumerate(cells):
+                if room is not None:
+                    yield cy * size + i // size, cx * size + i % size, room
+
+
+def LoadRegions(game_map, directory, **kwargs):
+    """Initialize a game map from a region directory.
+
+    Args:
+      game_map:  An uninitialized my_game_map.GameMap.
+      directory:  Directory written by WriteRegions.
+      **kwargs:  Passed on to RegionStorage.
+
+    Returns:
+      The RegionStorage backing the map.
+    """
+    storage = RegionStorage(directory, **kwargs)
+    game_map.height = storage.height
+    game_map.width = storage.width
+    game_map.Initialize(storage=storage)
+    return storage
+
+
+def main(argv):
+    """Write the map of a config file as region files.
+
+    To run:
+      python my_game_region.py <config file> <directory> [chunk size]
+    """
+    import my_game_parser
+    if len(argv) < 3:
+        print main.__doc__
+        return 1
+    parser = my_game_parser.GameParser(streaming=True)
+    parser.Parse(argv[1])
+    chunk_size = my_game_map.ChunkedStorage.CHUNK_SIZE
+    if len(argv) > 3:
+        chunk_size = int(argv[3])
+    WriteRegions(parser.player.game_map, argv[2], chunk_size=chunk_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,203 @@
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import unittest
+
+import game
+import my_game_cache
+import my_game_item
+import my_game_map
+import my_game_parser
+import my_game_region
+
+
+class TestRegionStorage(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._regions = os.path.join(self._tmp_dir, "regions")
+        self._parser = my_game_parser.GameParser()
+        self._parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        my_game_region.WriteRegions(
+            self._parser.player.game_map, self._regions, chunk_size=4)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _Rooms(self, game_map):
+        return sorted((y, x, r.state, r.contents)
+                      for y, x, r in game_map.IterRooms())
+
+    def _Load(self, **kwargs):
+        game_map = my_game_map.GameMap()
+        storage = my_game_region.LoadRegions(
+            game_map, self._regions, **kwargs)
+        return game_map, storage
+
+    def test_round_trip(self):
+        game_map, storage = self._Load(max_chunks=2)
+        self.assertEqual(game_map.storage, "regions")
+        self.assertEqual((game_map.height, game_map.width), (10, 10))
+        self.assertEqual(self._Rooms(game_map),
+                         self._Rooms(self._parser.player.game_map))
+        self.assertEqual(game_map.DebugInfo(),
+                         self._parser.player.game_map.DebugInfo())
+        self.assertTrue(len(storage.cells) <= 2)
+        self.assertEqual(game_map.GetRoom(3, 3), None)
+        self.assertEqual(game_map.GetRoom(10, 0), None)
+
+    def test_dirty_chunks_are_written_back(self):
+        game_map, storage = self._Load(max_chunks=1, page_radius=0)
+        room = game_map.GetRoom(0, 4)
+        room.state = 3
+        room.AddContent("sand")
+        game_map.MarkChanged(0, 4)
+        # Reading the bottom of the map evicts the changed chunk.
+        self.assertEqual(game_map.GetRoom(9, 4).state, 1)
+        self.assertEqual(storage.writes, 1)
+        self.assertEqual(game_map.GetRoom(0, 4).state, 3)
+        # Clean chunks are not written.
+        game_map.GetRoom(9, 4)
+        self.assertEqual(storage.writes, 1)
+
+        # Changes are visible to a new map after flushing.
+        game_map.GetRoom(0, 5).state = 2
+        game_map.MarkChanged(0, 5)
+        game_map.Flush()
+        game_map, _ = self._Load()
+        self.assertEqual(game_map.GetRoom(0, 4).contents,
+                         ["co2", "co2", "co2", "foam", "sand"])
+        self.assertEqual(game_map.GetRoom(0, 5).state, 2)
+
+    def test_player_pages_around(self):
+        game_map, storage = self._Load(max_chunks=1, page_radius=0)
+        player = self._parser.player
+        player.game_map = game_map
+        self.assertTrue(player.Start())
+        self.assertEqual(player.AddItem("foam")[0], True)
+        # Walking down to another chunk evicts the first one.
+        for _ in range(4):
+            self.assertTrue(player.MoveDown()[0])
+        self.assertEqual((player.y_pos, player.x_pos), (4, 4))
+        self.assertEqual(storage.writes, 1)
+        self.assertEqual(player.DropItem("foam")[0], True)
+        self.assertTrue(player.MoveUp()[0])
+        self.assertEqual(player.curr_room.state, 0)
+        game_map.Flush()
+        game_map, _ = self._Load()
+        self.assertEqual(game_map.GetRoom(0, 4).contents,
+                         ["co2", "co2", "co2"])
+        self.assertEqual(game_map.GetRoom(4, 4).contents, ["foam"])
+
+    def test_failed_take_does_not_write_back(self):
+        game_map, storage = self._Load(max_chunks=1, page_radius=0)
+        player = self._parser.player
+        player.game_map = game_map
+        player.max_inventory_size = 0
+        self.assertTrue(player.Start())
+        self.assertEqual(player.AddItem("co2")[0], False)
+        game_map.Flush()
+        self.assertEqual(storage.writes, 0)
+
+    def test_area_use_does_not_page_in_the_map(self):
+        item = my_game_item.GameItem()
+        for state in xrange(4):
+            item.AddStateChange(state, (state + 1) % 4)
+        item.radius = 1
+        item = my_game_item.ItemDefinition.FromGameItem(item)
+        by_room, _ = self._Load()
+        game_map, storage = self._Load(max_chunks=1, page_radius=0)
+        self.assertEqual(game_map.state_grid, None)
+        changed = game_map.UseItemInArea(item, 0, 4)
+        self.assertEqual(changed, by_room.UseItemInAreaByRoom(item, 0, 4))
+        self.assertTrue(changed)
+        # Only the chunks of the area were read.
+        self.assertTrue(all(key[0] == 0 for key in storage.cells))
+
+    def test_travel_only_searches_pinned_chunks(self):
+        game_map, storage = self._Load(max_chunks=1, page_radius=0)
+        player = self._parser.player
+        player.game_map = game_map
+        self.assertTrue(player.Start())
+        self.assertEqual(storage.loads, 1)
+        self.assertFalse(player.TravelTo("nearest sand")[0])
+        self.assertFalse(player.TravelTo("9, 4")[0])
+        self.assertEqual(storage.loads, 1)
+        # Rooms in the player's chunk can still be travelled to.
+        self.assertTrue(player.TravelTo("1, 7")[0])
+        self.assertEqual((player.y_pos, player.x_pos), (1, 7))
+        self.assertEqual(storage.loads, 1)
+
+    def test_sessions_pin_their_own_chunks(self):
+        game_map, storage = self._Load(max_chunks=1, page_radius=0)
+        self._parser.player.game_map = game_map
+        template = my_game_cache.WorldTemplate(self._parser.player,
+                                               self._parser.game_interface)
+        first, _ = template.NewSession()
+        second, _ = template.NewSession()
+        self.assertTrue(first.Start())
+        # Paging around another session keeps the chunk of the first pinned.
+        second.game_map.PageAround(9, 4)
+        self.assertTrue(first.game_map.IsPinned(1, 7))
+        self.assertFalse(first.game_map.IsPinned(9, 4))
+        self.assertTrue(second.game_map.IsPinned(9, 4))
+        self.assertFalse(second.game_map.IsPinned(1, 7))
+        self.assertEqual(len(storage.cells), 2)
+        loads = storage.loads
+        self.assertTrue(first.TravelTo("1, 7")[0])
+        self.assertEqual((first.y_pos, first.x_pos), (1, 7))
+        self.assertEqual(storage.loads, loads)
+
+    def test_pinned_chunks_are_kept(self):
+        game_map, storage = self._Load(max_chunks=1, page_radius=1)
+        game_map.PageAround(5, 5)
+        pinned = dict(storage.cells)
+        self.assertEqual(len(pinned), 9)
+        room = game_map.GetRoom(5, 5)
+        game_map.GetRoom(0, 0)
+        self.assertTrue(game_map.GetRoom(5, 5) is room)
+
+    def test_parse_regions(self):
+        config = os.path.join(self._tmp_dir, "regions.game")
+        with open(config, "w") as f:
+            f.write("[MAP]\nregions:regions:3\nplayer_start:0:4\n")
+        parser = my_game_parser.GameParser(streaming=True)
+        parser.Parse(config)
+        self.assertEqual(self._Rooms(parser.player.game_map),
+                         self._Rooms(self._parser.player.game_map))
+        parser = my_game_parser.GameParser(streaming=True)
+        with self.assertRaises(my_game_parser.ParseError):
+            parser.ParseLine("[MAP]")
+            parser.ParseLine("regions:missing")
+
+    def test_game_flushes_on_exit(self):
+        # The ISS Fire game with its map in regions.
+        with open("configs/iss_fire.game") as f:
+            text = f.read()
+        start = text.index("[MAP]")
+        end = text.index("[ALIASES_MOVE]")
+        config = os.path.join(self._tmp_dir, "regions.game")
+        with open(config, "w") as f:
+            f.write(text[:start] + "[MAP]\nregions:regions\n"
+                    "player_start:0:4\n" + text[end:])
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin = StringIO.StringIO("take foam\nexit\n")
+        sys.stdout = StringIO.StringIO()
+        try:
+            game.main(["game.py", config])
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+        # The player's chunk is pinned, so it is only written by the flush.
+        game_map, _ = self._Load()
+        self.assertEqual(game_map.GetRoom(0, 4).contents,
+                         ["co2", "co2", "co2"])
+
+    def test_bad_manifest(self):
+        with self.assertRaises(my_game_region.RegionError):
+            my_game_region.RegionStorage(self._tmp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
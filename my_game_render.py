@@ -0,0 +1,112 @@
+"""Debug drawing of the part of a GameMap around the player.
+
+GameMap.DebugInfo draws every cell of the map, which floods the terminal and
+takes milliseconds per turn on a large map.  A MapRenderer draws a viewport of
+at most height x width cells instead, in the same characters, and caches the
+rows it drew.  The player marker is added when a row is output, so moving does
+not rebuild any rows, and the viewport only scrolls once the player gets close
+to its edge.  Cached rows are dropped when rooms are added to or removed from
+the map.
+"""
+
+
+class MapRenderer(object):
+    """Draws a viewport of a GameMap, caching the rows drawn."""
+
+    # Default size of the viewport in cells.
+    HEIGHT = 21
+    WIDTH = 61
+
+    ROOM = " "
+    NO_ROOM = "#"
+    PLAYER = "P"
+
+    def __init__(self, game_map, height=HEIGHT, width=WIDTH):
+        """Create a renderer.
+
+        Args:
+          game_map:  An initialized my_game_map.GameMap.
+          height:  Maximum number of rows to draw.
+          width:  Maximum number of columns to draw.
+        """
+        self._game_map = game_map
+        self._height = min(height, game_map.height)
+        self._width = min(width, game_map.width)
+        # (y, x) of the top left cell of the viewport.
+        self._origin = None
+        # Dict of map row to the drawn cells of the viewport's columns.
+        self._rows = {}
+        self._topology_version = game_map.topology_version
+
+    @property
+    def game_map(self):
+        return self._game_map
+
+    @property
+    def origin(self):
+        return self._origin
+
+    @staticmethod
+    def _Scroll(start, size, limit, position):
+        """Returns the first cell of a span of size cells showing position.
+
+        The span only moves once position is within a quarter of its size of
+        an edge, and then centers on position.
+        """
+        margin = size // 4
+        if (start is not None
+            and start + margin <= position < start + size - margin):
+            return start
+        return max(0, min(limit - size, position - size // 2))
+
+    def _Row(self, y):
+        row = self._rows.get(y)
+        if row is None:
+            has_room = self._game_map.HasRoom
+            x0 = self._origin[1]
+            row = self._rows[y] = "".join(
+                self.ROOM if has_room(y, x) else self.NO_ROOM
+                for x in xrange(x0, x0 + self._width))
+        return row
+
+    def Render(self, y_player=None, x_player=None):
+        """Draw the viewport around the player.
+
+        Args:
+          y_player:  Y-coordinate of the player, None to not mark the player.
+          x_player:  X-coordinate of the player.
+
+        Returns:
+          A list of lines, including a border, in the format of
+          GameMap.PrintDebugOutput.  A map which fits in the viewport is drawn
+          exactly as GameMap.DebugInfo draws it.
+        """
+        game_map = self._game_map
+        if self._topology_version != game_map.topology_version:
+            self._topology_version = game_map.topology_version
+            self._rows = {}
+        y_origin, x_origin = self._origin or (None, None)
+        if y_player is not None and x_player is not None:
+            y_origin = self._Scroll(y_origin, self._height, game_map.height,
+                                    y_player)
+            x_origin = self._Scroll(x_origin, self._width, game_map.width,
+                                    x_player)
+        if y_origin is None:
+            y_origin = x_origin = 0
+        if self._origin is None or x_origin != self._origin[1]:
+            self._rows = {}
+        elif y_origin != self._origin[0]:
+            # Keep the rows which are still in view.
+            self._rows = dict((y, row) for y, row in self._rows.iteritems()
+                              if y_origin <= y < y_origin + self._height)
+        self._origin = (y_origin, x_origin)
+        border = "+%s+" % ("-" * self._width)
+        lines = [border]
+        for y in xrange(y_origin, y_origin + self._height):
+            row = self._Row(y)
+            if y == y_player and 0 <= x_player - x_origin < self._width:
+                i = x_player - x_origin
+                row = row[:i] + self.PLAYER + row[i + 1:]
+            lines.append("|%s|" % row)
+        lines.append(border)
+        return lines
@@ -0,0 +1,70 @@
+import unittest
+
+import my_game_map
+import my_game_render
+import my_game_room
+
+
+class TestMapRenderer(unittest.TestCase):
+
+    def _Map(self, rows):
+        game_map = my_game_map.GameMap()
+        game_map.height = len(rows)
+        game_map.width = len(rows[0])
+        game_map.Initialize()
+        for y, row in enumerate(rows):
+            for x, cell in enumerate(row):
+                if cell == " ":
+                    game_map.SetRoom(y, x, my_game_room.Room())
+        return game_map
+
+    def test_small_map(self):
+        game_map = self._Map(["   ", "# #", "  #"])
+        renderer = my_game_render.MapRenderer(game_map)
+        lines = renderer.Render(2, 1)
+        self.assertEqual(lines, ["+---+", "|   |", "|# #|", "| P#|", "+---+"])
+        # Drawn exactly as the whole map.
+        self.assertEqual(
+            lines[1:-1],
+            ["|%s|" % r for r in game_map.DebugInfo(y_player=2, x_player=1)])
+        self.assertEqual(renderer.Render()[3], "|  #|")
+
+    def test_viewport(self):
+        game_map = self._Map([" " * 20] * 10)
+        renderer = my_game_render.MapRenderer(game_map, height=4, width=8)
+        lines = renderer.Render(0, 0)
+        self.assertEqual(renderer.origin, (0, 0))
+        self.assertEqual(lines, ["+--------+", "|P       |", "|        |",
+                                 "|        |", "|        |", "+--------+"])
+        # The viewport does not scroll while the player is away from its edges.
+        renderer.Render(1, 3)
+        self.assertEqual(renderer.origin, (0, 0))
+        # Then it centers on the player, within the map.
+        self.assertEqual(renderer.Render(3, 7)[3], "|    P   |")
+        self.assertEqual(renderer.origin, (1, 3))
+        renderer.Render(9, 19)
+        self.assertEqual(renderer.origin, (6, 12))
+        self.assertEqual(renderer.Render(9, 19)[4], "|       P|")
+
+    def test_cached_rows(self):
+        game_map = self._Map([" " * 8] * 4)
+        renderer = my_game_render.MapRenderer(game_map, height=4, width=8)
+        renderer.Render(0, 0)
+        rows = dict(renderer._rows)
+        # Moving does not rebuild any rows.
+        self.assertEqual(renderer.Render(1, 0)[1:3],
+                         ["|        |", "|P       |"])
+        for y, row in rows.iteritems():
+            self.assertTrue(renderer._rows[y] is row)
+        # Changing a room's state does not either.
+        game_map.GetRoom(3, 0).state = 5
+        game_map.MarkChanged(3, 0)
+        renderer.Render(1, 0)
+        self.assertTrue(renderer._rows[3] is rows[3])
+        # Removing a room is drawn.
+        game_map.SetRoom(3, 7, None)
+        self.assertEqual(renderer.Render(1, 0)[4], "|       #|")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""Headless replay of command transcripts.
+
+A transcript is a text file with one command per line, e.g. the command
+history printed when leaving the game in debug mode.  Empty lines and lines
+starting with "#" are ignored, and replay stops at an "exit" command.
+
+Replaying runs each command through GameInterface.ExecuteCommand against a new
+session of a parsed world, without the interactive loop, and returns every
+(success, message) result.  This is meant for regression tests of content
+changes and for load testing.
+
+To run:
+  python my_game_replay.py [--processes N] [--undo depth] [--quiet]
+      <config> <transcript>...
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+
+import my_game_cache
+import my_game_journal
+import my_game_parser
+
+
+class ReplayError(Exception):
+    pass
+
+
+def ReadTranscript(filename):
+    """Returns the list of commands in a transcript file."""
+    commands = []
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                commands.append(line)
+    return commands
+
+
+def LoadTemplate(config_file):
+    """Parse a config into a my_game_cache.WorldTemplate to replay against."""
+    parser = my_game_parser.GameParser(streaming=True)
+    parser.Parse(config_file)
+    return my_game_cache.WorldTemplate(parser.player, parser.game_interface)
+
+
+def Replay(template, commands, undo_depth=100):
+    """Replay commands against a new session of the world.
+
+    Args:
+      template:  A my_game_cache.WorldTemplate.
+      commands:  Iterable of command strings.
+      undo_depth:  Number of actions which can be undone, as when playing
+        with game.py.  Undo is disabled if None.
+
+    Returns:
+      A list of (success, message) tuples, one for each command before the
+      first exit command.  A command which raises an exception is recorded
+      as failed with the exception as its message, and replay goes on.
+
+    Raises:
+      ReplayError if the player can not start in the world.
+    """
+    player, game_interface = template.NewSession()
+    if undo_depth is not None:
+        player.journal = my_game_journal.Journal(undo_depth)
+    if not player.Start():
+        raise ReplayError("The player can not start in this world")
+    execute = game_interface.ExecuteCommand
+    results = []
+    for command in commands:
+        if command.strip(".,!? ").lower() == game_interface.EXIT_CMD:
+            break
+        try:
+            results.append(execute(player, command))
+        except Exception, e:
+            # One bad line must not lose the results of the whole transcript,
+            # or of every transcript in ReplayMany.
+            results.append((False, "%s: %s" % (type(e).__name__, e)))
+    return results
+
+
+# The template of the config a worker process replays against, and the undo
+# depth of its sessions.
+_worker_template = None
+_worker_undo_depth = None
+
+
+def _InitWorker(config_file, undo_depth):
+    global _worker_template, _worker_undo_depth
+    _worker_template = LoadTemplate(config_file)
+    _worker_undo_depth = undo_depth
+
+
+def _ReplayInWorker(commands):
+    return Replay(_worker_template, commands, undo_depth=_worker_undo_depth)
+
+
+def ReplayMany(config_file, transcripts, processes=1, undo_depth=100):
+    """Replay many transcripts, each against its own session.
+
+    Args:
+      config_file:  Path to the .game config to replay against.
+      transcripts:  List of lists of commands.
+      processes:  Number of worker processes.  Each one parses the config
+        once.  With 1, everything runs in this process.
+      undo_depth:  Number of actions each session can undo, see Replay.
+
+    Returns:
+      A list with the results of Replay for each transcript, in order.
+    """
+    if processes <= 1:
+        template = LoadTemplate(config_file)
+        return [Replay(template, commands, undo_depth=undo_depth)
+                for commands in transcripts]
+    pool = multiprocessing.Pool(processes, initializer=_InitWorker,
+                                initargs=(config_file, undo_depth))
+    try:
+        return pool.map(_ReplayInWorker, transcripts)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def FormatResults(commands, results):
+    """Returns printable lines of "OK|FAIL<tab>command<tab>message"."""
+    return ["%s\t%s\t%s" % ("OK" if success else "FAIL", command, msg)
+            for command, (success, msg) in zip(commands, results)]
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    arg_parser.add_argument("config")
+    arg_parser.add_argument("transcripts", nargs="+")
+    arg_parser.add_argument("--processes", type=int, default=1)
+    arg_parser.add_argument("--undo", type=int, default=100,
+                            help="Undo depth, 0 disables undo.")
+    arg_parser.add_argument("--quiet", action="store_true",
+                            help="Only print the summary.")
+    args = arg_parser.parse_args(argv[1:])
+
+    transcripts = [ReadTranscript(f) for f in args.transcripts]
+    start = time.time()
+    all_results = ReplayMany(args.config, transcripts,
+                             processes=args.processes,
+                             undo_depth=args.undo or None)
+    seconds = time.time() - start
+    total = 0
+    for filename, commands, results in zip(
+            args.transcripts, transcripts, all_results):
+        total += len(results)
+        if not args.quiet:
+            print "# %s" % filename
+            print "\n".join(FormatResults(commands, results))
+    print "# %d commands in %d transcripts in %.3fs (%.0f commands/s)" % (
+        total, len(transcripts), seconds, total / seconds if seconds else 0)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import my_game_cache
+import my_game_parser
+import my_game_replay
+
+
+class TestReplay(unittest.TestCase):
+
+    COMMANDS = ["look", "take foam", "go down", "use co2", "use co2",
+                "fly away", "help"]
+
+    def setUp(self):
+        self._template = my_game_replay.LoadTemplate("configs/iss_fire.game")
+
+    def test_replay(self):
+        results = my_game_replay.Replay(self._template, self.COMMANDS)
+        self.assertEqual(
+            [success for success, _ in results],
+            [True, True, True, True, False, False, True])
+        self.assertEqual(results[3][1],
+                         "Used co2 and now the room is [electrical fire]")
+        self.assertEqual(results[5][1],
+                         "I don't understand that.  Try 'help'.")
+        self.assertEqual(results[6][1],
+                         self._template.game_interface.help)
+        # Each replay starts from the initial world.
+        self.assertEqual(
+            my_game_replay.Replay(self._template, self.COMMANDS), results)
+
+    def test_replay_stops_at_exit(self):
+        results = my_game_replay.Replay(
+            self._template, ["look", "Exit!", "take foam"])
+        self.assertEqual(len(results), 1)
+
+    def test_replay_undo(self):
+        commands = ["take foam", "undo", "look"]
+        results = my_game_replay.Replay(self._template, commands)
+        self.assertEqual([success for success, _ in results],
+                         [True, True, True])
+        self.assertEqual(results[2],
+                         my_game_replay.Replay(self._template, ["look"])[0])
+        results = my_game_replay.Replay(self._template, commands,
+                                        undo_depth=None)
+        self.assertFalse(results[1][0])
+        self.assertEqual(
+            my_game_replay.ReplayMany("configs/iss_fire.game", [commands],
+                                      processes=2),
+            [my_game_replay.Replay(self._template, commands)])
+
+    def test_read_transcript(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, "transcript")
+            with open(filename, "w") as f:
+                f.write("# A comment\nlook\n\n  take foam \n")
+            self.assertEqual(my_game_replay.ReadTranscript(filename),
+                             ["look", "take foam"])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_bad_lines_fail(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, "transcript")
+            with open(filename, "w") as f:
+                f.write("take\ntake foam\n")
+            results = my_game_replay.Replay(
+                self._template, my_game_replay.ReadTranscript(filename))
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(results,
+                         [(False, "Take what?"),
+                          (True, "foam successfully added to inventory.")])
+        # Commands which raise are failures too.
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        parser.game_interface.AddActionAlias(
+            "break", lambda player, item: 1 / 0)
+        template = my_game_cache.WorldTemplate(parser.player,
+                                               parser.game_interface)
+        results = my_game_replay.Replay(template, ["break it", "look"])
+        self.assertEqual(results[0][0], False)
+        self.assertTrue(results[0][1].startswith("ZeroDivisionError"))
+        self.assertTrue(results[1][0])
+
+    def test_replay_many(self):
+        transcripts = [self.COMMANDS, ["go up"], self.COMMANDS[:3]]
+        expected = [my_game_replay.Replay(self._template, t)
+                    for t in transcripts]
+        self.assertEqual(
+            my_game_replay.ReplayMany("configs/iss_fire.game", transcripts),
+            expected)
+        self.assertEqual(
+            my_game_replay.ReplayMany("configs/iss_fire.game", transcripts,
+                                      processes=2),
+            expected)
+
+    def test_format_results(self):
+        self.assertEqual(
+            my_game_replay.FormatResults(
+                ["look", "fly"], [(True, "Fine."), (False, "No.")]),
+            ["OK\tlook\tFine.", "FAIL\tfly\tNo."])
+
+
+if __name__ == "__main__":
+    unittest.main()
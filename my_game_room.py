@@ -6,11 +6,24 @@ class RoomStateMapper(object):
 
     This class, when instantiated, acts like a datastore mapping between a state
     ID and a description of a room, which is a list of adjectives.
+
+    The display string of each state, the adjectives joined by commas, is
+    built once when the state is added, and the messages built from it by
+    GetMessage are cached, so showing a room allocates nothing for states
+    which were shown before.
     """
 
+    # Number of messages GetMessage keeps before starting over.
+    MAX_MESSAGES = 10000
+
     def __init__(self):
         self._default_state = []
         self._all_states = {}
+        # Dict of state ID to its interned display string.
+        self._displays = {}
+        self._default_display = ""
+        # Dict of (template, item, state ID) to a message.
+        self._messages = {}
 
     @property
     def all_states(self):
@@ -23,6 +36,8 @@ class RoomStateMapper(object):
     @default_state.setter
     def default_state(self, s):
         self._default_state = s
+        self._default_display = _Display(s)
+        self._messages = {}
 
     def AddState(self, sid, desc):
         """Add or potentially override an existing room state description.
@@ -32,6 +47,8 @@ class RoomStateMapper(object):
           desc:  List of string descriptions.
         """
         self._all_states[sid] = desc
+        self._displays[sid] = _Display(desc)
+        self._messages = {}
 
     def GetState(self, sid):
         """Returns the description of the game state.
@@ -45,15 +62,52 @@ class RoomStateMapper(object):
         """
         return self._all_states.get(sid, self._default_state)
 
+    def GetStateDisplay(self, sid):
+        """Returns the descriptions of the game state joined by commas."""
+        return self._displays.get(sid, self._default_display)
+
+    def GetMessage(self, template, sid, item=None):
+        """Returns a message showing the game state, cached.
+
+        Args:
+          template:  Format string with a %s for the state display, after a
+            %s for the item if there is one.
+          sid:  Integer room state ID.
+          item:  Optional string name of an item for the template.
+        """
+        key = (template, item, sid)
+        message = self._messages.get(key)
+        if message is None:
+            display = self.GetStateDisplay(sid)
+            message = template % (
+                (display,) if item is None else (item, display))
+            if len(self._messages) >= self.MAX_MESSAGES:
+                self._messages = {}
+            self._messages[key] = message
+        return message
+
+
+def _Display(desc):
+    display = ", ".join(desc)
+    if isinstance(display, str):
+        display = intern(display)
+    return display
+
 
 class Room(object):
     """Object to abstract out concept of a room in the game."""
     
-    def __init__(self):
+    def __init__(self, names=None):
+        """Create an empty room.
+
+        Args:
+          names:  my_game_utils.NameRegistry of the item names of the world,
+            usually ItemMapper.names.  The room has its own if None.
+        """
         # A state class must implement a __str__ method for debugging.
         self._state = None
-        # Contents are kept sorted.
-        self._contents = []
+        # Contents are kept as counts of each item.
+        self._contents = my_game_utils.Multiset(names=names)
     
     @property
     def state(self):
@@ -65,11 +119,12 @@ class Room(object):
 
     @property
     def contents(self):
-        return self._contents
+        """A new sorted list of the names of the items in the room."""
+        return self._contents.Items()
 
     @contents.setter
     def contents(self, c):
-        self._contents = c
+        self._contents = my_game_utils.Multiset(c, self._contents.names)
 
     def AddContent(self, item):
         """Add content to this room.
@@ -78,21 +133,44 @@ class Room(object):
 
         Args:
           item:  Name of an item to put into the room.
-
-        Raises:
-          Attribute error if sort_id is undefined.
         """
-        self._contents.append(item)
-        self._contents.sort()
+        self._contents.Add(item)
 
     def RemoveContent(self, content_name):
-        # Removing an item from a sorted list should still preserve the sorted
-        # order of the list.
-        return my_game_utils.RemoveContent(self._contents, content_name)
+        """Remove an item from this room.
+
+        Args:
+          content_name:  Name of the item to remove.
+
+        Returns:
+          The item if found, None otherwise.
+        """
+        return self._contents.Remove(content_name)
+
+    def HasContent(self, content_name):
+        return content_name in self._contents
 
     def GetContentsDisplay(self):
         """Get the contents of the room to display."""
-        return my_game_utils.GetContentsDisplay(self._contents)
+        return self._contents.GetContentsDisplay()
+
+    @classmethod
+    def FromContents(cls, state, contents):
+        """Returns a new room without building an empty multiset first.
+
+        Args:
+          state:  Initial state of the room.
+          contents:  my_game_utils.Multiset of the items in the room, which
+            the room takes ownership of.
+        """
+        room = cls.__new__(cls)
+        room._state = state
+        room._contents = contents
+        return room
+
+    def Copy(self):
+        """Returns a new room with the same state and its own contents."""
+        return Room.FromContents(self._state, self._contents.Copy())
 
     def TryChangeState(self, new_state):
         if new_state == self._state:
@@ -92,6 +92,23 @@ class TestRoom(unittest.TestCase):
         self.assertEqual(self.game_room.DebugInfo(),
                          ["STATE: 0", "CONTENTS: []"])
 
+    def test_has_content(self):
+        self.assertFalse(self.game_room.HasContent("A"))
+        self.game_room.AddContent("A")
+        self.assertTrue(self.game_room.HasContent("A"))
+        # The contents list is a copy.
+        self.game_room.contents.append("B")
+        self.assertEqual(self.game_room.contents, ["A"])
+
+    def test_copy(self):
+        self.game_room.state = 2
+        self.game_room.AddContent("A")
+        room = self.game_room.Copy()
+        self.assertEqual(room.state, 2)
+        self.assertEqual(room.contents, ["A"])
+        room.AddContent("B")
+        self.assertEqual(self.game_room.contents, ["A"])
+
     def test_change_state(self):
         self.game_room.state = 0
 
@@ -122,6 +139,35 @@ class TestRoomStateMapper(unittest.TestCase):
         self.assertEqual(self.room_states.GetState(0), "Everything's OK!")
         self.assertEqual(self.room_states.GetState(1), "Room is on fire!")
 
+    def test_state_display(self):
+        self.assertEqual(self.room_states.GetStateDisplay(0), "")
+        self.room_states.default_state = ["unknown"]
+        self.assertEqual(self.room_states.GetStateDisplay(0), "unknown")
+        self.room_states.AddState(0, ["hot", "smoky"])
+        display = self.room_states.GetStateDisplay(0)
+        self.assertEqual(display, "hot, smoky")
+        # The display is built once, and interned.
+        self.assertTrue(self.room_states.GetStateDisplay(0) is display)
+        self.assertTrue(display is intern("hot, " + "smoky"))
+
+    def test_get_message(self):
+        self.room_states.AddState(0, ["hot", "smoky"])
+        message = self.room_states.GetMessage("It is [%s].", 0)
+        self.assertEqual(message, "It is [hot, smoky].")
+        self.assertTrue(self.room_states.GetMessage("It is [%s].", 0)
+                        is message)
+        self.assertEqual(self.room_states.GetMessage("%s made it [%s].", 0,
+                                                     "foam"),
+                         "foam made it [hot, smoky].")
+        # Changing a state drops the cached messages.
+        self.room_states.AddState(0, ["fine"])
+        self.assertEqual(self.room_states.GetMessage("It is [%s].", 0),
+                         "It is [fine].")
+        self.room_states.MAX_MESSAGES = 2
+        for sid in xrange(5):
+            self.room_states.GetMessage("It is [%s].", sid)
+        self.assertTrue(len(self.room_states._messages) <= 2)
+
 
 if __name__ == '__main__':
     unittest.main()
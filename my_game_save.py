@@ -0,0 +1,305 @@
+"""Saving and loading games in progress.
+
+A save file is an append-only log.  Each checkpoint appends one record with
+the player's position and inventory and only the rooms which changed since the
+previous checkpoint, as tracked by GameMap.TakeDirty, so the cost of a save
+does not grow with the size of the map.  Loading replays the records over a
+freshly parsed world.  Once the log holds COMPACT_RECORDS records it is
+rewritten as a single record with the latest copy of every changed room.
+
+A save file is laid out as:
+  <4 byte magic><2 byte little-endian version>
+  <record>...
+where each record is:
+  <4 byte little-endian length><4 byte little-endian crc32><marshal payload>
+
+The first record identifies the world the game was saved from.  A torn record
+at the end of the file, e.g. from a crash while saving, is ignored.
+
+An Autosaver checkpoints from a background thread.  It only holds the lock of
+the SaveFile while copying the dirty rooms, and writes the record to disk after
+releasing it, so the command loop is not blocked by disk writes.
+"""
+import marshal
+import os
+import struct
+import threading
+import zlib
+
+import my_game_room
+
+
+SAVE_MAGIC = "TGSV"
+SAVE_VERSION = 1
+
+_HEADER = struct.Struct("<4sH")
+_RECORD = struct.Struct("<II")
+
+
+class SaveError(Exception):
+    pass
+
+
+def WorldId(player, game_interface):
+    """Returns a value identifying the world a game is played in."""
+    game_map = player.game_map
+    return (game_interface.name, game_map.height, game_map.width)
+
+
+def _ReadRecords(filename):
+    """Yields the payload of every complete record of a save file.
+
+    Raises:
+      SaveError if the file is not a save file.
+    """
+    with open(filename, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise SaveError("Truncated save file: %s" % filename)
+        magic, version = _HEADER.unpack(header)
+        if magic != SAVE_MAGIC:
+            raise SaveError("Not a save file: %s" % filename)
+        if version != SAVE_VERSION:
+            raise SaveError("Unsupported save version %d in %s"
+                            % (version, filename))
+        while True:
+            prefix = f.read(_RECORD.size)
+            if len(prefix) < _RECORD.size:
+                return
+            length, crc = _RECORD.unpack(prefix)
+            data = f.read(length)
+            if len(data) < length or zlib.crc32(data) & 0xffffffff != crc:
+                # The rest of the file was not completely written.
+                return
+            try:
+                yield marshal.loads(data)
+            except (EOFError, ValueError, TypeError):
+                raise SaveError("Corrupt save file: %s" % filename)
+
+
+def _PackRecord(payload):
+    data = marshal.dumps(payload)
+    return _RECORD.pack(len(data), zlib.crc32(data) & 0xffffffff) + data
+
+
+class SaveFile(object):
+    """The save file of one game in progress.
+
+    A checkpoint is a tuple of (y, x, inventory, rooms) where rooms is a list
+    of (y, x, state, contents) of the changed rooms.
+    """
+
+    # Number of records after which the log is compacted.
+    COMPACT_RECORDS = 100
+
+    def __init__(self, filename, player, game_interface):
+        """Open a save file.
+
+        Use Load to continue a saved game before playing, then Save to
+        checkpoint.  Commands which change the game must hold lock.
+
+        Args:
+          filename:  Path of the save file, which need not exist yet.
+          player:  The started my_game_player.Player of the game.
+          game_interface:  The my_game_interface.GameInterface of the game.
+        """
+        self._filename = filename
+        self._player = player
+        self._world_id = WorldId(player, game_interface)
+        self._lock = threading.Lock()
+        # Serializes writes to the file.
+        self._write_lock = threading.RLock()
+        self._records = 0
+        # Start tracking changes from here.  A new game is the same as the
+        # parsed world, so there is nothing to save yet.
+        self._last_player = (player.y_pos, player.x_pos, player.inventory)
+        player.game_map.TakeDirty()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def lock(self):
+        """Lock which must be held while the game changes."""
+        return self._lock
+
+    @property
+    def records(self):
+        """Number of checkpoints in the file."""
+        return self._records
+
+    def Load(self):
+        """Apply the saved checkpoints to the player and map.
+
+        Returns:
+          False if there is no save file yet, True otherwise.
+
+        Raises:
+          SaveError if the file is corrupt or was saved from another world.
+        """
+        if not os.path.exists(self._filename):
+            return False
+        records = _ReadRecords(self._filename)
+        world_id = next(records, None)
+        if world_id is None or tuple(world_id) != self._world_id:
+            raise SaveError("%s was saved from another world"
+                            % self._filename)
+        player = self._player
+        game_map = player.game_map
+        with self._lock:
+            self._records = 0
+            for y_pos, x_pos, inventory, rooms in records:
+                self._records += 1
+                for y, x, state, contents in rooms:
+                    room = game_map.GetRoom(y, x)
+                    if room is None:
+                        room = game_map.SetRoom(y, x, my_game_room.Room(
+                            player.item_mapper.names))
+                    room.state = state
+                    room.contents = contents
+                    game_map.MarkChanged(y, x)
+                player.y_pos = y_pos
+                player.x_pos = x_pos
+                player.inventory = inventory
+            game_map.TakeDirty()
+            if not player.Start():
+                raise SaveError("Saved position is not a room: %s"
+                                % self._filename)
+            self._last_player = (player.y_pos, player.x_pos,
+                                 player.inventory)
+        # Drop any torn record at the end, which later records would be
+        # appended after.
+        self.Compact()
+        return True
+
+    def Capture(self):
+        """Copy the changes since the last checkpoint.
+
+        Takes the lock, so the checkpoint is consistent with the commands run
+        so far.
+
+        Returns:
+          A checkpoint, or None if nothing changed.
+        """
+        player = self._player
+        game_map = player.game_map
+        with self._lock:
+            dirty = game_map.TakeDirty()
+            player_info = (player.y_pos, player.x_pos, player.inventory)
+            if not dirty and player_info == self._last_player:
+                return None
+            self._last_player = player_info
+            rooms = []
+            for y, x in sorted(dirty):
+                room = game_map.GetRoom(y, x)
+                if room is not None:
+                    rooms.append((y, x, room.state, room.contents))
+        return player_info + (rooms,)
+
+    def Write(self, checkpoint):
+        """Append a checkpoint to the file, compacting it if it is long."""
+        with self._write_lock:
+            if self._records == 0 and not os.path.exists(self._filename):
+                self._Rewrite([])
+            with open(self._filename, "ab") as f:
+                f.write(_PackRecord(checkpoint))
+                f.flush()
+                os.fsync(f.fileno())
+            self._records += 1
+            if self._records >= self.COMPACT_RECORDS:
+                self.Compact()
+
+    def Save(self):
+        """Checkpoint the game.
+
+        Returns:
+          True iff anything changed since the last checkpoint.
+        """
+        # Checkpoints must be written in the order they were captured, or
+        # Load would end on an older one.
+        with self._write_lock:
+            checkpoint = self.Capture()
+            if checkpoint is None:
+                return False
+            try:
+                self.Write(checkpoint)
+            except Exception:
+                # Leave the changes for the next checkpoint.
+                game_map = self._player.game_map
+                with self._lock:
+                    self._last_player = None
+                    for y, x, _, _ in checkpoint[3]:
+                        game_map.MarkChanged(y, x)
+                raise
+        return True
+
+    def Compact(self):
+        """Rewrite the log as one checkpoint with the latest of every room."""
+        with self._write_lock:
+            records = _ReadRecords(self._filename)
+            next(records, None)
+            rooms = {}
+            last = None
+            for last in records:
+                for room in last[3]:
+                    rooms[(room[0], room[1])] = room
+            checkpoints = []
+            if last is not None:
+                checkpoints.append(
+                    last[:3] + ([rooms[key] for key in sorted(rooms)],))
+            self._Rewrite(checkpoints)
+            self._records = len(checkpoints)
+
+    def _Rewrite(self, checkpoints):
+        """Replace the file, atomically, with the given checkpoints."""
+        tmp_filename = self._filename + ".tmp"
+        with open(tmp_filename, "wb") as f:
+            f.write(_HEADER.pack(SAVE_MAGIC, SAVE_VERSION))
+            f.write(_PackRecord(self._world_id))
+            for checkpoint in checkpoints:
+                f.write(_PackRecord(checkpoint))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_filename, self._filename)
+
+
+class Autosaver(object):
+    """Checkpoints a SaveFile every few seconds from a background thread."""
+
+    def __init__(self, save_file, interval=30.0):
+        """Create an autosaver.  Call Start to begin saving.
+
+        Args:
+          save_file:  A SaveFile.
+          interval:  Seconds between checkpoints.
+        """
+        self._save_file = save_file
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.saves = 0
+        # The last exception raised while saving, if any.
+        self.error = None
+
+    def Start(self):
+        self._thread = threading.Thread(target=self._Run, name="autosave")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def Stop(self):
+        """Stop the thread, then save any changes it did not get to."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._save_file.Save()
+
+    def _Run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                if self._save_file.Save():
+                    self.saves += 1
+            except Exception, e:
+                # Keep playing; the next checkpoint includes these changes.
+                self.error = e
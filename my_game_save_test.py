@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import my_game_parser
+import my_game_save
+
+
+class TestSaveFile(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._tmp_dir, "game.save")
+        self._player, self._game_interface = self._NewGame()
+        self._save_file = my_game_save.SaveFile(
+            self._filename, self._player, self._game_interface)
+        self._game_interface.save_file = self._save_file
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _NewGame(self):
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        self.assertTrue(parser.player.Start())
+        return parser.player, parser.game_interface
+
+    def _Play(self, commands):
+        for command in commands:
+            self._game_interface.ExecuteCommand(self._player, command)
+
+    def _Rooms(self, player):
+        return [(y, x, room.state, room.contents)
+                for y, x, room in player.game_map.IterRooms()]
+
+    def _Load(self):
+        player, game_interface = self._NewGame()
+        save_file = my_game_save.SaveFile(self._filename, player,
+                                          game_interface)
+        self.assertTrue(save_file.Load())
+        return player, save_file
+
+    def test_save_and_load(self):
+        self.assertFalse(self._save_file.Load())
+        self.assertFalse(self._save_file.Save())
+        self._Play(["take foam", "go right", "take foam", "go down",
+                    "use co2"])
+        self.assertTrue(self._save_file.Save())
+        # Only the changed rooms are written.
+        self.assertEqual(self._save_file.Capture(), None)
+        self._Play(["go left", "look"])
+        checkpoint = self._save_file.Capture()
+        self.assertEqual(checkpoint, (1, 4, self._player.inventory, []))
+        self._save_file.Write(checkpoint)
+        self.assertEqual(self._save_file.records, 2)
+
+        player, save_file = self._Load()
+        self.assertEqual((player.y_pos, player.x_pos), (1, 4))
+        self.assertEqual(player.inventory, self._player.inventory)
+        self.assertEqual(self._Rooms(player), self._Rooms(self._player))
+        self.assertTrue(player.curr_room is player.game_map.GetRoom(1, 4))
+        self.assertEqual(save_file.records, 1)
+
+    def test_save_command(self):
+        self.assertEqual(
+            self._game_interface.ExecuteCommand(self._player, "save"),
+            (True, "Nothing changed since the last save."))
+        self._Play(["take foam"])
+        self.assertEqual(
+            self._game_interface.ExecuteCommand(self._player, "Save!"),
+            (True, "Game saved."))
+        self.assertEqual(self._Load()[0].inventory, self._player.inventory)
+
+    def test_concurrent_saves_are_written_in_order(self):
+        save_file = self._save_file
+        capture = save_file.Capture
+        others = []
+
+        def CaptureThenSaveAgain():
+            checkpoint = capture()
+            if not others:
+                # Another save, e.g. by the autosaver, captures a newer
+                # checkpoint while this one is still to be written.
+                save_file.Capture = capture
+                self.assertTrue(self._player.MoveRight()[0])
+                others.append(threading.Thread(target=save_file.Save))
+                others[0].start()
+                time.sleep(0.05)
+            return checkpoint
+
+        save_file.Capture = CaptureThenSaveAgain
+        self._Play(["take foam"])
+        self.assertTrue(save_file.Save())
+        others[0].join()
+        player, _ = self._Load()
+        self.assertEqual((player.y_pos, player.x_pos), (0, 5))
+
+    def test_compaction(self):
+        self._save_file.COMPACT_RECORDS = 3
+        for command in ["take foam", "go right", "take foam", "go down"]:
+            self._Play([command])
+            self._save_file.Save()
+        self.assertEqual(self._save_file.records, 2)
+        player, _ = self._Load()
+        self.assertEqual(self._Rooms(player), self._Rooms(self._player))
+        self.assertEqual((player.y_pos, player.x_pos), (1, 5))
+
+    def test_torn_record_is_ignored(self):
+        self._Play(["take foam"])
+        self._save_file.Save()
+        inventory = self._player.inventory
+        self._Play(["take co2"])
+        self._save_file.Save()
+        with open(self._filename, "r+b") as f:
+            f.truncate(os.path.getsize(self._filename) - 3)
+        player, save_file = self._Load()
+        self.assertEqual(player.inventory, inventory)
+        # Saving after loading appends after the good records.
+        player.AddItem("co2")
+        save_file.Save()
+        self.assertEqual(self._Load()[0].inventory, self._player.inventory)
+
+    def test_other_world(self):
+        self._Play(["take foam"])
+        self._save_file.Save()
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/small_test.game", use_snapshot=False)
+        save_file = my_game_save.SaveFile(
+            self._filename, parser.player, parser.game_interface)
+        with self.assertRaises(my_game_save.SaveError):
+            save_file.Load()
+        with open(self._filename, "wb") as f:
+            f.write("garbage")
+        with self.assertRaises(my_game_save.SaveError):
+            self._save_file.Load()
+
+    def test_autosave(self):
+        autosaver = my_game_save.Autosaver(self._save_file, interval=0.01)
+        autosaver.Start()
+        self._Play(["take foam"])
+        deadline = time.time() + 5
+        while not autosaver.saves and time.time() < deadline:
+            time.sleep(0.01)
+        self._Play(["go right"])
+        autosaver.Stop()
+        self.assertTrue(autosaver.saves >= 1)
+        self.assertEqual(autosaver.error, None)
+        player, _ = self._Load()
+        self.assertEqual((player.y_pos, player.x_pos), (0, 5))
+        self.assertEqual(player.inventory, self._player.inventory)
+
+    def test_autosave_keeps_running_after_error(self):
+        class FailingSaveFile(object):
+            calls = 0
+
+            def Save(self):
+                self.calls += 1
+                if self.calls == 1:
+                    raise ValueError("bad record")
+                return True
+
+        autosaver = my_game_save.Autosaver(FailingSaveFile(), interval=0.01)
+        autosaver.Start()
+        deadline = time.time() + 5
+        while not autosaver.saves and time.time() < deadline:
+            time.sleep(0.01)
+        autosaver.Stop()
+        self.assertTrue(autosaver.saves >= 1)
+        self.assertTrue(isinstance(autosaver.error, ValueError))
+
+
+if __name__ == "__main__":
+    unittest.main()
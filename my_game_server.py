@@ -0,0 +1,156 @@
+"""Telnet-style game server hosting many sessions in one process.
+
+Every connection is a separate game session with its own Player, command
+history and copies of the rooms it visits.  The immutable parts of the world
+(alias tables, RoomStateMapper, ItemMapper and game text) are shared through a
+my_game_cache.WorldTemplate.
+
+The server is a single-threaded asyncore event loop polling the sockets, so an
+idle connection costs a socket, a few small objects and the copy of its
+current room.
+
+To run:
+  python game.py --serve [host:]port [optional config file]
+"""
+import asynchat
+import asyncore
+import socket
+
+import my_game_journal
+import my_game_output
+
+
+class GameSession(asynchat.async_chat):
+    """A connected player.  Commands are lines of text."""
+
+    # Longest command accepted before the connection is dropped.
+    MAX_COMMAND_BYTES = 1024
+    PROMPT = "> "
+
+    def __init__(self, server, sock, player, game_interface, sessions):
+        asynchat.async_chat.__init__(self, sock=sock, map=sessions)
+        self.set_terminator("\n")
+        self._server = server
+        self._player = player
+        self._game_interface = game_interface
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._closed = False
+        self._output = my_game_output.SocketOutput(self.push)
+        if not player.Start():
+            self._Send("This world can not be played.")
+            self.close_when_done()
+            return
+        self._Send(game_interface.exposition, prompt=True)
+
+    @property
+    def player(self):
+        return self._player
+
+    @property
+    def game_interface(self):
+        return self._game_interface
+
+    def _Send(self, text, prompt=False):
+        self._output.Write(text)
+        if prompt:
+            self._output.Write(self.PROMPT, end="")
+        self._output.Flush()
+
+    def collect_incoming_data(self, data):
+        self._buffered_bytes += len(data)
+        if self._buffered_bytes > self.MAX_COMMAND_BYTES:
+            self._buffer = []
+            self._Send("Command too long.")
+            self.close_when_done()
+            return
+        self._buffer.append(data)
+
+    def found_terminator(self):
+        command = "".join(self._buffer).strip(".,!? \r").lower()
+        self._buffer = []
+        self._buffered_bytes = 0
+        if command == self._game_interface.EXIT_CMD:
+            self._Send("Goodbye!")
+            self.close_when_done()
+            return
+        _, msg = self._game_interface.ExecuteCommand(self._player, command)
+        self._Send(msg, prompt=True)
+
+    def handle_close(self):
+        self.close()
+
+    def close(self):
+        asynchat.async_chat.close(self)
+        if not self._closed:
+            self._closed = True
+            self._server.RemoveSession(self)
+
+
+class GameServer(asyncore.dispatcher):
+    """Accepts connections and starts a GameSession for each one."""
+
+    def __init__(self, template, host="", port=0, sessions=None,
+                 max_sessions=None, undo_depth=None):
+        """Start listening.
+
+        Args:
+          template:  A my_game_cache.WorldTemplate shared by every session.
+          host:  Host to listen on.
+          port:  Port to listen on, 0 picks a free port.
+          sessions:  Optional socket map for asyncore.  Defaults to a new one
+            so several servers can run in one process.
+          max_sessions:  Optional limit on the number of concurrent sessions.
+          undo_depth:  Number of actions each session can undo.  Undo is
+            disabled if None.
+        """
+        if sessions is None:
+            sessions = {}
+        asyncore.dispatcher.__init__(self, map=sessions)
+        self._template = template
+        self._sessions = sessions
+        self._max_sessions = max_sessions
+        self._undo_depth = undo_depth
+        self._session_count = 0
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(socket.SOMAXCONN)
+
+    @property
+    def address(self):
+        return self.socket.getsockname()
+
+    @property
+    def session_count(self):
+        return self._session_count
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None:
+            return
+        sock, _ = pair
+        if (self._max_sessions is not None
+            and self._session_count >= self._max_sessions):
+            sock.sendall("The server is full.\r\n")
+            sock.close()
+            return
+        player, game_interface = self._template.NewSession()
+        if self._undo_depth is not None:
+            player.journal = my_game_journal.Journal(self._undo_depth)
+        self._session_count += 1
+        GameSession(self, sock, player, game_interface, self._sessions)
+
+    def RemoveSession(self, session):
+        self._session_count -= 1
+
+    def Serve(self, timeout=30.0, count=None):
+        """Run the event loop.
+
+        Args:
+          timeout:  Seconds to wait for socket activity per poll.
+          count:  Number of polls to run, forever if None.
+        """
+        # poll() does not have select()'s limit on the number of sockets.
+        asyncore.loop(timeout=timeout, use_poll=True, map=self._sessions,
+                      count=count)
@@ -0,0 +1,106 @@
+import socket
+import threading
+import unittest
+
+import my_game_cache
+import my_game_server
+
+
+class TestGameServer(unittest.TestCase):
+
+    def setUp(self):
+        cache = my_game_cache.ParseCache(1 << 30)
+        self._template = cache.Get("configs/iss_fire.game")
+        self._server = my_game_server.GameServer(
+            self._template, host="127.0.0.1", max_sessions=3)
+        self._stop = False
+        self._thread = threading.Thread(target=self._Loop)
+        self._thread.start()
+        self._clients = []
+
+    def tearDown(self):
+        for client in self._clients:
+            client.close()
+        self._stop = True
+        self._thread.join()
+        self._server.close()
+
+    def _Loop(self):
+        while not self._stop:
+            self._server.Serve(timeout=0.01, count=1)
+
+    def _Connect(self):
+        client = socket.create_connection(self._server.address, timeout=5)
+        self._clients.append(client)
+        return client, client.makefile("r")
+
+    def _ReadUntilPrompt(self, reader):
+        lines = []
+        while True:
+            char = reader.read(1)
+            if not char:
+                return "".join(lines)
+            lines.append(char)
+            if "".join(lines[-2:]) == "> ":
+                return "".join(lines[:-2]).strip()
+
+    def _Command(self, client, reader, command):
+        client.sendall(command + "\r\n")
+        return self._ReadUntilPrompt(reader)
+
+    def test_sessions_are_independent(self):
+        client_a, reader_a = self._Connect()
+        client_b, reader_b = self._Connect()
+        self.assertEqual(self._ReadUntilPrompt(reader_a),
+                         self._template.game_interface.exposition)
+        self._ReadUntilPrompt(reader_b)
+
+        self.assertEqual(
+            self._Command(client_a, reader_a, "take foam"),
+            "foam successfully added to inventory.")
+        self.assertEqual(
+            self._Command(client_a, reader_a, "go down"),
+            "Moved to a new room.  It is [electrical fire, fabric fire].")
+        self.assertEqual(
+            self._Command(client_a, reader_a, "use co2"),
+            "Used co2 and now the room is [electrical fire]")
+        self.assertEqual(self._Command(client_a, reader_a, "fly"),
+                         "I don't understand that.  Try 'help'.")
+
+        self.assertEqual(
+            self._Command(client_b, reader_b, "look"),
+            "The room is [fine].  There are [3xco2, 1xfoam]."
+            "  You currently have [2xco2, 3xfoam].")
+        self.assertEqual(self._Command(client_b, reader_b, "go down"),
+                         "Moved to a new room.  It is "
+                         "[electrical fire, fabric fire].")
+        self.assertEqual(self._template.game_map.GetRoom(1, 4).state, 3)
+
+        client_a.sendall("exit\r\n")
+        self.assertEqual(reader_a.read().strip(), "Goodbye!")
+
+    def test_bare_verb(self):
+        client, reader = self._Connect()
+        self._ReadUntilPrompt(reader)
+        self.assertEqual(self._Command(client, reader, "take"), "Take what?")
+        # The session is still open.
+        self.assertEqual(self._Command(client, reader, "take foam"),
+                         "foam successfully added to inventory.")
+
+    def test_max_sessions(self):
+        for _ in range(3):
+            client, reader = self._Connect()
+            self._ReadUntilPrompt(reader)
+        self.assertEqual(self._server.session_count, 3)
+        client, reader = self._Connect()
+        self.assertEqual(reader.read().strip(), "The server is full.")
+
+    def test_long_command(self):
+        client, reader = self._Connect()
+        self._ReadUntilPrompt(reader)
+        client.sendall("x" * 5000)
+        self.assertEqual(reader.read().strip(), "Command too long.")
+
+
+if __name__ == "__main__":
+    unittest.main()
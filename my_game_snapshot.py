@@ -0,0 +1,198 @@
+"""Precompiled binary snapshots of a parsed game world.
+
+Parsing a large .game file line by line dominates start up time.  A snapshot
+stores the fully parsed world (game text, aliases, room states, items, map and
+player start) so that it can be loaded back without running the text parser.
+
+A snapshot file is laid out as:
+  <4 byte magic><2 byte little-endian version><marshal payload>
+
+The payload only contains plain Python types (tuples, lists, dicts, strings and
+ints) so it can be written and read with marshal, which is much faster than
+re-parsing the config.
+"""
+import marshal
+import os
+import struct
+
+import my_game_item
+import my_game_map
+import my_game_player
+import my_game_room
+import my_game_utils
+
+
+SNAPSHOT_MAGIC = "TGES"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_SUFFIX = "c"
+
+_HEADER = struct.Struct("<4sH")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def SnapshotPath(filename):
+    """Returns the path of the snapshot for the given config, e.g. x.gamec."""
+    return filename + SNAPSHOT_SUFFIX
+
+
+def IsFresh(filename, snapshot_filename=None):
+    """Check if there is a snapshot newer than the given config file.
+
+    Args:
+      filename:  Path to the .game config file.
+      snapshot_filename:  Optional path of the snapshot.  Defaults to
+        SnapshotPath(filename).
+
+    Returns:
+      True iff the snapshot exists and is at least as new as the config.
+    """
+    if snapshot_filename is None:
+        snapshot_filename = SnapshotPath(filename)
+    try:
+        return (os.path.getmtime(snapshot_filename)
+                >= os.path.getmtime(filename))
+    except OSError:
+        return False
+
+
+def _Dump(player, game_interface):
+    """Flatten a parsed world into a tuple of plain Python types."""
+    game_map = player.game_map
+    rooms = [(y, x, room.state, list(room.contents))
+             for y, x, room in game_map.IterRooms()]
+    items = [(name, item.name, item.state_changes, item.reusable,
+              item.radius)
+             for name, item in player.item_mapper.all_items.iteritems()]
+    return (
+        {"name": game_interface.name,
+         "exposition": game_interface.exposition,
+         "help": game_interface.help},
+        list(game_interface.move_aliases),
+        dict((verb, action.__name__)
+             for verb, action in game_interface.action_aliases.iteritems()),
+        dict((direction, action.__name__)
+             for direction, action
+             in game_interface.direction_aliases.iteritems()),
+        dict(player.room_state_mapper.all_states),
+        items,
+        (game_map.storage, game_map.height, game_map.width, rooms),
+        (player.y_pos, player.x_pos, list(player.inventory),
+         player.max_inventory_size),
+        )
+
+
+def _Restore(payload, player, game_interface):
+    """Inverse of _Dump.  Populates the given player and game interface."""
+    try:
+        (game_text, move_aliases, action_aliases, direction_aliases, states,
+         items, game_map, player_info) = payload
+    except (TypeError, ValueError):
+        raise SnapshotError("Malformed snapshot payload")
+    game_interface.name = game_text["name"]
+    game_interface.exposition = game_text["exposition"]
+    game_interface.help = game_text["help"]
+    for verb in move_aliases:
+        game_interface.AddMoveAlias(verb)
+    try:
+        for verb, action in action_aliases.iteritems():
+            game_interface.AddActionAlias(
+                verb, getattr(my_game_player.Player, action))
+        for direction, action in direction_aliases.iteritems():
+            game_interface.AddDirectionAlias(
+                direction, getattr(my_game_player.Player, action))
+    except AttributeError, e:
+        raise SnapshotError("Unknown player action in snapshot: %s" % e)
+
+    for sid, desc in states.iteritems():
+        player.room_state_mapper.AddState(sid, desc)
+    for key, name, state_changes, reusable, radius in items:
+        item = my_game_item.GameItem()
+        item.name = name
+        item.reusable = reusable
+        item.radius = radius
+        for old_state, new_state in state_changes.iteritems():
+            item.AddStateChange(old_state, new_state)
+        player.item_mapper.AddItem(key, item)
+
+    storage, height, width, rooms = game_map
+    player.game_map.storage = storage
+    if height is not None and width is not None:
+        player.game_map.height = height
+        player.game_map.width = width
+        player.game_map.Initialize()
+    names = player.item_mapper.names
+    from_contents = my_game_room.Room.FromContents
+    multiset = my_game_utils.Multiset
+    player.game_map.SetRooms(
+        (y, x, from_contents(state, multiset(contents, names)))
+        for y, x, state, contents in rooms)
+
+    (player.y_pos, player.x_pos, player.inventory,
+     player.max_inventory_size) = player_info
+
+
+def Compile(player, game_interface, snapshot_filename):
+    """Write a snapshot of a freshly parsed world.
+
+    The snapshot is written to a temporary file and renamed into place so a
+    concurrent reader never sees a partially written snapshot.
+
+    Args:
+      player:  A my_game_player.Player as returned by the parser.
+      game_interface:  A my_game_interface.GameInterface as returned by the
+        parser.
+      snapshot_filename:  Path to write the snapshot to.
+
+    Raises:
+      SnapshotError if the map is paged from region files.
+    """
+    if player.game_map.storage not in my_game_map.GameMap.STORAGE_TYPES:
+        # The map is paged from files, which are already a compiled form.
+        raise SnapshotError("Can not snapshot a map with %s storage"
+                            % player.game_map.storage)
+    data = marshal.dumps(_Dump(player, game_interface))
+    tmp_filename = snapshot_filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+        f.write(data)
+    os.rename(tmp_filename, snapshot_filename)
+
+
+def Load(player, game_interface, snapshot_filename):
+    """Load a snapshot into a fresh player and game interface.
+
+    Args:
+      player:  A new my_game_player.Player.
+      game_interface:  A new my_game_interface.GameInterface.
+      snapshot_filename:  Path of the snapshot to load.
+
+    Raises:
+      SnapshotError if the snapshot is truncated, corrupt, holds data which
+      does not make a world, or was written by an incompatible version.
+    """
+    with open(snapshot_filename, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise SnapshotError("Truncated snapshot: %s" % snapshot_filename)
+        magic, version = _HEADER.unpack(header)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError("Not a snapshot: %s" % snapshot_filename)
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError("Unsupported snapshot version %d in %s"
+                                % (version, snapshot_filename))
+        try:
+            # marshal reads the payload straight from the file, so mapping
+            # it first would only add a copy.
+            payload = marshal.load(f)
+        except (EOFError, ValueError, TypeError):
+            raise SnapshotError("Corrupt snapshot: %s" % snapshot_filename)
+    try:
+        _Restore(payload, player, game_interface)
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError,
+            AssertionError, my_game_map.GameMapError), e:
+        # A payload which unmarshals can still be wrong, e.g. cut short.
+        raise SnapshotError("Invalid snapshot %s: %s"
+                            % (snapshot_filename, e))
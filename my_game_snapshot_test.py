@@ -0,0 +1,131 @@
+import marshal
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import my_game_parser
+import my_game_snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._config = os.path.join(self._tmp_dir, "iss_fire.game")
+        shutil.copy("configs/iss_fire.game", self._config)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _AssertSameWorld(self, a, b):
+        self.assertEqual(a.game_interface.DebugInfo(),
+                         b.game_interface.DebugInfo())
+        self.assertEqual(a.game_interface.move_aliases,
+                         b.game_interface.move_aliases)
+        self.assertEqual(a.game_interface.action_aliases,
+                         b.game_interface.action_aliases)
+        self.assertEqual(a.game_interface.direction_aliases,
+                         b.game_interface.direction_aliases)
+        self.assertEqual(a.player.room_state_mapper.all_states,
+                         b.player.room_state_mapper.all_states)
+        self.assertEqual(
+            sorted(a.player.item_mapper.all_items.keys()),
+            sorted(b.player.item_mapper.all_items.keys()))
+        for name, item in a.player.item_mapper.all_items.iteritems():
+            self.assertEqual(item.DebugInfo(),
+                             b.player.item_mapper.GetItem(name).DebugInfo())
+        self.assertEqual(a.player.game_map.DebugInfo(),
+                         b.player.game_map.DebugInfo())
+        self.assertEqual(
+            [(y, x, r.state, r.contents)
+             for y, x, r in a.player.game_map.IterRooms()],
+            [(y, x, r.state, r.contents)
+             for y, x, r in b.player.game_map.IterRooms()])
+        self.assertEqual((a.player.y_pos, a.player.x_pos),
+                         (b.player.y_pos, b.player.x_pos))
+        self.assertEqual(a.player.inventory, b.player.inventory)
+        self.assertEqual(a.player.max_inventory_size,
+                         b.player.max_inventory_size)
+
+    def test_round_trip(self):
+        compiler = my_game_parser.GameParser()
+        snapshot = compiler.Compile(self._config)
+        self.assertEqual(snapshot, self._config + "c")
+        self.assertTrue(my_game_snapshot.IsFresh(self._config))
+
+        loaded = my_game_parser.GameParser()
+        my_game_snapshot.Load(
+            loaded.player, loaded.game_interface, snapshot)
+        self._AssertSameWorld(compiler, loaded)
+        # The loaded world is playable.
+        self.assertTrue(loaded.player.Start())
+        action, _ = loaded.game_interface.LookupAction("go down")
+        self.assertTrue(action(loaded.player)[0])
+
+    def test_parse_prefers_fresh_snapshot(self):
+        my_game_parser.GameParser().Compile(self._config)
+        # Mark the snapshot so we can tell it was used.
+        parser = my_game_parser.GameParser()
+        my_game_snapshot.Load(parser.player, parser.game_interface,
+                              self._config + "c")
+        parser.game_interface.name = "From snapshot"
+        my_game_snapshot.Compile(parser.player, parser.game_interface,
+                                 self._config + "c")
+
+        parser = my_game_parser.GameParser()
+        parser.Parse(self._config)
+        self.assertEqual(parser.game_interface.name, "From snapshot")
+
+        # Once the source is newer, the snapshot is ignored.
+        future = time.time() + 10
+        os.utime(self._config, (future, future))
+        self.assertFalse(my_game_snapshot.IsFresh(self._config))
+        parser = my_game_parser.GameParser()
+        parser.Parse(self._config)
+        self.assertEqual(parser.game_interface.name, "ISS Fire")
+
+    def test_bad_snapshots(self):
+        snapshot = self._config + "c"
+        reference = my_game_parser.GameParser()
+        reference.Parse(self._config, use_snapshot=False)
+        for data in ["", "TG", "XXXX\x01\x00", "TGES\x63\x00",
+                     "TGES\x01\x00garbage"]:
+            with open(snapshot, "wb") as f:
+                f.write(data)
+            parser = my_game_parser.GameParser()
+            with self.assertRaises(my_game_snapshot.SnapshotError):
+                my_game_snapshot.Load(
+                    parser.player, parser.game_interface, snapshot)
+            # The parser falls back to the config file.
+            parser = my_game_parser.GameParser()
+            parser.Parse(self._config)
+            self._AssertSameWorld(reference, parser)
+
+    def test_invalid_payloads(self):
+        snapshot = my_game_parser.GameParser().Compile(self._config)
+        with open(snapshot, "rb") as f:
+            data = f.read()
+        header = data[:my_game_snapshot._HEADER.size]
+        payload = list(marshal.loads(data[len(header):]))
+        storage, height, width, rooms = payload[6]
+        reference = my_game_parser.GameParser()
+        reference.Parse(self._config, use_snapshot=False)
+        for bad_rooms in [[room[:2] for room in rooms],
+                          [(height, width, 0, [])]]:
+            payload[6] = (storage, height, width, bad_rooms)
+            with open(snapshot, "wb") as f:
+                f.write(header + marshal.dumps(tuple(payload)))
+            parser = my_game_parser.GameParser()
+            with self.assertRaises(my_game_snapshot.SnapshotError):
+                my_game_snapshot.Load(
+                    parser.player, parser.game_interface, snapshot)
+            # The parser falls back to the config file.
+            parser = my_game_parser.GameParser()
+            parser.Parse(self._config)
+            self._AssertSameWorld(reference, parser)
+
+
+if __name__ == "__main__":
+    unittest.main()
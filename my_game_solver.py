@@ -0,0 +1,548 @@
+"""Solver which checks whether a .game world can be won.
+
+A world is won once every room is in a goal state, by default state 0.  The
+solver searches the states of the world: the player's position, the counts of
+each item in the inventory, the state of every room and the counts of each item
+in every room.  Moves, taking, dropping and using items follow the rules of
+my_game_player.Player, including that using a reusable item puts it back in the
+inventory only by taking another one from the room.
+
+The search is A* over batches: every state with the lowest estimate of the
+total number of commands is expanded at once, split across a process pool.
+The estimate never overestimates, so the first winning state found gives the
+shortest winning command sequence, and running out of states proves the world
+can not be won.  States which do not have enough items left to reach the goal
+are pruned.
+
+To run:
+  python my_game_solver.py [--processes N] [--goal-states 0]
+      [--max-states N] <config>
+"""
+import argparse
+import collections
+import multiprocessing
+import resource
+import struct
+import sys
+import time
+
+import my_game_path
+import my_game_player
+import my_game_replay
+
+
+class SolverError(Exception):
+    pass
+
+
+# Largest count of an item in a room or the inventory, and largest room state,
+# which fit in a state key.
+MAX_COUNT = 255
+# Uses needed by a room state which can never reach a goal state.
+UNREACHABLE = 255
+
+_POSITION = struct.Struct(">H")
+
+
+class World(object):
+    """The parts of a parsed world which the search needs, in compact form.
+
+    Rooms and items are numbered.  A state key is a string of the position (two
+    bytes), then one byte for the count of each item in the inventory, one for
+    the state of each room, and one for the count of each item in each room.
+    """
+
+    # Largest map to keep a table of the distances between all rooms for.
+    MAX_DISTANCE_ROOMS = 2000
+    # Number of spanning tree weights to cache.
+    MAX_TREE_WEIGHTS = 100000
+
+    def __init__(self, player, game_interface, goal_states=(0,)):
+        """Compile a world.
+
+        Args:
+          player:  A my_game_player.Player which has not started playing.
+          game_interface:  The my_game_interface.GameInterface of the world.
+          goal_states:  Room states which count as won.
+
+        Raises:
+          SolverError if the world does not fit in state keys, or has no
+          aliases for the commands the solver needs.
+        """
+        game_map = player.game_map
+        rooms = [(y, x, room) for y, x, room in game_map.IterRooms()]
+        self.rooms = [(y, x) for y, x, _ in rooms]
+        index = dict((room, i) for i, room in enumerate(self.rooms))
+        item_mapper = player.item_mapper
+        names = set(item_mapper.all_items) | set(player.inventory)
+        for _, _, room in rooms:
+            names.update(room.contents)
+        self.items = sorted(names)
+        definitions = [item_mapper.GetItem(name) for name in self.items]
+        self.reusable = [d.reusable for d in definitions]
+        self.goal_states = frozenset(goal_states)
+        self._goal_chars = "".join(chr(s) for s in self.goal_states
+                                   if 0 <= s <= MAX_COUNT)
+
+        for _, _, room in rooms:
+            if not (isinstance(room.state, (int, long))
+                    and 0 <= room.state <= MAX_COUNT):
+                raise SolverError("Room state does not fit: %r" % room.state)
+        # Per item, a table of room state to new room state.
+        self.tables = []
+        for d in definitions:
+            table = bytearray(range(256))
+            for old_state, new_state in d.state_changes.iteritems():
+                if 0 <= old_state <= MAX_COUNT and 0 <= new_state <= MAX_COUNT:
+                    table[old_state] = new_state
+            self.tables.append(str(table))
+        # Per item, per room, the rooms a use changes.
+        self.areas = []
+        for d in definitions:
+            radius = d.radius
+            self.areas.append([
+                [index[(ny, nx)]
+                 for ny in xrange(y - radius, y + radius + 1)
+                 for nx in xrange(x - radius, x + radius + 1)
+                 if (ny, nx) in index]
+                for y, x in self.rooms])
+        self.max_area = max([(2 * d.radius + 1) ** 2 for d in definitions]
+                            or [1])
+        self.min_uses = self._MinUses()
+
+        self._CompileCommands(game_interface)
+        # Per room, the (command number, room) of each room next to it.
+        self.neighbors = []
+        for y, x in self.rooms:
+            moves = []
+            for direction, (dy, dx) in enumerate(my_game_path.NEIGHBORS):
+                neighbor = index.get((y + dy, x + dx))
+                if neighbor is not None:
+                    moves.append((direction, neighbor))
+            self.neighbors.append(moves)
+        self.distances = None
+        if len(self.rooms) <= self.MAX_DISTANCE_ROOMS:
+            self.distances = self._Distances()
+        # Dict of position and rooms not won yet to _SpanningTreeWeight.
+        self._tree_weights = {}
+        self._nonzero = "\0" + "\1" * 255
+
+        inventory = [0] * len(self.items)
+        item_index = dict((name, i) for i, name in enumerate(self.items))
+        for name in player.inventory:
+            inventory[item_index[name]] += 1
+        contents = []
+        for _, _, room in rooms:
+            counts = [0] * len(self.items)
+            for name in room.contents:
+                counts[item_index[name]] += 1
+            contents.extend(counts)
+        if max(inventory + contents + [0]) > MAX_COUNT:
+            raise SolverError("Too many of one item in one place")
+        start = index.get((player.y_pos, player.x_pos))
+        if start is None:
+            raise SolverError("The player does not start in a room")
+        self.capacity = player.max_inventory_size
+        self.start = (_POSITION.pack(start) + str(bytearray(inventory))
+                      + str(bytearray(room.state for _, _, room in rooms))
+                      + str(bytearray(contents)))
+
+    def _Distances(self):
+        """Table of the number of moves between every pair of rooms.
+
+        Returns:
+          A list for each room of the distance to each room, None if there is
+          no path.
+        """
+        distances = []
+        for room in xrange(len(self.rooms)):
+            row = [None] * len(self.rooms)
+            row[room] = 0
+            queue = collections.deque([room])
+            while queue:
+                current = queue.popleft()
+                for _, neighbor in self.neighbors[current]:
+                    if row[neighbor] is None:
+                        row[neighbor] = row[current] + 1
+                        queue.append(neighbor)
+            distances.append(row)
+        return distances
+
+    def _MinUses(self):
+        """Table of room state to the fewest uses to reach a goal state."""
+        min_uses = bytearray([UNREACHABLE] * 256)
+        queue = collections.deque()
+        for state in self.goal_states:
+            if 0 <= state <= MAX_COUNT:
+                min_uses[state] = 0
+                queue.append(state)
+        # Search backwards from the goal states over the item tables.
+        while queue:
+            state = queue.popleft()
+            for table in self.tables:
+                for old_state in xrange(256):
+                    if (ord(table[old_state]) == state
+                            and min_uses[old_state] == UNREACHABLE):
+                        min_uses[old_state] = min(min_uses[state] + 1,
+                                                  UNREACHABLE - 1)
+                        queue.append(old_state)
+        return str(min_uses)
+
+    def _CompileCommands(self, game_interface):
+        """Find a command for each move and for each item action."""
+        Player = my_game_player.Player
+
+        def Shortest(aliases):
+            if not aliases:
+                return None
+            return min(aliases, key=lambda a: (len(a.split()), len(a), a))
+
+        move_verb = Shortest(game_interface.move_aliases)
+        self.commands = []
+        for action in [Player.MoveUp, Player.MoveDown, Player.MoveLeft,
+                       Player.MoveRight]:
+            direction = Shortest([d for d, a in
+                                  game_interface.direction_aliases.iteritems()
+                                  if a == action])
+            if move_verb is None or direction is None:
+                raise SolverError("No alias for %s" % action.__name__)
+            self.commands.append("%s %s" % (move_verb, direction))
+        # Command numbers of take, drop and use for each item.
+        self.take, self.drop, self.use = [], [], []
+        for action, numbers in [(Player.AddItem, self.take),
+                                (Player.DropItem, self.drop),
+                                (Player.UseItem, self.use)]:
+            verb = Shortest([v for v, a in
+                             game_interface.action_aliases.iteritems()
+                             if a == action])
+            if verb is None:
+                raise SolverError("No alias for %s" % action.__name__)
+            for name in self.items:
+                numbers.append(len(self.commands))
+                self.commands.append("%s %s" % (verb, name))
+        for command in self.commands:
+            action, arguments = game_interface.LookupAction(command)
+            if action is None:
+                raise SolverError("Command is not understood: %s" % command)
+
+    def Decode(self, key):
+        """Split a state key into (position, inventory, states, contents)."""
+        items = len(self.items)
+        rooms = len(self.rooms)
+        position = _POSITION.unpack_from(key)[0]
+        inventory_end = 2 + items
+        states_end = inventory_end + rooms
+        return (position, bytearray(key[2:inventory_end]),
+                bytearray(key[inventory_end:states_end]),
+                bytearray(key[states_end:]))
+
+    def IsGoal(self, key):
+        states = key[2 + len(self.items):2 + len(self.items) + len(self.rooms)]
+        return not states.translate(None, self._goal_chars)
+
+    def Estimate(self, key):
+        """Lower bound on the number of commands left to win from key.
+
+        The bound adds up:
+          uses:  The fewest uses of items to bring every room to a goal state.
+          moves:  With only single room items, the weight of a minimum
+            spanning tree over the player and the rooms not won yet, as every
+            one of them must be visited.
+          takes:  With only single room items, the items which must be taken
+            from won rooms because the inventory and the rooms not won yet
+            (where a reusable item is put back from) hold too few.
+
+        Returns:
+          The bound, or None if the game can not be won from key.
+        """
+        position, inventory, states, contents = self.Decode(key)
+        uses_per_room = bytearray(str(states).translate(self.min_uses))
+        if UNREACHABLE in uses_per_room:
+            return None
+        uses = sum(uses_per_room)
+        # Every use which changes a room uses up one item.
+        if uses > self.max_area * (sum(inventory) + sum(contents)):
+            return None
+        if self.max_area > 1:
+            return -(-uses // self.max_area)
+        rooms = [i for i, n in enumerate(uses_per_room) if n]
+        # Many states share the player's position and the rooms not won yet.
+        tree_key = key[:2] + str(uses_per_room.translate(self._nonzero))
+        moves = self._tree_weights.get(tree_key, -1)
+        if moves == -1:
+            if len(self._tree_weights) >= self.MAX_TREE_WEIGHTS:
+                self._tree_weights.clear()
+            moves = self._tree_weights[tree_key] = self._SpanningTreeWeight(
+                [position] + rooms)
+        if moves is None:
+            return None
+        items = len(self.items)
+        unwon_items = sum(sum(contents[i * items:(i + 1) * items])
+                          for i in rooms)
+        takes = max(0, uses - sum(inventory) - unwon_items)
+        return uses + moves + takes
+
+    def _SpanningTreeWeight(self, rooms):
+        """Weight of a minimum spanning tree of rooms, or None if unconnected.
+
+        Uses the table of distances between every pair of rooms when the map
+        is small enough to have one, and otherwise counts one move to each
+        room which is not the first.
+        """
+        if self.distances is None:
+            return len(set(rooms[1:]) - set(rooms[:1]))
+        # Prim's algorithm.
+        first = self.distances[rooms[0]]
+        best = dict((room, first[room]) for room in rooms[1:])
+        weight = 0
+        while best:
+            room = min(best, key=best.get)
+            distance = best.pop(room)
+            if distance is None:
+                return None
+            weight += distance
+            row = self.distances[room]
+            for other in best:
+                d = row[other]
+                if d is not None and (best[other] is None or d < best[other]):
+                    best[other] = d
+        return weight
+
+    def Expand(self, key):
+        """Returns a list of (command number, key) of the states after key."""
+        position, inventory, states, contents = self.Decode(key)
+        items = len(self.items)
+        inventory_size = sum(inventory)
+        children = []
+
+        def Key(position, inventory, states, contents):
+            return (_POSITION.pack(position) + str(inventory) + str(states)
+                    + str(contents))
+
+        for command, neighbor in self.neighbors[position]:
+            children.append(
+                (command, Key(neighbor, inventory, states, contents)))
+        base = position * items
+        for item in xrange(items):
+            in_room = contents[base + item]
+            held = inventory[item]
+            if in_room and inventory_size < self.capacity and held < MAX_COUNT:
+                new_inventory = bytearray(inventory)
+                new_inventory[item] += 1
+                new_contents = bytearray(contents)
+                new_contents[base + item] -= 1
+                children.append((self.take[item], Key(
+                    position, new_inventory, states, new_contents)))
+            if not held:
+                continue
+            if in_room < MAX_COUNT:
+                new_inventory = bytearray(inventory)
+                new_inventory[item] -= 1
+                new_contents = bytearray(contents)
+                new_contents[base + item] += 1
+                children.append((self.drop[item], Key(
+                    position, new_inventory, states, new_contents)))
+            # Using an item which changes nothing only loses the item, so it
+            # is never part of a shortest win.
+            table = self.tables[item]
+            new_states = bytearray(states)
+            changed = False
+            for room in self.areas[item][position]:
+                new_state = ord(table[states[room]])
+                if new_state != states[room]:
+                    new_states[room] = new_state
+                    changed = True
+            if not changed:
+                continue
+            new_inventory = bytearray(inventory)
+            new_inventory[item] -= 1
+            new_contents = contents
+            if self.reusable[item] and in_room:
+                # Player.UseItem puts a reusable item back by taking one from
+                # the room.
+                new_inventory[item] += 1
+                new_contents = bytearray(contents)
+                new_contents[base + item] -= 1
+            children.append((self.use[item], Key(
+                position, new_inventory, new_states, new_contents)))
+        return children
+
+
+# The World a worker process expands states of.
+_worker_world = None
+
+
+def _InitWorker(world):
+    global _worker_world
+    _worker_world = world
+
+
+def _ExpandBatch(keys):
+    """Returns a list of (parent key, command number, child key, estimate)."""
+    world = _worker_world
+    expanded = []
+    for key in keys:
+        for command, child in world.Expand(key):
+            estimate = world.Estimate(child)
+            if estimate is not None:
+                expanded.append((key, command, child, estimate))
+    return expanded
+
+
+def Solve(world, processes=1, max_states=None, batch_size=1000):
+    """Search for the shortest winning command sequence.
+
+    Args:
+      world:  A World.
+      processes:  Number of worker processes to expand states in.  With 1,
+        everything runs in this process.
+      max_states:  Optional limit on the number of distinct states to store.
+      batch_size:  Number of states to send to a worker at once.
+
+    Returns:
+      A dict with:
+        solution:  List of commands, or None if no win was found.
+        exhausted:  True iff every reachable state was searched, so a solution
+          of None proves the world can not be won.
+        expanded, states:  Number of states expanded and stored.
+        seconds, states_per_sec:  Time taken and states expanded per second.
+        key_bytes:  Size of one state key.
+        peak_memory_kb:  Peak resident memory of this process.
+    """
+    start_time = time.time()
+    estimate = world.Estimate(world.start)
+    # Dict of key to (commands from the start, parent key, command number).
+    seen = {world.start: (0, None, None)}
+    # Dict of estimated total commands to a list of (commands from the
+    # start, key).
+    open_keys = collections.defaultdict(list)
+    if estimate is not None:
+        open_keys[estimate].append((0, world.start))
+    goal = None
+    exhausted = True
+    expanded = 0
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, initializer=_InitWorker,
+                                    initargs=(world,))
+    else:
+        _InitWorker(world)
+    try:
+        while open_keys and goal is None:
+            bound = min(open_keys)
+            while open_keys.get(bound) and goal is None:
+                # Skip keys which were reached by a shorter path since.
+                batch = [key for length, key in open_keys.pop(bound)
+                         if seen[key][0] == length]
+                for key in batch:
+                    if world.IsGoal(key):
+                        goal = key
+                        break
+                if goal is not None:
+                    break
+                expanded += len(batch)
+                batches = [batch[i:i + batch_size]
+                           for i in xrange(0, len(batch), batch_size)]
+                if pool is None:
+                    results = map(_ExpandBatch, batches)
+                else:
+                    results = pool.map(_ExpandBatch, batches)
+                for result in results:
+                    for parent, command, child, child_estimate in result:
+                        length = seen[parent][0] + 1
+                        old = seen.get(child)
+                        if old is not None and old[0] <= length:
+                            continue
+                        seen[child] = (length, parent, command)
+                        open_keys[length + child_estimate].append(
+                            (length, child))
+                if max_states is not None and len(seen) > max_states:
+                    exhausted = False
+                    break
+            open_keys.pop(bound, None)
+            if not exhausted:
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    solution = None
+    if goal is not None:
+        solution = []
+        key = goal
+        while seen[key][1] is not None:
+            _, key, command = seen[key]
+            solution.append(world.commands[command])
+        solution.reverse()
+        exhausted = False
+    seconds = time.time() - start_time
+    return {
+        "solution": solution,
+        "exhausted": exhausted,
+        "expanded": expanded,
+        "states": len(seen),
+        "seconds": seconds,
+        "states_per_sec": expanded / seconds if seconds else 0.0,
+        "key_bytes": len(world.start),
+        "peak_memory_kb": resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+
+def Verify(template, commands, goal_states=(0,)):
+    """Replay commands and check that they win.
+
+    Args:
+      template:  A my_game_cache.WorldTemplate.
+      commands:  List of commands.
+      goal_states:  Room states which count as won.
+
+    Returns:
+      True iff every command succeeds and every room ends in a goal state.
+    """
+    player, game_interface = template.NewSession()
+    if not player.Start():
+        return False
+    for command in commands:
+        if not game_interface.ExecuteCommand(player, command)[0]:
+            return False
+    return all(room.state in goal_states
+               for _, _, room in player.game_map.IterRooms())
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    arg_parser.add_argument("config")
+    arg_parser.add_argument("--processes", type=int, default=1)
+    arg_parser.add_argument("--goal-states", default="0",
+                            help="Comma-separated room states which win.")
+    arg_parser.add_argument("--max-states", type=int, default=None,
+                            help="Give up after storing this many states.")
+    args = arg_parser.parse_args(argv[1:])
+
+    goal_states = [int(s) for s in args.goal_states.split(",")]
+    template = my_game_replay.LoadTemplate(args.config)
+    player, game_interface = template.NewSession()
+    world = World(player, game_interface, goal_states)
+    result = Solve(world, processes=args.processes,
+                   max_states=args.max_states)
+    if result["solution"] is not None:
+        print "Winnable in %d commands:" % len(result["solution"])
+        print "\n".join(result["solution"])
+        if not Verify(template, result["solution"], goal_states):
+            print "ERROR: the solution does not win when replayed"
+            return 1
+    elif result["exhausted"]:
+        print "Not winnable: every reachable state was searched."
+    else:
+        print "Gave up after %d states." % result["states"]
+    print ("# %(expanded)d states expanded, %(states)d stored, "
+           "%(seconds).2fs, %(states_per_sec).0f states/s, "
+           "%(key_bytes)d bytes per state, peak memory %(peak_memory_kb)d KB"
+           % result)
+    return 0 if result["solution"] is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
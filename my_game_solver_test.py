@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import my_game_replay
+import my_game_solver
+
+
+CONFIG = """[GAME]
+name:Solver Test
+player_inventory_capacity:%(capacity)d
+player_inventory:%(inventory)s
+[ROOM_STATES]
+0:fine
+1:smoky
+2:burning
+[ITEMS]
+foam:2>1:1>0
+co2:2>0
+[MAP]
+dimensions:2:3
+player_start:0:0
+0:0:0:
+0:1:0:%(shelf)s
+0:2:2:
+1:2:1:
+[ALIASES_MOVE]
+go
+[ALIASES_UP]
+up
+[ALIASES_DOWN]
+down
+[ALIASES_LEFT]
+left
+[ALIASES_RIGHT]
+right
+[ALIASES_USE]
+use
+[ALIASES_ADD]
+take
+[ALIASES_DROP]
+drop
+"""
+
+
+class TestSolver(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _World(self, capacity=3, inventory="foam", shelf="co2"):
+        filename = os.path.join(self._tmp_dir, "solver.game")
+        with open(filename, "w") as f:
+            f.write(CONFIG % {"capacity": capacity, "inventory": inventory,
+                              "shelf": shelf})
+        template = my_game_replay.LoadTemplate(filename)
+        player, game_interface = template.NewSession()
+        return template, my_game_solver.World(player, game_interface)
+
+    def test_shortest_solution(self):
+        template, world = self._World()
+        result = my_game_solver.Solve(world)
+        # Take the co2 on the way to put out the fire at (0, 2), then foam
+        # the smoke below it.
+        self.assertEqual(result["solution"],
+                         ["go right", "take co2", "go right", "use co2",
+                          "go down", "use foam"])
+        self.assertFalse(result["exhausted"])
+        self.assertTrue(my_game_solver.Verify(template, result["solution"]))
+        self.assertFalse(my_game_solver.Verify(template,
+                                               result["solution"][:-1]))
+        self.assertEqual(result["key_bytes"], 2 + 2 + 4 + 8)
+
+    def test_not_winnable(self):
+        # Two foams are needed for the fire and one for the smoke.
+        template, world = self._World(inventory="foam:foam", shelf="")
+        result = my_game_solver.Solve(world)
+        self.assertEqual(result["solution"], None)
+        self.assertTrue(result["exhausted"])
+
+    def test_capacity(self):
+        # With room for only one item, the foam has to be used on the smoke
+        # before going back for the co2.
+        template, world = self._World(capacity=1, inventory="foam")
+        result = my_game_solver.Solve(world)
+        self.assertEqual(result["solution"],
+                         ["go right", "go right", "go down", "use foam",
+                          "go up", "go left", "take co2", "go right",
+                          "use co2"])
+        self.assertTrue(my_game_solver.Verify(template, result["solution"]))
+
+    def test_max_states(self):
+        template, world = self._World(inventory="foam:foam", shelf="")
+        result = my_game_solver.Solve(world, max_states=2)
+        self.assertEqual(result["solution"], None)
+        self.assertFalse(result["exhausted"])
+
+    def test_processes(self):
+        template, world = self._World()
+        self.assertEqual(
+            my_game_solver.Solve(world, processes=2, batch_size=1)["solution"],
+            my_game_solver.Solve(world)["solution"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,291 @@
+"""Counters and latency histograms of a running game.
+
+When a GameInterface has a Stats, it times every command lookup, every player
+action and every whole turn, and counts the successes and failures of each
+action.  Without one, the only cost is a check for None per command.
+
+Latencies are kept in Histograms of microseconds with log-linear buckets, as
+in HdrHistogram: values below 2 ** SUB_BUCKET_BITS have their own bucket, and
+above that each power of two is split into 2 ** (SUB_BUCKET_BITS - 1) buckets.
+A histogram takes a few KB however many values it records, and reports
+percentiles within 1/64 of the true value.
+
+The numbers are shown by the "debug stats" command, and a StatsDumper writes
+them as JSON every few seconds.
+
+A Profiler runs cProfile over the commands played between "debug profile
+start" and "debug profile stop", without restarting the game.
+"""
+import cProfile
+import json
+import os
+import pstats
+import StringIO
+import threading
+import time
+
+
+def Now():
+    """Returns the current time in microseconds."""
+    return time.time() * 1e6
+
+
+class Histogram(object):
+    """Log-linear histogram of non-negative integer values."""
+
+    SUB_BUCKET_BITS = 7
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        self._counts = []
+        self._count = 0
+        self._total = 0
+        self._min = None
+        self._max = None
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def min(self):
+        return self._min
+
+    @property
+    def max(self):
+        return self._max
+
+    @property
+    def mean(self):
+        return float(self._total) / self._count if self._count else None
+
+    @classmethod
+    def _Index(cls, value):
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if value < sub_buckets:
+            return value
+        half = sub_buckets >> 1
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        return sub_buckets + (shift - 1) * half + (value >> shift) - half
+
+    @classmethod
+    def _Highest(cls, index):
+        """Returns the highest value which falls in the bucket at index."""
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if index < sub_buckets:
+            return index
+        half = sub_buckets >> 1
+        shift = (index - sub_buckets) // half + 1
+        mantissa = (index - sub_buckets) % half + half
+        return ((mantissa + 1) << shift) - 1
+
+    def Record(self, value):
+        value = max(0, int(value))
+        index = self._Index(value)
+        if index >= len(self._counts):
+            self._counts.extend([0] * (index + 1 - len(self._counts)))
+        self._counts[index] += 1
+        self._count += 1
+        self._total += value
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def Percentile(self, percentile):
+        """Returns the value percentile percent of values are at most.
+
+        The value is the highest in its bucket, but no more than the maximum.
+        None if nothing was recorded.
+        """
+        if not self._count:
+            return None
+        target = max(1, int(round(self._count * percentile / 100.0)))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return min(self._Highest(index), self._max)
+        return self._max
+
+    def ToDict(self):
+        result = {"count": self._count, "min": self._min, "max": self._max,
+                  "mean": self.mean}
+        for percentile in self.PERCENTILES:
+            result["p%s" % percentile] = self.Percentile(percentile)
+        return result
+
+
+class Stats(object):
+    """Named counters and latency histograms.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._started = time.time()
+
+    def Increment(self, name, count=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+
+    def Record(self, name, microseconds):
+        """Add a latency to the histogram of name."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.Record(microseconds)
+
+    def Counter(self, name):
+        return self._counters.get(name, 0)
+
+    def Histogram(self, name):
+        """Returns the Histogram of name, or None."""
+        return self._histograms.get(name)
+
+    def Reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self._started = time.time()
+
+    def Snapshot(self):
+        """Returns the counters and histograms as a dict for JSON."""
+        with self._lock:
+            return {"seconds": time.time() - self._started,
+                    "counters": dict(self._counters),
+                    "latency_us": dict(
+                        (name, histogram.ToDict())
+                        for name, histogram in self._histograms.iteritems())}
+
+    def Format(self):
+        """Returns lines of a table of the histograms and counters."""
+        snapshot = self.Snapshot()
+        counters = snapshot["counters"]
+        lines = ["%.0f seconds" % snapshot["seconds"],
+                 "%-16s %8s %8s %8s %10s %10s %10s" % (
+                     "latency (us)", "count", "ok", "failed", "p50", "p99",
+                     "max")]
+        for name, latency in sorted(snapshot["latency_us"].iteritems()):
+            lines.append("%-16s %8d %8s %8s %10d %10d %10d" % (
+                name, latency["count"],
+                counters.get(name + ".success", ""),
+                counters.get(name + ".failure", ""),
+                latency["p50"], latency["p99"], latency["max"]))
+        for name, count in sorted(counters.iteritems()):
+            if not name.endswith((".success", ".failure")):
+                lines.append("%-16s %8d" % (name, count))
+        return lines
+
+
+class StatsDumper(object):
+    """Writes a Stats snapshot as JSON every few seconds."""
+
+    def __init__(self, stats, filename, interval=60.0):
+        """Create a dumper.  Call Start to begin dumping.
+
+        Args:
+          stats:  A Stats.
+          filename:  Path of the JSON file, replaced on every dump.
+          interval:  Seconds between dumps.
+        """
+        self._stats = stats
+        self._filename = filename
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        # The last exception raised while dumping, if any.
+        self.error = None
+
+    def Dump(self):
+        tmp_filename = self._filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            json.dump(self._stats.Snapshot(), f, indent=2, sort_keys=True)
+        os.rename(tmp_filename, self._filename)
+
+    def Start(self):
+        self._thread = threading.Thread(target=self._Run, name="stats")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def Stop(self):
+        """Stop the thread, then dump one last time."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.Dump()
+
+    def _Run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.Dump()
+            except (IOError, OSError), e:
+                self.error = e
+
+
+class Profiler(object):
+    """Profiles the commands run while it is started.
+
+    cProfile only profiles the thread which starts it, which is the thread
+    running the command loop.
+    """
+
+    FILENAME = "game.prof"
+    # Functions of these modules are listed by Stop.
+    MODULES = r"my_game_(player|room|utils)\.py"
+
+    def __init__(self, directory="."):
+        """Create a profiler.
+
+        Args:
+          directory:  Directory the profiles are written to.  Players only
+            name the file, so they can't write anywhere else.
+        """
+        self.directory = directory
+        self._profile = None
+
+    @property
+    def running(self):
+        return self._profile is not None
+
+    def Start(self):
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def Path(self, name):
+        """Returns the path of the profile called name, or None if the name
+        is not a plain file name."""
+        if (not name or name in (os.curdir, os.pardir)
+            or os.path.basename(name) != name
+            or (os.altsep and os.altsep in name)):
+            return None
+        return os.path.join(self.directory, name)
+
+    def Stop(self, name=FILENAME, top=10):
+        """Stop profiling and write the results to a file in directory.
+
+        The file can be read with pstats, e.g.
+          python -m pstats game.prof
+
+        Args:
+          name:  File name to write, which Path must accept.
+          top:  Number of functions to list.
+
+        Returns:
+          Lines of the functions of MODULES which took the most time
+          themselves.
+        """
+        profile = self._profile
+        self._profile = None
+        profile.disable()
+        profile.dump_stats(self.Path(name))
+        stream = StringIO.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats("time").print_stats(self.MODULES, top)
+        return [line for line in stream.getvalue().splitlines()
+                if line.strip()]
@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import my_game_parser
+import my_game_stats
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = my_game_stats.Histogram
+        # Small values are exact, and larger values are within 1/64.
+        for value in [0, 1, 127, 128, 129, 255, 256, 1000, 10 ** 6, 10 ** 9]:
+            index = histogram._Index(value)
+            highest = histogram._Highest(index)
+            self.assertTrue(value <= highest <= value * (1 + 1 / 64.0))
+            self.assertEqual(histogram._Index(highest), index)
+            self.assertEqual(histogram._Index(highest + 1), index + 1)
+
+    def test_percentiles(self):
+        histogram = my_game_stats.Histogram()
+        self.assertEqual(histogram.Percentile(50), None)
+        self.assertEqual(histogram.mean, None)
+        for value in xrange(1, 1001):
+            histogram.Record(value)
+        self.assertEqual((histogram.count, histogram.min, histogram.max),
+                         (1000, 1, 1000))
+        self.assertEqual(histogram.mean, 500.5)
+        for percentile, expected in [(50, 500), (99, 990), (100, 1000)]:
+            value = histogram.Percentile(percentile)
+            self.assertTrue(expected <= value <= expected * (1 + 1 / 64.0))
+        self.assertEqual(histogram.Percentile(0), 1)
+        histogram.Record(-5)
+        self.assertEqual(histogram.min, 0)
+        self.assertEqual(sorted(histogram.ToDict()),
+                         ["count", "max", "mean", "min", "p50", "p90", "p99",
+                          "p99.9"])
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def test_stats(self):
+        stats = my_game_stats.Stats()
+        stats.Increment("a")
+        stats.Increment("a", 2)
+        stats.Record("b", 10)
+        self.assertEqual(stats.Counter("a"), 3)
+        self.assertEqual(stats.Counter("c"), 0)
+        self.assertEqual(stats.Histogram("b").count, 1)
+        snapshot = stats.Snapshot()
+        self.assertEqual(snapshot["counters"], {"a": 3})
+        self.assertEqual(snapshot["latency_us"]["b"]["max"], 10)
+        self.assertEqual(len(stats.Format()), 4)
+        stats.Reset()
+        self.assertEqual(stats.Counter("a"), 0)
+        self.assertEqual(stats.Histogram("b"), None)
+
+    def test_dumper(self):
+        stats = my_game_stats.Stats()
+        stats.Increment("a")
+        filename = os.path.join(self._tmp_dir, "stats.json")
+        dumper = my_game_stats.StatsDumper(stats, filename, interval=0.01)
+        dumper.Start()
+        dumper.Stop()
+        self.assertEqual(dumper.error, None)
+        with open(filename) as f:
+            self.assertEqual(json.load(f)["counters"], {"a": 1})
+
+    def test_game_interface(self):
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        player, game_interface = parser.player, parser.game_interface
+        self.assertTrue(player.Start())
+        self.assertEqual(game_interface.ExecuteCommand(player, "debug stats"),
+                         (False, "Stats are not enabled."))
+        stats = game_interface.stats = my_game_stats.Stats()
+        for command in ["go right", "go right", "go up", "take bogus",
+                        "bogus"]:
+            game_interface.ExecuteCommand(player, command)
+        self.assertEqual(stats.Counter("MoveRight.success"), 1)
+        self.assertEqual(stats.Counter("MoveRight.failure"), 1)
+        self.assertEqual(stats.Counter("MoveUp.failure"), 1)
+        self.assertEqual(stats.Counter("AddItem.failure"), 1)
+        self.assertEqual(stats.Histogram("MoveRight").count, 2)
+        self.assertEqual(stats.Histogram("lookup").count, 5)
+        self.assertEqual(stats.Histogram("turn").count, 5)
+        success, msg = game_interface.ExecuteCommand(player, "debug stats")
+        self.assertTrue(success)
+        self.assertTrue("MoveRight" in msg)
+        # Sessions share the stats.
+        session = game_interface.NewSession()
+        session.ExecuteCommand(player, "go left")
+        self.assertEqual(stats.Counter("MoveLeft.success"), 1)
+        # Sessions, which are played by remote clients, have no debug
+        # commands.
+        self.assertEqual(session.ExecuteCommand(player, "debug stats reset"),
+                         (False, session.UNKNOWN_MSG))
+        self.assertEqual(stats.Counter("MoveLeft.success"), 1)
+        self.assertEqual(
+            game_interface.ExecuteCommand(player, "debug stats reset"),
+            (True, "Stats reset."))
+        self.assertEqual(stats.Counter("MoveLeft.success"), 0)
+        self.assertFalse(game_interface.ExecuteCommand(player, "debug")[0])
+
+    def test_profiler(self):
+        parser = my_game_parser.GameParser()
+        parser.Parse("configs/iss_fire.game", use_snapshot=False)
+        player, game_interface = parser.player, parser.game_interface
+        self.assertTrue(player.Start())
+        game_interface.profiler.directory = self._tmp_dir
+        filename = os.path.join(self._tmp_dir, "Game.prof")
+        self.assertEqual(
+            game_interface.ExecuteCommand(player, "debug profile stop"),
+            (False, "Not profiling."))
+        self.assertTrue(
+            game_interface.ExecuteCommand(player, "debug profile start")[0])
+        self.assertEqual(
+            game_interface.ExecuteCommand(player, "debug profile start"),
+            (False, "Already profiling."))
+        game_interface.ExecuteCommand(player, "take foam")
+        game_interface.ExecuteCommand(player, "look")
+        # Profiles can only be written to the profiler's directory.
+        outside = os.path.join(self._tmp_dir, "outside.prof")
+        for name in [outside, "../outside.prof", "sub/game.prof"]:
+            self.assertEqual(
+                game_interface.ExecuteCommand(
+                    player, "debug profile stop %s" % name),
+                (False, "Give a file name without a directory."))
+        self.assertFalse(os.path.exists(outside))
+        success, msg = game_interface.ExecuteCommand(
+            player, "debug profile stop Game.prof")
+        self.assertTrue(success)
+        self.assertTrue(msg.startswith("Wrote %s" % filename))
+        # Only the engine's own functions are listed.
+        self.assertTrue("my_game_player.py" in msg)
+        self.assertFalse("my_game_interface.py" in msg)
+        self.assertTrue(os.path.exists(filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,8 @@
+import array
+import sys
+import threading
+
+
 def RemoveContent(content_list, content_name):
     """Remove first instance of content object from the given list.
 
@@ -44,3 +49,250 @@ def GetContentsDisplay(content_list):
     output.sort(key=lambda x: x[0])
     return ["%dx%s" % (c, n) for n, c in output]
 
+
+def DeepSizeOf(obj, seen=None):
+    """Approximate number of bytes used by obj and everything it refers to.
+
+    Args:
+      obj:  Any object.  Objects with a __dict__ or __slots__ are followed
+        into their attributes.
+      seen:  Optional set of ids of objects which have already been counted.
+        Shared objects are only counted once.
+
+    Returns:
+      An integer number of bytes.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.iteritems():
+            size += DeepSizeOf(k, seen) + DeepSizeOf(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += DeepSizeOf(v, seen)
+    elif hasattr(obj, "__dict__"):
+        size += DeepSizeOf(obj.__dict__, seen)
+    elif hasattr(obj, "__slots__"):
+        for slot in obj.__slots__:
+            size += DeepSizeOf(getattr(obj, slot, None), seen)
+    return size
+
+
+class NameRegistry(object):
+    """Maps names to small integer IDs and back.
+
+    IDs are given out in the order names are first seen, starting at 0, and
+    are never reused.  Each world has its own registry, owned by its
+    my_game_item.ItemMapper, so the IDs are only meaningful within that
+    world; anything written to disk or sent elsewhere should use the names.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._names = []
+
+    def __len__(self):
+        return len(self._names)
+
+    def Id(self, name):
+        """Returns the ID of name, giving it a new one if it has none."""
+        name_id = self._ids.get(name)
+        if name_id is None:
+            with self._lock:
+                name_id = self._ids.get(name)
+                if name_id is None:
+                    name_id = len(self._names)
+                    self._names.append(name)
+                    self._ids[name] = name_id
+        return name_id
+
+    def Find(self, name):
+        """Returns the ID of name, or None if it has none."""
+        return self._ids.get(name)
+
+    def Name(self, name_id):
+        return self._names[name_id]
+
+
+class Multiset(object):
+    """Counted multiset of string names of objects.
+
+    The objects are stored as their IDs in a NameRegistry, in two parallel
+    arrays of IDs and counts which take 8 bytes per distinct object however
+    long its name is.  Names are only looked up to display the contents.
+
+    Most multisets, e.g. the contents of a room, hold a handful of distinct
+    objects, which are found by scanning the ID array.  Only multisets with
+    more than INDEX_SIZE distinct objects also keep a dict of ID to index in
+    the arrays, so that adding and removing an object stays O(1).  Displaying
+    the contents is O(distinct objects), however many copies of each object
+    there are.
+    """
+
+    __slots__ = ("_names", "_slots", "_ids", "_counts", "_size")
+
+    # Number of distinct objects above which the index dict is kept.  It is
+    # dropped again when the multiset shrinks to half of this.
+    INDEX_SIZE = 16
+
+    def __init__(self, content_list=(), names=None):
+        """Create a multiset.
+
+        Args:
+          content_list:  Iterable of names of objects to add.
+          names:  NameRegistry of the world the objects belong to, usually
+            the ItemMapper's.  A new one if None.
+        """
+        if names is None:
+            names = NameRegistry()
+        self._names = names
+        # Dict of ID to index in the arrays, or None if there are at most
+        # INDEX_SIZE distinct objects.
+        self._slots = None
+        # Signed, because Python 2 reads the items of unsigned int arrays as
+        # longs, which are slower to compare when scanning.
+        self._ids = array.array("i")
+        self._counts = array.array("i")
+        self._size = 0
+        if content_list:
+            counts = {}
+            for content in content_list:
+                counts[content] = counts.get(content, 0) + 1
+            for content, count in counts.iteritems():
+                self._ids.append(names.Id(content))
+                self._counts.append(count)
+                self._size += count
+            if len(self._ids) > self.INDEX_SIZE:
+                self._BuildIndex()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, content_name):
+        return self._Index(content_name) >= 0
+
+    def __eq__(self, o):
+        if not isinstance(o, Multiset):
+            return False
+        if self._names is o._names:
+            return self._Dict() == o._Dict()
+        return dict(self._NameCounts()) == dict(o._NameCounts())
+
+    def __ne__(self, o):
+        return not self == o
+
+    @property
+    def names(self):
+        """The NameRegistry of the objects."""
+        return self._names
+
+    def _Dict(self):
+        return dict(zip(self._ids, self._counts))
+
+    def _BuildIndex(self):
+        self._slots = dict((content_id, i)
+                           for i, content_id in enumerate(self._ids))
+
+    def _Find(self, content_id):
+        """Returns the index of the ID in the arrays, or -1."""
+        if self._slots is not None:
+            return self._slots.get(content_id, -1)
+        if content_id in self._ids:
+            return self._ids.index(content_id)
+        return -1
+
+    def _Index(self, content_name):
+        """Returns the index of the named object in the arrays, or -1."""
+        # Find, rather than Id, so that looking up a missing name does not
+        # register it.
+        content_id = self._names.Find(content_name)
+        if content_id is None:
+            return -1
+        return self._Find(content_id)
+
+    @property
+    def distinct(self):
+        """Number of different objects."""
+        return len(self._ids)
+
+    def Count(self, content_name):
+        i = self._Index(content_name)
+        return self._counts[i] if i >= 0 else 0
+
+    def Add(self, content, count=1):
+        content_id = self._names.Id(content)
+        i = self._Find(content_id)
+        if i < 0:
+            if self._slots is not None:
+                self._slots[content_id] = len(self._ids)
+            self._ids.append(content_id)
+            self._counts.append(count)
+            if self._slots is None and len(self._ids) > self.INDEX_SIZE:
+                self._BuildIndex()
+        else:
+            self._counts[i] += count
+        self._size += count
+
+    def Remove(self, content_name):
+        """Remove one instance of the named object.
+
+        Returns:
+          The object if found, None otherwise, like RemoveContent.
+        """
+        i = self._Index(content_name)
+        if i < 0:
+            return None
+        if self._counts[i] == 1:
+            # Move the last object into the hole; the order does not matter.
+            if self._slots is not None:
+                del self._slots[self._ids[i]]
+            last_id = self._ids.pop()
+            last_count = self._counts.pop()
+            if i < len(self._ids):
+                self._ids[i] = last_id
+                self._counts[i] = last_count
+                if self._slots is not None:
+                    self._slots[last_id] = i
+            if (self._slots is not None
+                and len(self._ids) <= self.INDEX_SIZE // 2):
+                self._slots = None
+        else:
+            self._counts[i] -= 1
+        self._size -= 1
+        return content_name
+
+    def Copy(self):
+        """Returns a copy with the same NameRegistry."""
+        # Skip __init__, whose arrays would be replaced straight away.  Rooms
+        # are copied once for every room of a session or a parsed map.
+        copy = Multiset.__new__(Multiset)
+        copy._names = self._names
+        copy._slots = None if self._slots is None else dict(self._slots)
+        copy._ids = self._ids[:]
+        copy._counts = self._counts[:]
+        copy._size = self._size
+        return copy
+
+    def _NameCounts(self):
+        """Returns a list of (name, count)."""
+        name = self._names.Name
+        return [(name(content_id), count)
+                for content_id, count in zip(self._ids, self._counts)]
+
+    def Items(self):
+        """Returns a sorted list of the objects, repeated by their count."""
+        output = []
+        for content, count in sorted(self._NameCounts()):
+            output.extend([content] * count)
+        return output
+
+    def GetContentsDisplay(self):
+        """As GetContentsDisplay(self.Items()), without expanding the list."""
+        return ["%dx%s" % (c, n) for n, c in sorted(self._NameCounts())]
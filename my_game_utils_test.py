@@ -29,6 +29,106 @@ class TestUtils(unittest.TestCase):
             my_game_utils.GetContentsDisplay(["A", "B", "A", "C", "C"]),
             ["2xA", "1xB", "2xC"])
 
+    def test_multiset(self):
+        contents = my_game_utils.Multiset(["B", "A", "B"])
+        self.assertEqual(len(contents), 3)
+        self.assertEqual(contents.distinct, 2)
+        self.assertEqual(contents.Items(), ["A", "B", "B"])
+        self.assertEqual(contents.GetContentsDisplay(), ["1xA", "2xB"])
+        self.assertTrue("A" in contents)
+        self.assertFalse("C" in contents)
+        self.assertEqual(contents.Remove("C"), None)
+        self.assertEqual(contents.Remove("A"), "A")
+        self.assertEqual(contents.Remove("A"), None)
+        self.assertFalse("A" in contents)
+        self.assertEqual(contents.Count("B"), 2)
+        contents.Add("C", count=3)
+        self.assertEqual(len(contents), 5)
+        copy = contents.Copy()
+        self.assertEqual(copy, contents)
+        copy.Remove("C")
+        self.assertNotEqual(copy, contents)
+        self.assertEqual(contents.GetContentsDisplay(), ["2xB", "3xC"])
+        self.assertEqual(
+            my_game_utils.Multiset().GetContentsDisplay(), [])
+
+    def test_name_registry(self):
+        registry = my_game_utils.NameRegistry()
+        self.assertEqual(registry.Find("A"), None)
+        self.assertEqual(registry.Id("A"), 0)
+        self.assertEqual(registry.Id("B"), 1)
+        self.assertEqual(registry.Id("A"), 0)
+        self.assertEqual(registry.Find("B"), 1)
+        self.assertEqual(registry.Name(1), "B")
+        self.assertEqual(len(registry), 2)
+
+    def test_multiset_ids(self):
+        names = my_game_utils.NameRegistry()
+        contents = my_game_utils.Multiset(["A", "B", "C"], names)
+        self.assertTrue(contents.names is names)
+        # Looking for a missing object does not register its name.
+        self.assertFalse("never seen" in contents)
+        self.assertEqual(contents.Remove("never seen"), None)
+        self.assertEqual(contents.Count("never seen"), 0)
+        self.assertEqual(len(names), 3)
+        # Removing the last of an object in the middle keeps the others.
+        contents.Remove("B")
+        self.assertEqual(contents.Items(), ["A", "C"])
+        self.assertEqual(contents.distinct, 2)
+        for name in ["A", "C"]:
+            self.assertEqual(contents.Count(name), 1)
+        self.assertEqual(contents.Remove("C"), "C")
+        self.assertEqual(contents.Remove("C"), None)
+        contents.Add("B")
+        contents.Add("C")
+        self.assertEqual(contents,
+                         my_game_utils.Multiset(["C", "B", "A"], names))
+        # Multisets of different registries compare by name.
+        self.assertEqual(contents, my_game_utils.Multiset(["C", "B", "A"]))
+        self.assertTrue(contents.Copy().names is names)
+        # Names of other types than strings work too.
+        contents.Add(1, count=2)
+        self.assertEqual(contents.Count(1), 2)
+        # Each distinct object takes a few bytes, whatever its name.
+        small = my_game_utils.Multiset(["x"], names)
+        large = my_game_utils.Multiset(["x" * 1000] * 1000, names)
+        self.assertEqual(my_game_utils.DeepSizeOf(small, set([id(names)])),
+                         my_game_utils.DeepSizeOf(large, set([id(names)])))
+
+    def test_multiset_index(self):
+        size = my_game_utils.Multiset.INDEX_SIZE
+        names = ["item%d" % i for i in range(size + 1)]
+        contents = my_game_utils.Multiset(names[:size])
+        # Leave the registry out of the sizes.
+        seen = set([id(contents.names)])
+        small_size = my_game_utils.DeepSizeOf(contents, set(seen))
+        contents.Add(names[size])
+        for name in names:
+            self.assertEqual(contents.Count(name), 1)
+        self.assertTrue(
+            my_game_utils.DeepSizeOf(contents, set(seen)) > small_size + 100)
+        self.assertEqual(contents.Copy(), contents)
+        # The index follows removals, and is dropped below half the size.
+        for name in names[:size // 2 + 1]:
+            self.assertEqual(contents.Remove(name), name)
+            self.assertFalse(name in contents)
+        for name in names[size // 2 + 1:]:
+            self.assertEqual(contents.Count(name), 1)
+        self.assertEqual(contents,
+                         my_game_utils.Multiset(names[size // 2 + 1:],
+                                                contents.names))
+        self.assertTrue(
+            my_game_utils.DeepSizeOf(contents, set(seen)) <= small_size)
+        self.assertEqual(my_game_utils.Multiset(names).distinct, size + 1)
+
+    def test_deep_size_of(self):
+        shared = ["a" * 100]
+        size = my_game_utils.DeepSizeOf(shared)
+        self.assertTrue(size > 100)
+        self.assertTrue(my_game_utils.DeepSizeOf([shared, shared]) <
+                        my_game_utils.DeepSizeOf([shared, ["a" * 100]]))
+        self.assertTrue(my_game_utils.DeepSizeOf({"k": shared}) > size)
+
 
 if __name__ == '__main__':
     unittest.main()